@@ -1,18 +1,26 @@
-from flask import Blueprint, render_template, jsonify, request, redirect, url_for
+from flask import Blueprint, render_template, jsonify, request, redirect, url_for, current_app
 from flask_login import login_required, current_user
-from database import get_db_connection
+from database import (get_db_connection, get_read_connection, write_transaction, get_data_version,
+                      REBUILD_DAILY_ROLLUPS)
+from cache import LRUCache, cached
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import json
+import threading
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/analytics')
 
+# Aggregate results, invalidated whenever tickets, comments or users change
+analytics_cache = LRUCache('analytics', maxsize=128, ttl=300)
+
 class Analytics:
     """Analytics class for generating dashboard data"""
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_tickets_by_category():
         """Get ticket count by category"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         query = '''
             SELECT c.name, c.color, COUNT(t.id) as count
             FROM categories c
@@ -26,9 +34,10 @@ class Analytics:
         return [{'name': row['name'], 'count': row['count'], 'color': row['color']} for row in results]
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_average_resolution_time():
         """Calculate average resolution time in hours"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         query = '''
             SELECT 
                 AVG(JULIANDAY(resolved_at) - JULIANDAY(created_at)) * 24 as avg_hours,
@@ -47,9 +56,10 @@ class Analytics:
         return {'average_hours': 0, 'resolved_count': 0}
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_resolution_time_by_category():
         """Get average resolution time by category"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         query = '''
             SELECT 
                 c.name,
@@ -73,35 +83,18 @@ class Analytics:
         } for row in results]
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_time_series_data(days=30):
         """Get time series data for ticket creation and resolution"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         
-        # Get ticket creation data
-        creation_query = '''
-            SELECT 
-                DATE(created_at) as date,
-                COUNT(*) as created_count
-            FROM tickets 
-            WHERE created_at >= date('now', '-{} days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-        '''.format(days)
-        
-        # Get ticket resolution data
-        resolution_query = '''
-            SELECT 
-                DATE(resolved_at) as date,
-                COUNT(*) as resolved_count
-            FROM tickets 
-            WHERE resolved_at IS NOT NULL 
-            AND resolved_at >= date('now', '-{} days')
-            GROUP BY DATE(resolved_at)
-            ORDER BY date
-        '''.format(days)
-        
-        created_data = conn.execute(creation_query).fetchall()
-        resolved_data = conn.execute(resolution_query).fetchall()
+        # One pre-aggregated row per active day, maintained by triggers
+        query = '''
+            SELECT day, created_count, resolved_count
+            FROM daily_ticket_rollups
+            WHERE dimension = 'total' AND value = '' AND day >= date('now', ?)
+        '''
+        rows = conn.execute(query, (f'-{days} days',)).fetchall()
         conn.close()
         
         # Create date range
@@ -109,8 +102,8 @@ class Analytics:
         start_date = end_date - timedelta(days=days-1)
         
         # Initialize data dictionaries
-        created_dict = {row['date']: row['created_count'] for row in created_data}
-        resolved_dict = {row['date']: row['resolved_count'] for row in resolved_data}
+        created_dict = {row['day']: row['created_count'] for row in rows}
+        resolved_dict = {row['day']: row['resolved_count'] for row in rows}
         
         # Generate complete time series
         time_series = []
@@ -128,9 +121,10 @@ class Analytics:
         return time_series
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_priority_distribution():
         """Get ticket distribution by priority"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         query = '''
             SELECT 
                 priority,
@@ -156,9 +150,10 @@ class Analytics:
         return [{'priority': row['priority'], 'count': row['count'], 'color': row['color']} for row in results]
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_status_distribution():
         """Get ticket distribution by status"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         query = '''
             SELECT 
                 status,
@@ -180,9 +175,10 @@ class Analytics:
         return [{'status': row['status'], 'count': row['count'], 'color': row['color']} for row in results]
     
     @staticmethod
+    @cached(analytics_cache, version=get_data_version)
     def get_agent_performance():
         """Get agent performance metrics"""
-        conn = get_db_connection()
+        conn = get_read_connection()
         query = '''
             SELECT 
                 u.username,
@@ -207,6 +203,55 @@ class Analytics:
             'resolution_rate': round((row['resolved_tickets'] / row['total_tickets'] * 100), 1) if row['total_tickets'] > 0 else 0,
             'avg_resolution_hours': round(row['avg_resolution_hours'], 2) if row['avg_resolution_hours'] else 0
         } for row in results]
+    
+    @staticmethod
+    def rebuild_daily_rollups():
+        """Repopulate daily_ticket_rollups from the tickets table"""
+        with write_transaction() as conn:
+            for statement in REBUILD_DAILY_ROLLUPS:
+                conn.execute(statement)
+            return conn.execute(
+                "SELECT COUNT(*) FROM daily_ticket_rollups WHERE dimension = 'total'"
+            ).fetchone()[0]
+
+# Dashboard widgets served by the bundle endpoint, each given the request params
+BUNDLE_WIDGETS = {
+    'tickets_by_category': lambda params: Analytics.get_tickets_by_category(),
+    'resolution_time': lambda params: {
+        'overall': Analytics.get_average_resolution_time(),
+        'by_category': Analytics.get_resolution_time_by_category()
+    },
+    'time_series': lambda params: Analytics.get_time_series_data(params['days']),
+    'priority_distribution': lambda params: Analytics.get_priority_distribution(),
+    'status_distribution': lambda params: Analytics.get_status_distribution(),
+    'agent_performance': lambda params: Analytics.get_agent_performance()
+}
+
+_bundle_executor = None
+_bundle_executor_lock = threading.Lock()
+
+def get_bundle_executor(workers):
+    """Get the shared thread pool used to compute bundle widgets in parallel"""
+    global _bundle_executor
+    with _bundle_executor_lock:
+        if _bundle_executor is None:
+            _bundle_executor = ThreadPoolExecutor(max_workers=workers,
+                                                  thread_name_prefix='analytics-bundle')
+        return _bundle_executor
+
+def compute_bundle(names, params, workers=0):
+    """Compute several dashboard widgets in one call
+    
+    Sequentially every widget shares the request's read connection. With
+    workers > 1 each widget runs in a pool thread on its own pooled read-only
+    connection, which WAL lets run alongside the others.
+    """
+    if workers > 1 and len(names) > 1:
+        executor = get_bundle_executor(workers)
+        futures = {name: executor.submit(BUNDLE_WIDGETS[name], params) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+    
+    return {name: BUNDLE_WIDGETS[name](params) for name in names}
 
 # Routes
 @analytics_bp.route('/')
@@ -284,6 +329,31 @@ def api_agent_performance():
     data = Analytics.get_agent_performance()
     return jsonify(data)
 
+@analytics_bp.route('/api/bundle')
+@login_required
+def api_bundle():
+    """API endpoint returning several dashboard widgets in one response
+    
+    ``widgets`` is a comma-separated list of BUNDLE_WIDGETS names (all of
+    them by default); ``days`` is passed on to the time series.
+    """
+    if not current_user.is_admin():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    widgets = request.args.get('widgets')
+    if widgets:
+        names = [name.strip() for name in widgets.split(',') if name.strip()]
+    else:
+        names = list(BUNDLE_WIDGETS)
+    
+    unknown = [name for name in names if name not in BUNDLE_WIDGETS]
+    if unknown:
+        return jsonify({'error': f"Unknown widgets: {', '.join(unknown)}"}), 400
+    
+    params = {'days': request.args.get('days', 30, type=int)}
+    workers = current_app.config.get('ANALYTICS_BUNDLE_WORKERS', 0)
+    return jsonify(compute_bundle(names, params, workers))
+
 # Custom Dashboard Routes
 @analytics_bp.route('/custom')
 @login_required
@@ -395,19 +465,12 @@ class CustomDashboard:
     @staticmethod
     def create(name, description, config, user_id):
         """Create a new custom dashboard"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             cursor = conn.execute('''
                 INSERT INTO custom_dashboards (name, description, config, user_id)
                 VALUES (?, ?, ?, ?)
             ''', (name, description, json.dumps(config), user_id))
-            dashboard_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return dashboard_id
-        except Exception as e:
-            conn.close()
-            raise e
+            return cursor.lastrowid
     
     @staticmethod
     def get_all_by_user(user_id):
@@ -434,8 +497,6 @@ class CustomDashboard:
     @staticmethod
     def update(dashboard_id, name=None, description=None, config=None):
         """Update custom dashboard"""
-        conn = get_db_connection()
-        
         updates = []
         params = []
         
@@ -455,24 +516,13 @@ class CustomDashboard:
         
         query = f"UPDATE custom_dashboards SET {', '.join(updates)} WHERE id = ?"
         
-        try:
+        with write_transaction() as conn:
             conn.execute(query, params)
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            conn.close()
-            raise e
+        return True
     
     @staticmethod
     def delete(dashboard_id):
         """Delete custom dashboard"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             conn.execute('DELETE FROM custom_dashboards WHERE id = ?', (dashboard_id,))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            conn.close()
-            raise e
+        return True
@@ -1,14 +1,19 @@
-from flask import Flask, render_template, redirect, url_for
+from flask import Flask, render_template, redirect, url_for, jsonify
 from flask_login import LoginManager, login_required, current_user
-from database import init_db
-from models import User
+from database import init_db, init_app as init_db_pool, get_pool_stats
+from cache import get_cache_stats
+from models import user_cache, load_session_user
 from auth import auth_bp
 from tickets import tickets_bp
-from analytics import analytics_bp
+from analytics import analytics_bp, analytics_cache, Analytics
 from predictions import predictions_bp
+from ml_predictions import predictor, model_lifecycle
+from training_jobs import training_jobs
+from export_jobs import export_jobs
 from exports import exports_bp
 from ticket_models import Ticket
 import os
+import click
 
 def create_app():
     """Application factory pattern"""
@@ -17,6 +22,38 @@ def create_app():
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['DATABASE'] = 'instance/database.db'
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    
+    # SQLite storage tuning (see database.STORAGE_DEFAULTS)
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -20000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+    app.config['SQLITE_TEMP_STORE'] = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    
+    # Report per-request connection/statement counts in X-DB-* headers
+    app.config['DB_REQUEST_STATS'] = os.environ.get('DB_REQUEST_STATS', '0') == '1'
+    
+    # Initialize the SQLite connection pool
+    init_db_pool(app)
+    
+    # Analytics result cache
+    app.config['ANALYTICS_CACHE_SIZE'] = int(os.environ.get('ANALYTICS_CACHE_SIZE', 128))
+    app.config['ANALYTICS_CACHE_TTL'] = float(os.environ.get('ANALYTICS_CACHE_TTL', 300))
+    analytics_cache.configure(maxsize=app.config['ANALYTICS_CACHE_SIZE'],
+                              ttl=app.config['ANALYTICS_CACHE_TTL'])
+    # Threads used to compute /analytics/api/bundle widgets (0 = sequential)
+    app.config['ANALYTICS_BUNDLE_WORKERS'] = int(os.environ.get('ANALYTICS_BUNDLE_WORKERS', 0))
+    
+    # User cache in front of load_user; with USER_SESSION_SNAPSHOT the user is
+    # kept in the signed session cookie and only reloaded once it is older
+    # than USER_CACHE_TTL seconds
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 60))
+    app.config['USER_SESSION_SNAPSHOT'] = os.environ.get('USER_SESSION_SNAPSHOT', '0') == '1'
+    user_cache.configure(maxsize=app.config['USER_CACHE_SIZE'],
+                         ttl=app.config['USER_CACHE_TTL'])
     
     # Initialize Flask-Login
     login_manager = LoginManager()
@@ -27,7 +64,36 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.get(int(user_id))
+        return load_session_user(user_id, app.config['USER_SESSION_SNAPSHOT'],
+                                 app.config['USER_CACHE_TTL'])
+    
+    # Prediction models: 'background' loads them in a thread at startup,
+    # 'lazy' on first use and 'eager' before the app is returned
+    app.config['ML_MODEL_LOADING'] = os.environ.get('ML_MODEL_LOADING', 'background')
+    # Seconds a prediction request waits for models that are still loading
+    app.config['ML_MODEL_WAIT'] = float(os.environ.get('ML_MODEL_WAIT', 5))
+    # Descriptions vectorized and predicted together by /predictions/api/batch-predict
+    app.config['ML_BATCH_CHUNK_SIZE'] = int(os.environ.get('ML_BATCH_CHUNK_SIZE', 1000))
+    # Hours between scheduled model retrainings (0 = only on demand)
+    app.config['ML_RETRAIN_INTERVAL_HOURS'] = float(os.environ.get('ML_RETRAIN_INTERVAL_HOURS', 0))
+    # Retraining mode when none is requested: 'full' or 'incremental'
+    app.config['ML_TRAINING_MODE'] = os.environ.get('ML_TRAINING_MODE', 'full')
+    # Cores used by a full retrain (-1 = all); above 1 both models train in parallel
+    app.config['ML_TRAINING_JOBS'] = int(os.environ.get('ML_TRAINING_JOBS', 1))
+    # Format new model versions are saved in: 'mmap', 'compressed' or 'pickle'
+    app.config['ML_MODEL_FORMAT'] = os.environ.get('ML_MODEL_FORMAT', 'mmap')
+    # Seconds between checks for a model version activated by another worker (0 = never)
+    app.config['ML_MODEL_SYNC_SECONDS'] = float(os.environ.get('ML_MODEL_SYNC_SECONDS', 30))
+    
+    # Background exports: files are written to EXPORT_DIR by EXPORT_WORKERS
+    # threads and deleted EXPORT_TTL_SECONDS after they are finished; an
+    # identical request within EXPORT_DEDUPE_SECONDS reuses the earlier job
+    app.config['EXPORT_DIR'] = os.environ.get('EXPORT_DIR', os.path.join('instance', 'exports'))
+    app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', 2))
+    app.config['EXPORT_TTL_SECONDS'] = float(os.environ.get('EXPORT_TTL_SECONDS', 3600))
+    app.config['EXPORT_DEDUPE_SECONDS'] = float(os.environ.get('EXPORT_DEDUPE_SECONDS', 300))
+    # Seconds between sweeps deleting expired export files
+    app.config['EXPORT_CLEANUP_SECONDS'] = float(os.environ.get('EXPORT_CLEANUP_SECONDS', 300))
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -36,6 +102,24 @@ def create_app():
     app.register_blueprint(predictions_bp)
     app.register_blueprint(exports_bp)
     
+    predictor.n_jobs = app.config['ML_TRAINING_JOBS']
+    predictor.registry.artifact_format = app.config['ML_MODEL_FORMAT']
+    predictor.sync_interval = app.config['ML_MODEL_SYNC_SECONDS']
+    if app.config['ML_MODEL_LOADING'] == 'eager':
+        model_lifecycle.wait_until_ready()
+    elif app.config['ML_MODEL_LOADING'] == 'background':
+        model_lifecycle.start()
+    
+    if app.config['ML_RETRAIN_INTERVAL_HOURS'] > 0:
+        training_jobs.start_schedule(app.config['ML_RETRAIN_INTERVAL_HOURS'],
+                                     mode=app.config['ML_TRAINING_MODE'])
+    
+    export_jobs.configure(export_dir=app.config['EXPORT_DIR'],
+                          workers=app.config['EXPORT_WORKERS'],
+                          ttl=app.config['EXPORT_TTL_SECONDS'],
+                          dedupe_window=app.config['EXPORT_DEDUPE_SECONDS'])
+    export_jobs.start_cleanup(app.config['EXPORT_CLEANUP_SECONDS'])
+    
     # Main routes
     @app.route('/')
     def index():
@@ -57,7 +141,7 @@ def create_app():
         # Get ticket statistics for admin dashboard
         try:
             stats = Ticket.get_stats()
-            recent_tickets = Ticket.get_all(user_role='admin')[:5]  # Get 5 most recent tickets
+            recent_tickets = Ticket.get_recent(user_role='admin', limit=5)
         except:
             stats = {'total': 0, 'open': 0, 'in_progress': 0, 'resolved': 0, 'closed': 0}
             recent_tickets = []
@@ -68,27 +152,34 @@ def create_app():
     @login_required
     def agent_dashboard():
         """Agent dashboard"""
-        # Get tickets assigned to this agent
+        # Get counts and the latest tickets for this agent
         try:
-            my_tickets = Ticket.get_all(user_role='agent', user_id=current_user.id)
-            # Calculate agent-specific stats
-            total_tickets = len(my_tickets)
-            open_tickets = len([t for t in my_tickets if t['status'] == 'open'])
-            in_progress = len([t for t in my_tickets if t['status'] == 'in_progress'])
-            resolved_tickets = len([t for t in my_tickets if t['status'] == 'resolved'])
-            
-            agent_stats = {
-                'total': total_tickets,
-                'open': open_tickets,
-                'in_progress': in_progress,
-                'resolved': resolved_tickets
-            }
+            agent_stats = Ticket.get_agent_stats(current_user.id)
+            my_tickets = Ticket.get_recent(user_role='agent', user_id=current_user.id, limit=5)
         except:
             my_tickets = []
             agent_stats = {'total': 0, 'open': 0, 'in_progress': 0, 'resolved': 0}
         
         return render_template('agent_dashboard.html', user=current_user, 
-                             my_tickets=my_tickets[:5], stats=agent_stats)
+                             my_tickets=my_tickets, stats=agent_stats)
+    
+    @app.route('/admin/api/db-stats')
+    @login_required
+    def db_stats():
+        """Connection pool statistics (admin only)"""
+        if not current_user.is_admin():
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        return jsonify(get_pool_stats())
+    
+    @app.route('/admin/api/cache-stats')
+    @login_required
+    def cache_stats():
+        """Result cache hit/miss statistics (admin only)"""
+        if not current_user.is_admin():
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        return jsonify(get_cache_stats())
     
     @app.route('/dashboard')
     @login_required
@@ -99,6 +190,35 @@ def create_app():
         else:
             return redirect(url_for('agent_dashboard'))
     
+    # CLI commands
+    @app.cli.command('check-stats')
+    @click.option('--repair', is_flag=True, help='Rebuild the counters if they disagree.')
+    def check_stats(repair):
+        """Verify the ticket stats counters against a full recount"""
+        mismatches = Ticket.check_stats_counters(repair=repair)
+        
+        for dimension, value, counter, actual in mismatches:
+            click.echo(f'{dimension}={value!r}: counter {counter}, actual {actual}')
+        
+        if not mismatches:
+            click.echo('Ticket stats counters are consistent.')
+        elif repair:
+            click.echo('Ticket stats counters rebuilt.')
+        else:
+            raise SystemExit(1)
+    
+    @app.cli.command('rebuild-search')
+    def rebuild_search():
+        """Rebuild the full-text search index from tickets and comments"""
+        indexed = Ticket.rebuild_search_index()
+        click.echo(f'Indexed {indexed} tickets for search.')
+    
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Rebuild the daily analytics rollups from the tickets table"""
+        days = Analytics.rebuild_daily_rollups()
+        click.echo(f'Rolled up {days} days of tickets.')
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
@@ -81,6 +81,7 @@ def logout():
     """Handle user logout"""
     username = current_user.username
     logout_user()
+    session.pop('_user_snapshot', None)
     flash(f'Goodbye, {username}!', 'info')
     return redirect(url_for('auth.login'))
 
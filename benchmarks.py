@@ -0,0 +1,954 @@
+"""Performance benchmarks for the ticket dashboard
+
+Run a single benchmark with ``python benchmarks.py <name>``. Every benchmark
+works on a throwaway database in a temporary directory, never on
+instance/database.db.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask_login import LoginManager
+
+from database import (init_db, init_app as init_db_pool, configure_storage,
+                      get_db_connection, get_read_connection, write_transaction)
+from ticket_models import Ticket, SORT_FIELDS, TICKET_SELECT
+from analytics import Analytics, analytics_bp, analytics_cache
+from models import user_cache, load_session_user
+
+STATUSES = ['open', 'in_progress', 'resolved', 'closed']
+PRIORITIES = ['low', 'medium', 'high']
+WORDS = [
+    'login', 'password', 'reset', 'error', 'crash', 'slow', 'invoice', 'billing',
+    'refund', 'account', 'locked', 'dashboard', 'export', 'report', 'feature',
+    'request', 'button', 'page', 'timeout', 'database', 'connection', 'mobile',
+    'email', 'profile', 'permission', 'upload', 'download', 'sync', 'update'
+]
+
+def random_text(rng, words):
+    """Build a random sentence from the benchmark vocabulary"""
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def seed_tickets(database, count, batch_size=10000, seed=42):
+    """Insert synthetic tickets spread over the last year"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    conn = sqlite3.connect(database)
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users')]
+    category_ids = [row[0] for row in conn.execute('SELECT id FROM categories')]
+
+    inserted = 0
+    while inserted < count:
+        rows = []
+        for _ in range(min(batch_size, count - inserted)):
+            created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            status = rng.choice(STATUSES)
+            resolved_at = None
+            if status in ('resolved', 'closed'):
+                resolved_at = created_at + timedelta(minutes=rng.randint(30, 14 * 24 * 60))
+            rows.append((
+                random_text(rng, 5),
+                random_text(rng, 30),
+                status,
+                rng.choice(PRIORITIES),
+                rng.choice(category_ids),
+                rng.choice(user_ids),
+                rng.choice(user_ids + [None]),
+                created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                (resolved_at or created_at).strftime('%Y-%m-%d %H:%M:%S'),
+                resolved_at.strftime('%Y-%m-%d %H:%M:%S') if resolved_at else None
+            ))
+        conn.executemany('''
+            INSERT INTO tickets (title, description, status, priority, category_id,
+                                 created_by, assigned_to, created_at, updated_at, resolved_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+        inserted += len(rows)
+
+    conn.close()
+
+def seed_agents(database, count):
+    """Add agent accounts so tickets spread over a realistic team"""
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, '', 'agent')",
+        [(f'bench_agent{i}', f'bench_agent{i}@example.com') for i in range(count)]
+    )
+    conn.commit()
+    conn.close()
+
+def create_benchmark_db(directory, tickets, agents=20):
+    """Create and seed a benchmark database"""
+    database = os.path.join(directory, 'benchmark.db')
+    init_db(database)
+    seed_agents(database, agents)
+    seed_tickets(database, tickets)
+    return database
+
+def run_for(duration, worker, threads):
+    """Run worker in several threads until the deadline, return call counts"""
+    deadline = time.monotonic() + duration
+    counts = [0] * threads
+    errors = [0] * threads
+
+    def loop(index):
+        rng = random.Random(index)
+        while time.monotonic() < deadline:
+            try:
+                worker(rng)
+                counts[index] += 1
+            except sqlite3.OperationalError:
+                errors[index] += 1
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    return pool, counts, errors
+
+def bench_storage(args):
+    """Concurrent read throughput with writers active: rollback journal vs WAL"""
+    configurations = {
+        'rollback journal': {'journal_mode': 'DELETE', 'synchronous': 'FULL',
+                             'cache_size': -2000, 'mmap_size': 0, 'temp_store': 'DEFAULT'},
+        'wal + tuned pragmas': {}
+    }
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            storage_run(args, database, tickets, configurations)
+
+def storage_run(args, database, tickets, configurations):
+    """Run the storage benchmark against one seeded database"""
+    def read(rng):
+        conn = get_read_connection()
+        try:
+            conn.execute('''
+                SELECT status, COUNT(*) FROM tickets GROUP BY status
+            ''').fetchall()
+            conn.execute('''
+                SELECT * FROM tickets WHERE priority = ? ORDER BY created_at DESC LIMIT 20
+            ''', (rng.choice(PRIORITIES),)).fetchall()
+        finally:
+            conn.close()
+
+    def write(rng):
+        with write_transaction() as conn:
+            conn.execute('UPDATE tickets SET status = ?, updated_at = ? WHERE id = ?',
+                         (rng.choice(STATUSES), datetime.now().isoformat(),
+                          rng.randint(1, tickets)))
+
+    print(f'{tickets} tickets, {args.readers} readers, {args.writers} writers, '
+          f'{args.duration}s per run')
+    for name, storage in configurations.items():
+        configure_storage(database, max_connections=args.readers + args.writers,
+                          storage=storage)
+        readers, reads, read_errors = run_for(args.duration, read, args.readers)
+        writers, writes, write_errors = run_for(args.duration, write, args.writers)
+        for thread in readers + writers:
+            thread.join()
+
+        print(f'  {name:<22} reads/s: {sum(reads) / args.duration:>9.1f}  '
+              f'writes/s: {sum(writes) / args.duration:>8.1f}  '
+              f'errors: {sum(read_errors) + sum(write_errors)}')
+
+def timed(function, repeat=3):
+    """Best wall time of several calls, plus the result of the last one"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def peak_memory(function):
+    """Peak Python heap allocation while running function, in MB"""
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def bench_pagination(args):
+    """Full ticket list vs keyset pages at the start and middle of the list"""
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+            conn = sqlite3.connect(database)
+            conn.row_factory = sqlite3.Row
+
+            print(f'{tickets} tickets, {args.per_page} per page (best of 3, ms)')
+            print(f"  {'sort_by':<12} {'get_all':>10} {'first page':>11} {'middle page':>12}")
+            for sort_by in SORT_FIELDS:
+                filters = {'sort_by': sort_by, 'sort_order': 'DESC'}
+                middle = conn.execute(
+                    f'SELECT * FROM tickets ORDER BY {sort_by} DESC, id DESC LIMIT 1 OFFSET ?',
+                    (tickets // 2,)
+                ).fetchone()
+                cursor = Ticket.encode_cursor(middle, sort_by)
+
+                full, _ = timed(lambda: Ticket.get_all(user_role='admin', filters=filters), repeat=1)
+                first, _ = timed(lambda: Ticket.get_page(
+                    user_role='admin', filters=filters, per_page=args.per_page))
+                deep, _ = timed(lambda: Ticket.get_page(
+                    user_role='admin', filters=filters, after=cursor, per_page=args.per_page))
+                print(f'  {sort_by:<12} {full * 1000:>10.1f} {first * 1000:>11.2f} {deep * 1000:>12.2f}')
+
+            full_memory = peak_memory(lambda: Ticket.get_all(user_role='admin'))
+            page_memory = peak_memory(lambda: Ticket.get_page(user_role='admin', per_page=args.per_page))
+            print(f'  peak memory: get_all {full_memory:.1f} MB, one page {page_memory:.2f} MB')
+            conn.close()
+
+def bench_agent_dashboard(args):
+    """Agent dashboard data: full ticket list + Python counts vs SQL aggregation"""
+    def old_path(user_id):
+        my_tickets = Ticket.get_all(user_role='agent', user_id=user_id)
+        stats = {
+            'total': len(my_tickets),
+            'open': len([t for t in my_tickets if t['status'] == 'open']),
+            'in_progress': len([t for t in my_tickets if t['status'] == 'in_progress']),
+            'resolved': len([t for t in my_tickets if t['status'] == 'resolved'])
+        }
+        return stats, my_tickets[:5]
+
+    def new_path(user_id):
+        stats = Ticket.get_agent_stats(user_id)
+        return stats, Ticket.get_recent(user_role='agent', user_id=user_id, limit=5)
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            old_time, (old_stats, old_recent) = timed(lambda: old_path(2))
+            new_time, (new_stats, new_recent) = timed(lambda: new_path(2))
+            assert [t['created_at'] for t in old_recent] == [t['created_at'] for t in new_recent]
+            assert all(old_stats[key] == new_stats[key] for key in old_stats)
+
+            print(f"{tickets} tickets, agent with {new_stats['total']} tickets (best of 3)")
+            print(f'  get_all + list comprehensions {old_time * 1000:>9.1f} ms')
+            print(f'  get_agent_stats + get_recent  {new_time * 1000:>9.1f} ms')
+
+def like_search(term, limit=None):
+    """The previous LIKE-based ticket search, for comparison"""
+    conn = get_db_connection()
+    pattern = f'%{term}%'
+    query = TICKET_SELECT + '''
+        WHERE (LOWER(t.title) LIKE LOWER(?) OR LOWER(t.description) LIKE LOWER(?))
+        ORDER BY t.created_at DESC
+    '''
+    params = [pattern, pattern]
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+    tickets = conn.execute(query, params).fetchall()
+    conn.close()
+    return tickets
+
+def bench_search(args):
+    """Ticket search latency: LIKE scan vs FTS5 (bm25 ranked and by date)"""
+    searches = [
+        ('common word', 'password', 'password'),
+        ('phrase', '"login timeout"', 'login timeout'),
+        ('prefix', 'dash*', 'dash')
+    ]
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            print(f'{tickets} tickets, first page of {args.per_page} (best of 3, ms)')
+            print(f"  {'search':<12} {'matches':>8} {'LIKE all':>9} {'LIKE page':>10} "
+                  f"{'FTS by date':>12} {'FTS ranked':>11}")
+            for name, query, like_term in searches:
+                like_all, matches = timed(lambda: like_search(like_term), repeat=1)
+                like_page, _ = timed(lambda: like_search(like_term, args.per_page))
+                by_date, _ = timed(lambda: Ticket.get_page(
+                    user_role='admin', filters={'search': query}, per_page=args.per_page))
+                ranked, _ = timed(lambda: Ticket.get_page(
+                    user_role='admin', filters={'search': query, 'sort_by': 'relevance'},
+                    per_page=args.per_page))
+                print(f'  {name:<12} {len(matches):>8} {like_all * 1000:>9.1f} {like_page * 1000:>10.2f} '
+                      f'{by_date * 1000:>12.2f} {ranked * 1000:>11.1f}')
+
+# The requests the analytics dashboard made before the bundle endpoint
+ANALYTICS_URLS = [
+    '/analytics/api/tickets-by-category',
+    '/analytics/api/resolution-time',
+    '/analytics/api/time-series?days=7',
+    '/analytics/api/priority-distribution',
+    '/analytics/api/status-distribution',
+    '/analytics/api/agent-performance'
+]
+
+def analytics_client(database, workers=0, snapshot=False):
+    """Test client for a minimal app serving the analytics blueprint as the admin"""
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='benchmark', DATABASE=database,
+                      ANALYTICS_BUNDLE_WORKERS=workers, DB_REQUEST_STATS=True)
+    init_db_pool(app)
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: load_session_user(user_id, snapshot))
+    app.register_blueprint(analytics_bp)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    return client
+
+def fetch(client, url):
+    """GET a URL, failing loudly on anything but 200"""
+    response = client.get(url)
+    assert response.status_code == 200, f'{url} returned {response.status_code}'
+    return response
+
+def bench_analytics_bundle(args):
+    """Analytics page data: six API requests vs one /analytics/api/bundle"""
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            clients = [analytics_client(database) for _ in ANALYTICS_URLS]
+            client = clients[0]
+            parallel_client = analytics_client(database, workers=args.readers)
+
+            def separate():
+                for url in ANALYTICS_URLS:
+                    fetch(client, url)
+
+            def concurrent():
+                # Browsers issue the six requests in parallel
+                with ThreadPoolExecutor(len(ANALYTICS_URLS)) as executor:
+                    list(executor.map(fetch, clients, ANALYTICS_URLS))
+
+            def bundle():
+                fetch(client, '/analytics/api/bundle?days=7')
+
+            def parallel_bundle():
+                fetch(parallel_client, '/analytics/api/bundle?days=7')
+
+            def cold(function):
+                def run():
+                    analytics_cache.clear()
+                    function()
+                return run
+
+            paths = [
+                ('six requests, sequential', separate),
+                ('six requests, concurrent', concurrent),
+                ('bundle', bundle),
+                (f'bundle, {args.readers} worker threads', parallel_bundle)
+            ]
+            print(f'{tickets} tickets, analytics page data (best of 3, ms)')
+            print(f"  {'':<32} {'cold cache':>11} {'warm cache':>11}")
+            for name, function in paths:
+                cold_time, _ = timed(cold(function))
+                warm_time, _ = timed(function)
+                print(f'  {name:<32} {cold_time * 1000:>11.1f} {warm_time * 1000:>11.2f}')
+
+def bench_user_cache(args):
+    """Database work per authenticated request with and without the user cache"""
+    url = '/analytics/api/status-distribution'
+    requests = 200
+    modes = [
+        ('no user cache', 0, False),
+        ('user cache', 1024, False),
+        ('session snapshot', 1024, True)
+    ]
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+
+            print(f'{tickets} tickets, {requests} x {url} with a warm analytics cache')
+            print(f"  {'':<18} {'connections':>12} {'statements':>11} {'ms/request':>11}")
+            for name, cache_size, snapshot in modes:
+                user_cache.clear()
+                user_cache.configure(maxsize=cache_size)
+                client = analytics_client(database, snapshot=snapshot)
+                fetch(client, url)
+
+                connections = statements = 0
+                started = time.perf_counter()
+                for _ in range(requests):
+                    response = fetch(client, url)
+                    connections += int(response.headers['X-DB-Connections'])
+                    statements += int(response.headers['X-DB-Statements'])
+                elapsed = time.perf_counter() - started
+                print(f'  {name:<18} {connections / requests:>12.2f} {statements / requests:>11.2f} '
+                      f'{elapsed / requests * 1000:>11.3f}')
+
+            user_cache.configure(maxsize=1024)
+
+# Imports the app in a fresh interpreter, printing seconds until create_app
+# returns and until the prediction models are ready
+STARTUP_SCRIPT = '''
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import app
+startup = time.perf_counter() - started
+from ml_predictions import model_lifecycle
+model_lifecycle.wait_until_ready()
+print(startup, time.perf_counter() - started, model_lifecycle.state)
+'''
+
+def bench_startup(args):
+    """App startup and model-ready time for each ML_MODEL_LOADING mode"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    script = STARTUP_SCRIPT.format(root=root)
+
+    print('seconds until the app is created / until models are ready (best of 3)')
+    for models in ('saved', 'none'):
+        for mode in ('eager', 'background', 'lazy'):
+            results = []
+            for _ in range(3):
+                with tempfile.TemporaryDirectory() as directory:
+                    init_db(os.path.join(directory, 'instance', 'database.db'))
+                    if models == 'saved':
+                        shutil.copytree(os.path.join(root, 'ml_models'),
+                                        os.path.join(directory, 'ml_models'))
+                    output = subprocess.run(
+                        [sys.executable, '-c', script], cwd=directory, check=True,
+                        capture_output=True, text=True,
+                        env=dict(os.environ, ML_MODEL_LOADING=mode)
+                    ).stdout
+                    startup, ready, state = output.split()[-3:]
+                    assert state == 'ready', output
+                    results.append((float(startup), float(ready)))
+            startup, ready = min(results)
+            print(f'  models {models:<6} {mode:<11} {startup:>6.2f} / {ready:.2f}')
+
+def load_predictor():
+    """A TicketPredictor using the repository's saved models"""
+    from ml_predictions import TicketPredictor
+    predictor = TicketPredictor(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_models'))
+    assert predictor.load_models(), 'no saved models in ml_models/'
+    return predictor
+
+def bench_batch_predict(args):
+    """Per-item prediction latency: one call per description vs predict_batch"""
+    predictor = load_predictor()
+    rng = random.Random(42)
+    # The one-at-a-time path is timed on at most this many items
+    loop_sample = 200
+
+    print(f"  {'batch':>6} {'one by one':>12} {'predict_batch':>14}   (ms per item)")
+    for size in (1, 100, 10000):
+        descriptions = [random_text(rng, 30) for _ in range(size)]
+        sample = descriptions[:loop_sample]
+
+        loop_time, expected = timed(
+            lambda: [predictor.get_prediction_insights(d) for d in sample], repeat=1)
+        batch_time, results = timed(lambda: predictor.predict_batch(descriptions))
+        assert results[:len(sample)] == expected, 'batch predictions differ'
+        print(f'  {size:>6} {loop_time / len(sample) * 1000:>12.3f} '
+              f'{batch_time / size * 1000:>14.4f}')
+
+    # A repeated description reuses its cached TF-IDF row
+    from ml_predictions import feature_cache
+    description = random_text(rng, 30)
+    def uncached():
+        feature_cache.clear()
+        return predictor.get_prediction_insights(description)
+    cold, _ = timed(uncached, repeat=20)
+    warm, _ = timed(lambda: predictor.get_prediction_insights(description), repeat=20)
+    print(f'  single prediction: {cold * 1000:.3f} ms vectorizing, '
+          f'{warm * 1000:.3f} ms from the feature cache')
+
+# Trains in a fresh interpreter against instance/database.db, printing wall
+# seconds, peak RSS in KiB and the new bundle's metadata
+TRAINING_SCRIPT = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+from ml_predictions import TicketPredictor
+
+predictor = TicketPredictor('ml_models', n_jobs={n_jobs})
+predictor.load_models()
+started = time.perf_counter()
+if {mode!r} == 'incremental':
+    assert predictor.train_incremental()
+else:
+    assert predictor.train_models()
+elapsed = time.perf_counter() - started
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, peak, json.dumps(dict(predictor.bundle.metadata, save_seconds=predictor.save_seconds)))
+'''
+
+# The full retrain holds every ticket and a 100-tree forest in memory, so it
+# is only run up to this many tickets
+FULL_TRAINING_LIMIT = 100000
+
+def run_training(directory, mode, n_jobs=1):
+    """Run one training pass in a subprocess, returning (seconds, peak MiB, metadata)"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', TRAINING_SCRIPT.format(root=root, mode=mode, n_jobs=n_jobs)],
+        cwd=directory, check=True, capture_output=True, text=True
+    ).stdout
+    elapsed, peak, metadata = output.strip().splitlines()[-1].split(' ', 2)
+    return float(elapsed), int(peak) / 1024, json.loads(metadata)
+
+def bench_training(args):
+    """Wall time and peak RSS of the full retrain vs incremental training"""
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_training_db(directory, tickets)
+
+            print(f'{tickets} tickets')
+            print(f"  {'':<28} {'seconds':>8} {'peak MiB':>9} {'samples':>8}")
+            if tickets <= FULL_TRAINING_LIMIT:
+                elapsed, peak, metadata = run_training(directory, 'full')
+                print(f"  {'full retrain':<28} {elapsed:>8.1f} {peak:>9.0f} {metadata['samples']:>8}")
+            else:
+                print(f'  full retrain skipped above {FULL_TRAINING_LIMIT} tickets')
+
+            elapsed, peak, metadata = run_training(directory, 'incremental')
+            print(f"  {'incremental, first pass':<28} {elapsed:>8.1f} {peak:>9.0f} "
+                  f"{metadata['new_samples']:>8}")
+            print(f"  {'':<28} progressive accuracy {metadata.get('category_accuracy')}, "
+                  f"MAE {metadata.get('resolution_mae_hours')} hours")
+
+            # Resolve 1% of the open tickets after every earlier resolution,
+            # then train on just those
+            conn = sqlite3.connect(database)
+            conn.execute('''
+                UPDATE tickets SET status = 'resolved',
+                    resolved_at = (SELECT datetime(MAX(resolved_at), '+1 minute') FROM tickets)
+                WHERE id IN (SELECT id FROM tickets WHERE resolved_at IS NULL
+                             ORDER BY id LIMIT ?)
+            ''', (max(1, tickets // 100),))
+            conn.commit()
+            conn.close()
+
+            elapsed, peak, metadata = run_training(directory, 'incremental')
+            print(f"  {'incremental, new resolutions':<28} {elapsed:>8.1f} {peak:>9.0f} "
+                  f"{metadata['new_samples']:>8}")
+
+def create_training_db(directory, tickets):
+    """Create and seed instance/database.db in directory for TRAINING_SCRIPT"""
+    database = os.path.join(directory, 'instance', 'database.db')
+    init_db(database)
+    seed_agents(database, 20)
+    seed_tickets(database, tickets)
+    return database
+
+def bench_parallel_training(args):
+    """Per-stage full retrain times, sequential vs both models in parallel"""
+    stages = [('load', 'load'), ('preprocess', 'preprocess'), ('vectorize', 'vectorize'),
+              ('fit_category', 'fit cat.'), ('fit_resolution_time', 'fit res.'),
+              ('fit', 'fit wall'), ('evaluate', 'evaluate'), ('save', 'save')]
+    settings = [('sequential', 1), ('parallel, 2 cores', 2), (f'parallel, all {os.cpu_count()} cores', -1)]
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            create_training_db(directory, tickets)
+
+            print(f'{tickets} tickets, seconds per stage (fit is wall time for both models)')
+            print(f"  {'':<22} " + ' '.join(f'{label:>10}' for _, label in stages) + f" {'total':>8}")
+            for name, n_jobs in settings:
+                elapsed, peak, metadata = run_training(directory, 'full', n_jobs)
+                timings = dict(metadata['timings'], save=metadata['save_seconds'])
+                print(f'  {name:<22} ' + ' '.join(f'{timings[stage]:>10.2f}' for stage, _ in stages)
+                      + f' {elapsed:>8.2f}')
+
+# Loads one model version and predicts once like a server worker would,
+# reporting seconds to load and the growth in RSS and PSS (KiB). PSS splits
+# shared pages between the processes mapping them, so it is measured once
+# every worker has loaded
+ARTIFACT_WORKER_SCRIPT = '''
+import sys, time
+sys.path.insert(0, {root!r})
+from model_registry import ModelRegistry
+# Imported up front so only the artifacts are measured
+import sklearn.ensemble, sklearn.feature_extraction.text, sklearn.linear_model, sklearn.tree
+
+def memory():
+    with open('/proc/self/smaps_rollup') as f:
+        fields = dict(line.split()[:2] for line in f.readlines()[1:])
+    return int(fields['Rss:']), int(fields['Pss:'])
+
+registry = ModelRegistry({model_dir!r})
+before = memory()
+started = time.perf_counter()
+bundle = registry.load()
+elapsed = time.perf_counter() - started
+# Serve a prediction, touching the pages a request would
+X = bundle.tfidf_vectorizer.transform(['login error after password reset'])
+bundle.category_model.predict_proba(X)
+bundle.resolution_time_model.predict(X)
+print('loaded', flush=True)
+sys.stdin.readline()
+after = memory()
+print(elapsed, after[0] - before[0], after[1] - before[1], flush=True)
+'''
+
+def load_in_workers(model_dir, workers):
+    """Load the active version in several processes at once, returning
+    (mean seconds, mean RSS MiB, mean PSS MiB) per worker"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    script = ARTIFACT_WORKER_SCRIPT.format(root=root, model_dir=model_dir)
+    processes = [subprocess.Popen([sys.executable, '-c', script], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    for process in processes:
+        assert process.stdout.readline().strip() == 'loaded'
+
+    results = []
+    for process in processes:
+        process.stdin.write('\n')
+        process.stdin.flush()
+        results.append([float(value) for value in process.stdout.readline().split()])
+    for process in processes:
+        process.wait()
+
+    elapsed, rss, pss = (sum(column) / workers for column in zip(*results))
+    return elapsed, rss / 1024, pss / 1024
+
+def bench_model_artifacts(args):
+    """Disk size, load time and per-worker memory for each model artifact format"""
+    from model_registry import ModelRegistry, ARTIFACT_FORMATS, MODEL_FILES
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            create_training_db(directory, tickets)
+            print(f'{tickets} tickets, {args.workers} workers loading at once (per worker)')
+            print(f"  {'':<24} {'disk MiB':>9} {'load ms':>8} {'RSS MiB':>8} {'PSS MiB':>8}")
+
+            for mode in ('full', 'incremental'):
+                run_training(directory, mode)
+                trained = ModelRegistry(os.path.join(directory, 'ml_models'))
+                bundle = trained.load()
+                shutil.rmtree(os.path.join(directory, 'ml_models'))
+
+                for artifact_format in ARTIFACT_FORMATS:
+                    model_dir = os.path.join(directory, artifact_format)
+                    ModelRegistry(model_dir, artifact_format=artifact_format).save(bundle)
+                    disk = sum(os.path.getsize(os.path.join(model_dir, bundle.version, filename))
+                               for filename in MODEL_FILES.values())
+
+                    elapsed, rss, pss = load_in_workers(model_dir, args.workers)
+                    print(f"  {mode + ', ' + artifact_format:<24} {disk / 2 ** 20:>9.1f} "
+                          f"{elapsed * 1000:>8.1f} {rss:>8.1f} {pss:>8.1f}")
+                    shutil.rmtree(model_dir)
+
+def bench_excel_export(args):
+    """Comprehensive report: in-memory workbook vs streamed write-only workbook"""
+    from export_utils import exporter
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            print(f'{tickets} tickets')
+            print(f"  {'':<12} {'seconds':>8} {'rows/s':>8} {'peak MB':>8} {'file MB':>8}")
+            for name, streaming in (('in memory', False), ('streaming', True)):
+                report = lambda: exporter.create_comprehensive_report(streaming=streaming)
+                elapsed, output = timed(report, repeat=1)
+                size = output.seek(0, os.SEEK_END)
+                memory = peak_memory(report)
+                print(f'  {name:<12} {elapsed:>8.2f} {tickets / elapsed:>8.0f} {memory:>8.1f} '
+                      f'{size / 2 ** 20:>8.1f}')
+
+def bench_export_reads(args):
+    """Export reads: one read_sql_query frame vs chunks from iter_tickets_data"""
+    from export_utils import exporter
+
+    def whole_frame():
+        return len(exporter.format_dates(exporter.get_tickets_data()))
+
+    def chunked():
+        return sum(len(chunk) for chunk in exporter.iter_tickets_data())
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            print(f'{tickets} tickets, read and date-formatted')
+            print(f"  {'':<24} {'seconds':>8} {'peak MB':>8}")
+            for name, read in (('one frame', whole_frame), ('iter_tickets_data', chunked)):
+                elapsed, count = timed(read, repeat=1)
+                assert count == tickets
+                print(f'  {name:<24} {elapsed:>8.2f} {peak_memory(read):>8.1f}')
+
+            export = lambda: exporter.create_simple_export('tickets')
+            elapsed, _ = timed(export, repeat=1)
+            print(f"  {'simple export, streamed':<24} {elapsed:>8.2f} {peak_memory(export):>8.1f}")
+
+def bench_export_formats(args):
+    """Ticket export throughput and size for every export format"""
+    from export_utils import exporter, PYARROW_AVAILABLE
+
+    def file_size(output):
+        return output.seek(0, os.SEEK_END)
+
+    formats = [
+        ('xlsx (streamed)', lambda: file_size(exporter.create_simple_export('tickets'))),
+        ('csv', lambda: sum(len(piece) for piece in exporter.iter_csv())),
+        ('csv.gz', lambda: sum(len(piece) for piece in exporter.iter_csv(compress=True)))
+    ]
+    if PYARROW_AVAILABLE:
+        formats += [
+            ('parquet', lambda: file_size(exporter.write_columnar(file_format='parquet'))),
+            ('arrow', lambda: file_size(exporter.write_columnar(file_format='arrow')))
+        ]
+    else:
+        print('pyarrow is not installed, skipping parquet and arrow')
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            print(f'{tickets} tickets')
+            print(f"  {'':<16} {'seconds':>8} {'rows/s':>9} {'MB':>7}")
+            for name, export in formats:
+                elapsed, size = timed(export, repeat=1)
+                print(f'  {name:<16} {elapsed:>8.2f} {tickets / elapsed:>9.0f} {size / 2 ** 20:>7.1f}')
+
+def bench_export_jobs(args):
+    """Comprehensive report request latency: synchronous download vs background job"""
+    from exports import exports_bp
+    from export_jobs import export_jobs
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            client = analytics_client(database)
+            client.application.register_blueprint(exports_bp)
+            export_jobs.configure(export_dir=os.path.join(directory, 'exports'), ttl=3600,
+                                  dedupe_window=300)
+
+            print(f'{tickets} tickets')
+            elapsed, response = timed(lambda: fetch(client, '/exports/comprehensive-report'),
+                                      repeat=1)
+            print(f'  synchronous download: {elapsed:.2f} s, {len(response.data) / 2 ** 20:.1f} MB')
+
+            request_job = lambda: client.post('/exports/api/jobs',
+                                              json={'format': 'excel_comprehensive'})
+            started = time.perf_counter()
+            elapsed, response = timed(request_job, repeat=1)
+            assert response.status_code == 202, response.status_code
+            job_id = response.get_json()['job_id']
+            print(f'  job submitted in {elapsed * 1000:.1f} ms')
+
+            duplicate = request_job().get_json()
+            assert duplicate['job_id'] == job_id, 'identical request was not deduplicated'
+
+            progress = set()
+            while True:
+                job = fetch(client, f'/exports/api/jobs/{job_id}').get_json()
+                progress.add(job['progress'])
+                if job['status'] not in ('queued', 'running'):
+                    break
+                time.sleep(0.05)
+            assert job['status'] == 'succeeded', job['error']
+            print(f'  job finished in {time.perf_counter() - started:.2f} s '
+                  f'({job["duration_seconds"]:.2f} s building), {len(progress)} progress values seen, '
+                  f'{job["size_bytes"] / 2 ** 20:.1f} MB')
+
+            download = fetch(client, job['download_url'])
+            assert len(download.data) == job['size_bytes']
+            download.close()
+
+            # Expire the file now rather than waiting out the TTL
+            with write_transaction() as conn:
+                conn.execute("UPDATE export_jobs SET expires_at = datetime('now', '-1 second')")
+            assert export_jobs.sweep() == 1
+            assert client.get(job['download_url']).status_code == 410
+            assert not os.listdir(export_jobs.export_dir)
+            print('  duplicate request shared the job; download, expiry and cleanup sweep ok')
+
+def check_summary(expected, actual):
+    """Assert one-pass summary frames match get_analytics_summary's
+
+    Averages are compared to 0.01 hours, since ticket rows carry
+    resolution times rounded to two decimals.
+    """
+    for key, frame in expected.items():
+        other = actual[key]
+        assert list(frame.columns) == list(other.columns), key
+        assert len(frame) == len(other), key
+        if key in ('category_breakdown', 'priority_breakdown'):
+            # Ties in ticket_count have no defined order
+            frame = frame.sort_values(list(frame.columns[:2])).reset_index(drop=True)
+            other = other.sort_values(list(other.columns[:2])).reset_index(drop=True)
+        for column in frame.columns:
+            if column.startswith('avg_'):
+                assert ((frame[column] - other[column]).abs() < 0.01).all(), (key, column)
+            else:
+                assert frame[column].tolist() == other[column].tolist(), (key, column)
+
+def bench_export_summary(args):
+    """Export summaries: four aggregate queries vs one pass over the exported tickets"""
+    from export_utils import exporter
+
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            print(f'{tickets} tickets')
+            queries, expected = timed(exporter.get_analytics_summary, repeat=1)
+            timings = {}
+            summarized, (actual, _) = timed(
+                lambda: exporter.summarize_tickets(timings=timings), repeat=1)
+            check_summary(expected, actual)
+            print(f'  summary matches get_analytics_summary; the queries take {queries:.2f} s, '
+                  f'summarizing rows already read {timings["summarize"]:.2f} s')
+
+            timings = {}
+            elapsed, _ = timed(lambda: exporter.create_comprehensive_report(timings=timings),
+                               repeat=1)
+            phases = ', '.join(f'{phase} {seconds:.2f}' for phase, seconds in timings.items())
+            print(f'  comprehensive report {elapsed:.2f} s: {phases}')
+
+            print(f"  {'tickets preview':<24} {'seconds':>8} {'peak MB':>8}")
+            previews = (('whole frame', exporter.get_tickets_data),
+                        ('one pass', lambda: exporter.summarize_tickets(sample_size=5)))
+            for name, preview in previews:
+                elapsed, _ = timed(preview, repeat=1)
+                print(f'  {name:<24} {elapsed:>8.2f} {peak_memory(preview):>8.1f}')
+
+            overview, _ = timed(exporter.get_analytics_overview, repeat=1)
+            print(f'  analytics preview: aggregate queries {queries:.3f} s, rollups {overview:.3f} s')
+
+def bench_preprocess(args):
+    """Text cleaning per description: preprocess_text vs preprocess_texts"""
+    from ml_predictions import TicketPredictor
+    predictor = TicketPredictor(tempfile.mkdtemp())
+
+    rng = random.Random(42)
+    noise = ['ERROR', 'Login!', '404', 'v2.1', "can't", '(urgent)', 'e-mail', '\t', '  ', '\n']
+    for size in (10000, 1000000):
+        descriptions = [
+            ' '.join(rng.choice(noise) if rng.random() < 0.2 else rng.choice(WORDS)
+                     for _ in range(30))
+            for _ in range(size)
+        ]
+        one_by_one, expected = timed(
+            lambda: [predictor.preprocess_text(text) for text in descriptions], repeat=1)
+        batched, cleaned = timed(lambda: predictor.preprocess_texts(descriptions), repeat=1)
+        assert cleaned == expected, 'batch cleaning differs'
+        print(f'  {size:>8} descriptions: preprocess_text {one_by_one:.2f} s, '
+              f'preprocess_texts {batched:.2f} s ({one_by_one / batched:.1f}x), identical')
+
+def raw_time_series(days):
+    """The previous GROUP BY DATE() scans over tickets, for comparison"""
+    conn = get_read_connection()
+    created = conn.execute('''
+        SELECT DATE(created_at) as date, COUNT(*) as count FROM tickets
+        WHERE created_at >= date('now', ?) GROUP BY DATE(created_at)
+    ''', (f'-{days} days',)).fetchall()
+    resolved = conn.execute('''
+        SELECT DATE(resolved_at) as date, COUNT(*) as count FROM tickets
+        WHERE resolved_at IS NOT NULL AND resolved_at >= date('now', ?)
+        GROUP BY DATE(resolved_at)
+    ''', (f'-{days} days',)).fetchall()
+    conn.close()
+    return {row['date']: row['count'] for row in created}, {row['date']: row['count'] for row in resolved}
+
+def rollup_snapshot():
+    """Every daily rollup row, with resolution sums rounded for comparison"""
+    conn = get_read_connection()
+    rows = conn.execute('''
+        SELECT dimension, value, day, created_count, resolved_count, resolution_hours
+        FROM daily_ticket_rollups
+        WHERE created_count != 0 OR resolved_count != 0
+    ''').fetchall()
+    conn.close()
+    return {tuple(row[:5]) + (round(row[5], 3),) for row in rows}
+
+def bench_time_series(args):
+    """Time series from GROUP BY DATE() scans vs the daily rollup table"""
+    for tickets in args.tickets:
+        with tempfile.TemporaryDirectory() as directory:
+            database = create_benchmark_db(directory, tickets)
+            configure_storage(database)
+
+            print(f'{tickets} tickets (best of 3, ms)')
+            print(f"  {'days':>5} {'raw scan':>9} {'rollups':>8}")
+            for days in (30, 90, 365):
+                raw_time, (created, resolved) = timed(lambda: raw_time_series(days))
+                analytics_cache.clear()
+                rollup_time, series = timed(
+                    lambda: (analytics_cache.clear(), Analytics.get_time_series_data(days))[1])
+                for point in series:
+                    assert point['created'] == created.get(point['date'], 0), point
+                    assert point['resolved'] == resolved.get(point['date'], 0), point
+                print(f'  {days:>5} {raw_time * 1000:>9.1f} {rollup_time * 1000:>8.2f}')
+
+            # Triggers must leave the rollups exactly as a rebuild would
+            rng = random.Random(7)
+            started = time.perf_counter()
+            for ticket_id in rng.sample(range(1, tickets + 1), min(200, tickets)):
+                action = rng.choice(['resolve', 'reprioritize', 'reassign', 'delete'])
+                if action == 'resolve':
+                    Ticket.update(ticket_id, status='resolved')
+                elif action == 'reprioritize':
+                    Ticket.update(ticket_id, priority=rng.choice(PRIORITIES))
+                elif action == 'reassign':
+                    Ticket.update(ticket_id, assigned_to=rng.randint(1, 20), category_id=rng.randint(1, 5))
+                else:
+                    Ticket.delete(ticket_id)
+            writes = time.perf_counter() - started
+            incremental = rollup_snapshot()
+            Analytics.rebuild_daily_rollups()
+            assert incremental == rollup_snapshot(), 'rollups drifted from a rebuild'
+            rebuild, _ = timed(Analytics.rebuild_daily_rollups, repeat=1)
+            print(f'  200 random writes {writes * 1000:.0f} ms, rollups match a rebuild '
+                  f'({rebuild * 1000:.0f} ms)')
+
+BENCHMARKS = {
+    'storage': bench_storage,
+    'pagination': bench_pagination,
+    'agent-dashboard': bench_agent_dashboard,
+    'search': bench_search,
+    'analytics-bundle': bench_analytics_bundle,
+    'time-series': bench_time_series,
+    'user-cache': bench_user_cache,
+    'startup': bench_startup,
+    'batch-predict': bench_batch_predict,
+    'training': bench_training,
+    'parallel-training': bench_parallel_training,
+    'preprocess': bench_preprocess,
+    'model-artifacts': bench_model_artifacts,
+    'excel-export': bench_excel_export,
+    'export-reads': bench_export_reads,
+    'export-formats': bench_export_formats,
+    'export-jobs': bench_export_jobs,
+    'export-summary': bench_export_summary
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run performance benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--tickets', type=int, nargs='+', default=[10000],
+                        help='database sizes to run against')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--per-page', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=4,
+                        help='worker processes for model-artifacts')
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,126 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Returned by LRUCache.get() when a key is absent or expired
+MISSING = object()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+    
+    def __init__(self, name, maxsize=256, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Counters exposed through stats()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        
+        with _caches_lock:
+            _caches[name] = self
+    
+    def configure(self, maxsize=None, ttl=None):
+        """Change the size limit or TTL, trimming the cache if needed"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def get(self, key, default=MISSING):
+        """Get a cached value, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+    
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def delete(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Get cache usage statistics"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0,
+                'evictions': self._evictions,
+                'expirations': self._expirations
+            }
+
+def cached(cache, version=None):
+    """Cache a function's results in an LRUCache keyed by its arguments
+    
+    version is an optional callable whose return value is added to the key,
+    so bumping it makes every earlier entry unreachable. Callers get their
+    own deep copy of the result, so mutating it never changes the cache.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (function.__qualname__, args, tuple(sorted(kwargs.items())))
+            if version is not None:
+                key += (version(),)
+            
+            value = cache.get(key)
+            if value is MISSING:
+                value = function(*args, **kwargs)
+                cache.set(key, copy.deepcopy(value))
+                return value
+            return copy.deepcopy(value)
+        
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def get_cache_stats():
+    """Get statistics for every cache, by name"""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
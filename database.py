@@ -1,15 +1,375 @@
 import sqlite3
+import gc
 import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import quote
 from werkzeug.security import generate_password_hash
-from datetime import datetime
+from flask import g, has_app_context
 
-def init_db():
+DATABASE_PATH = 'instance/database.db'
+
+# PRAGMAs applied once when a pooled connection is opened
+CONNECTION_PRAGMAS = {
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000
+}
+
+# Storage tuning, each overridable through app config as SQLITE_<NAME>
+STORAGE_DEFAULTS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,       # negative values are KiB, so ~20 MB
+    'mmap_size': 268435456,     # 256 MB
+    'temp_store': 'MEMORY'
+}
+
+# PRAGMAs that persist in the database file and need a writable connection
+PERSISTENT_PRAGMAS = ('journal_mode',)
+
+# Recount ticket_counters from scratch (migration 3 and stats repair)
+REBUILD_TICKET_COUNTERS = [
+    'DELETE FROM ticket_counters',
+    "INSERT INTO ticket_counters (dimension, value, count) SELECT 'total', '', COUNT(*) FROM tickets",
+    '''INSERT INTO ticket_counters (dimension, value, count)
+       SELECT 'status', status, COUNT(*) FROM tickets GROUP BY status''',
+    '''INSERT INTO ticket_counters (dimension, value, count)
+       SELECT 'priority', priority, COUNT(*) FROM tickets GROUP BY priority'''
+]
+
+# Repopulate the full-text index (migration 5 and the rebuild-search command)
+REBUILD_TICKET_SEARCH = [
+    'DELETE FROM tickets_fts',
+    '''INSERT INTO tickets_fts (rowid, title, description, comments)
+       SELECT t.id, t.title, t.description,
+              COALESCE((SELECT group_concat(comment, ' ') FROM comments WHERE ticket_id = t.id), '')
+       FROM tickets t'''
+]
+
+# Dimensions of the daily rollups: name and value expression ({row} is "NEW.",
+# "OLD." or empty). Missing categories and assignees roll up under ''.
+ROLLUP_DIMENSIONS = [
+    ('total', "''"),
+    ('category', "COALESCE({row}category_id, '')"),
+    ('priority', '{row}priority'),
+    ('agent', "COALESCE({row}assigned_to, '')")
+]
+
+# Repopulate the daily rollups (migration 7 and the rebuild-rollups command).
+# Tickets count as created on the day of created_at and as resolved, with
+# their resolution time, on the day of resolved_at.
+REBUILD_DAILY_ROLLUPS = ['DELETE FROM daily_ticket_rollups'] + [
+    f'''INSERT INTO daily_ticket_rollups
+           (dimension, value, day, created_count, resolved_count, resolution_hours)
+       SELECT '{dimension}', value, day, SUM(created), SUM(resolved), SUM(hours)
+       FROM (
+           SELECT {expression.format(row='')} AS value, DATE(created_at) AS day,
+                  1 AS created, 0 AS resolved, 0.0 AS hours
+           FROM tickets
+           UNION ALL
+           SELECT {expression.format(row='')}, DATE(resolved_at), 0, 1,
+                  (JULIANDAY(resolved_at) - JULIANDAY(created_at)) * 24
+           FROM tickets WHERE resolved_at IS NOT NULL
+       )
+       GROUP BY value, day'''
+    for dimension, expression in ROLLUP_DIMENSIONS
+]
+
+def _rollup_delta(row, sign):
+    """Trigger SQL adding (sign '') or removing (sign '-') one ticket row's
+    contribution to the daily rollups"""
+    dimensions = ' UNION ALL '.join(
+        f"SELECT '{dimension}' AS dimension, {expression.format(row=row + '.')} AS value"
+        for dimension, expression in ROLLUP_DIMENSIONS
+    )
+    return f'''
+            INSERT INTO daily_ticket_rollups (dimension, value, day, created_count)
+            SELECT dimension, value, DATE({row}.created_at), {sign}1 FROM ({dimensions})
+            WHERE {row}.created_at IS NOT NULL
+            ON CONFLICT (dimension, value, day)
+            DO UPDATE SET created_count = created_count + excluded.created_count;
+            INSERT INTO daily_ticket_rollups (dimension, value, day, resolved_count, resolution_hours)
+            SELECT dimension, value, DATE({row}.resolved_at), {sign}1,
+                   {sign}(JULIANDAY({row}.resolved_at) - JULIANDAY({row}.created_at)) * 24
+            FROM ({dimensions})
+            WHERE {row}.resolved_at IS NOT NULL
+            ON CONFLICT (dimension, value, day)
+            DO UPDATE SET resolved_count = resolved_count + excluded.resolved_count,
+                          resolution_hours = resolution_hours + excluded.resolution_hours;'''
+
+# Recompute the comments column of one ticket's search row
+_SYNC_SEARCH_COMMENTS = '''
+    UPDATE tickets_fts
+    SET comments = COALESCE((SELECT group_concat(comment, ' ') FROM comments
+                             WHERE ticket_id = {row}.ticket_id), '')
+    WHERE rowid = {row}.ticket_id;
+'''
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have run, so append new entries and never edit or reorder existing ones.
+MIGRATIONS = [
+    # 1: indexes matched to Ticket.get_all, Comment.get_by_ticket and Analytics
+    [
+        'CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tickets_updated_at ON tickets (updated_at)',
+        # Status and priority filters in the default newest-first order; sorting
+        # by status or priority itself needs the (field, id) indexes of migration 2
+        'CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tickets_priority ON tickets (priority, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tickets_created_by ON tickets (created_by, created_at)',
+        # Covers the agent performance join (status, resolution time)
+        'CREATE INDEX IF NOT EXISTS idx_tickets_assigned_to '
+        'ON tickets (assigned_to, status, resolved_at, created_at)',
+        # Covers the per-category count and resolution time joins
+        'CREATE INDEX IF NOT EXISTS idx_tickets_category '
+        'ON tickets (category_id, resolved_at, created_at)',
+        # Covers average resolution time and the resolution time series
+        'CREATE INDEX IF NOT EXISTS idx_tickets_resolved_at ON tickets (resolved_at, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_comments_ticket ON comments (ticket_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_custom_dashboards_user '
+        'ON custom_dashboards (user_id, created_at)'
+    ],
+    # 2: (sort field, id) order for keyset pagination on the remaining sort fields
+    [
+        'CREATE INDEX IF NOT EXISTS idx_tickets_title ON tickets (title)',
+        'CREATE INDEX IF NOT EXISTS idx_tickets_status_id ON tickets (status, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tickets_priority_id ON tickets (priority, id)'
+    ],
+    # 3: ticket counts by status and priority, kept current by triggers
+    [
+        '''CREATE TABLE IF NOT EXISTS ticket_counters (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT OR IGNORE INTO ticket_counters (dimension, value)
+            VALUES ('status', NEW.status), ('priority', NEW.priority);
+            UPDATE ticket_counters SET count = count + 1
+            WHERE dimension = 'total'
+               OR (dimension = 'status' AND value = NEW.status)
+               OR (dimension = 'priority' AND value = NEW.priority);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_delete AFTER DELETE ON tickets
+        BEGIN
+            UPDATE ticket_counters SET count = count - 1
+            WHERE dimension = 'total'
+               OR (dimension = 'status' AND value = OLD.status)
+               OR (dimension = 'priority' AND value = OLD.priority);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_update AFTER UPDATE OF status, priority ON tickets
+        WHEN OLD.status IS NOT NEW.status OR OLD.priority IS NOT NEW.priority
+        BEGIN
+            INSERT OR IGNORE INTO ticket_counters (dimension, value)
+            VALUES ('status', NEW.status), ('priority', NEW.priority);
+            UPDATE ticket_counters SET count = count - 1
+            WHERE (dimension = 'status' AND value = OLD.status)
+               OR (dimension = 'priority' AND value = OLD.priority);
+            UPDATE ticket_counters SET count = count + 1
+            WHERE (dimension = 'status' AND value = NEW.status)
+               OR (dimension = 'priority' AND value = NEW.priority);
+        END'''
+    ] + REBUILD_TICKET_COUNTERS,
+    # 4: covering indexes for the agent dashboard (status counts, newest tickets)
+    [
+        'CREATE INDEX IF NOT EXISTS idx_tickets_created_by_status '
+        'ON tickets (created_by, status, assigned_to)',
+        'CREATE INDEX IF NOT EXISTS idx_tickets_assigned_created ON tickets (assigned_to, created_at)'
+    ],
+    # 5: full-text search over ticket title, description and comments
+    [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+            title, description, comments,
+            tokenize = 'porter unicode61',
+            prefix = '2 3'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (rowid, title, description, comments)
+            VALUES (NEW.id, NEW.title, NEW.description, '');
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_update AFTER UPDATE OF title, description ON tickets
+        BEGIN
+            UPDATE tickets_fts SET title = NEW.title, description = NEW.description
+            WHERE rowid = NEW.id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_delete AFTER DELETE ON tickets
+        BEGIN
+            DELETE FROM tickets_fts WHERE rowid = OLD.id;
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_comment_insert AFTER INSERT ON comments
+        BEGIN
+            {_SYNC_SEARCH_COMMENTS.format(row='NEW')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_comment_delete AFTER DELETE ON comments
+        BEGIN
+            {_SYNC_SEARCH_COMMENTS.format(row='OLD')}
+        END'''
+    ] + REBUILD_TICKET_SEARCH,
+    # 6: version counter bumped by every data write, for cache invalidation
+    [
+        '''CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID''',
+        "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('data', 0)",
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_tickets_insert AFTER INSERT ON tickets
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_tickets_update AFTER UPDATE ON tickets
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_tickets_delete AFTER DELETE ON tickets
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_comments_insert AFTER INSERT ON comments
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_comments_delete AFTER DELETE ON comments
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_users_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_data_version_users_update AFTER UPDATE ON users
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'data';
+        END'''
+    ],
+    # 7: per-day created/resolved counts and resolution time sums, overall and
+    # by category, priority and agent, kept current by triggers
+    [
+        '''CREATE TABLE IF NOT EXISTS daily_ticket_rollups (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            day TEXT NOT NULL,
+            created_count INTEGER NOT NULL DEFAULT 0,
+            resolved_count INTEGER NOT NULL DEFAULT 0,
+            resolution_hours REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value, day)
+        ) WITHOUT ROWID''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_daily_rollups_insert AFTER INSERT ON tickets
+        BEGIN{_rollup_delta('NEW', '')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_daily_rollups_delete AFTER DELETE ON tickets
+        BEGIN{_rollup_delta('OLD', '-')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_daily_rollups_update
+        AFTER UPDATE OF created_at, resolved_at, category_id, priority, assigned_to ON tickets
+        WHEN OLD.created_at IS NOT NEW.created_at OR OLD.resolved_at IS NOT NEW.resolved_at
+          OR OLD.category_id IS NOT NEW.category_id OR OLD.priority IS NOT NEW.priority
+          OR OLD.assigned_to IS NOT NEW.assigned_to
+        BEGIN{_rollup_delta('OLD', '-')}{_rollup_delta('NEW', '')}
+        END'''
+    ] + REBUILD_DAILY_ROLLUPS,
+    # 8: background model training jobs
+    [
+        '''CREATE TABLE IF NOT EXISTS training_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            source TEXT NOT NULL DEFAULT 'manual',
+            requested_by INTEGER,
+            stage TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            model_version TEXT,
+            metrics TEXT,
+            error TEXT,
+            duration_seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (requested_by) REFERENCES users (id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_training_jobs_status ON training_jobs (status, updated_at)'
+    ],
+    # 9: incremental training mode. Its ticket stream uses idx_tickets_resolved_at,
+    # sorting only tickets resolved in the same second by id
+    [
+        "ALTER TABLE training_jobs ADD COLUMN mode TEXT NOT NULL DEFAULT 'full'"
+    ],
+    # 10: background export jobs and the files they leave for download
+    [
+        '''CREATE TABLE IF NOT EXISTS export_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            export_format TEXT NOT NULL,
+            filters TEXT NOT NULL DEFAULT '{}',
+            request_key TEXT NOT NULL,
+            requested_by INTEGER,
+            progress REAL NOT NULL DEFAULT 0,
+            rows INTEGER,
+            file_name TEXT,
+            size_bytes INTEGER,
+            error TEXT,
+            duration_seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (requested_by) REFERENCES users (id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_export_jobs_request ON export_jobs (request_key, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_export_jobs_status ON export_jobs (status, expires_at)'
+    ],
+    # 11: seconds per phase of generating an export
+    [
+        'ALTER TABLE export_jobs ADD COLUMN timings TEXT'
+    ]
+]
+
+def get_schema_version(conn):
+    """Get the number of migrations applied to a database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction"""
+    version = get_schema_version(conn)
+    
+    # Tables are created by init_db(), nothing to migrate until then
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tickets'"
+    ).fetchone():
+        return version
+    
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {number}")
+    
+    return get_schema_version(conn)
+
+def init_db(database=None):
     """Initialize the database with required tables"""
+    database = database or DATABASE_PATH
+    
     # Create instance directory if it doesn't exist
-    if not os.path.exists('instance'):
-        os.makedirs('instance')
+    db_dir = os.path.dirname(database)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
     
-    conn = sqlite3.connect('instance/database.db')
+    conn = sqlite3.connect(database)
+    conn.execute(f"PRAGMA journal_mode = {STORAGE_DEFAULTS['journal_mode']}")
     cursor = conn.cursor()
     
     # Create users table
@@ -120,14 +480,370 @@ def init_db():
         ''', default_categories)
     
     conn.commit()
+    migrate(conn)
     conn.close()
     print("Database initialized successfully!")
 
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that returns to its pool instead of closing"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.request_scoped = False
+        self.checked_out = False
+    
+    def close(self):
+        """Discard any uncommitted work and hand the connection back"""
+        if self.pool is None:
+            return super().close()
+        
+        self.rollback()
+        
+        # Request-scoped connections stay checked out until teardown
+        if not self.request_scoped:
+            self.pool.release(self)
+    
+    def close_raw(self):
+        """Really close the underlying SQLite handle"""
+        super().close()
+
+def count_request_statement(statement):
+    """Trace callback counting the SQL statements run by the current request"""
+    if has_app_context():
+        g.db_statements = g.get('db_statements', 0) + 1
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections"""
+    
+    def __init__(self, database, max_connections=10, timeout=30.0, pragmas=None,
+                 read_only=False):
+        self.database = database
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pragmas = dict(CONNECTION_PRAGMAS if pragmas is None else pragmas)
+        self.read_only = read_only
+        self.trace_callback = count_request_statement
+        
+        self._idle = deque()
+        self._open = 0
+        self._condition = threading.Condition()
+        
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._created = 0
+        self._closed = 0
+        self._reclaimed = 0
+        self._peak_in_use = 0
+    
+    def _connect(self):
+        """Open a new connection and apply the PRAGMAs once"""
+        if self.read_only:
+            uri = f'file:{quote(os.path.abspath(self.database))}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, factory=PooledConnection,
+                                   check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.database, factory=PooledConnection,
+                                   check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            if name in PERSISTENT_PRAGMAS:
+                continue
+            conn.execute(f'PRAGMA {name} = {value}')
+        if self.trace_callback is not None:
+            conn.set_trace_callback(self.trace_callback)
+        conn.pool = self
+        # Frees the slot if a checked-out connection is dropped without close()
+        conn.finalizer = weakref.finalize(conn, self._reclaim)
+        return conn
+    
+    def acquire(self):
+        """Check a connection out of the pool, waiting if it is exhausted"""
+        with self._condition:
+            self._checkouts += 1
+            
+            if not self._idle and self._open >= self.max_connections:
+                # A connection dropped without close() is only freed by the
+                # cycle collector (it references its own statement cache)
+                gc.collect()
+            
+            if not self._idle and self._open >= self.max_connections:
+                self._waits += 1
+                started = time.monotonic()
+                available = self._condition.wait_for(
+                    lambda: self._idle or self._open < self.max_connections,
+                    timeout=self.timeout
+                )
+                self._wait_time += time.monotonic() - started
+                if not available:
+                    raise TimeoutError(
+                        f'No database connection available after {self.timeout}s'
+                    )
+            
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = None
+                self._open += 1
+        
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._condition:
+                    self._open -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._created += 1
+        
+        conn.checked_out = True
+        with self._condition:
+            self._peak_in_use = max(self._peak_in_use, self._open - len(self._idle))
+        if has_app_context():
+            g.db_checkouts = g.get('db_checkouts', 0) + 1
+        return conn
+    
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if not conn.checked_out:
+            return
+        
+        conn.checked_out = False
+        conn.request_scoped = False
+        
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection - drop it rather than recycle it
+            self._discard(conn)
+            return
+        
+        with self._condition:
+            self._idle.append(conn)
+            self._condition.notify()
+    
+    def _discard(self, conn):
+        """Close a connection and free its slot"""
+        conn.finalizer.detach()
+        try:
+            conn.close_raw()
+        except sqlite3.Error:
+            pass
+        with self._condition:
+            self._open -= 1
+            self._closed += 1
+            self._condition.notify()
+    
+    def _reclaim(self):
+        """Free the slot of a connection garbage collected while checked out"""
+        with self._condition:
+            self._open -= 1
+            self._reclaimed += 1
+            self._condition.notify()
+    
+    def close_all(self):
+        """Close every idle connection"""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+    
+    def stats(self):
+        """Get pool usage statistics"""
+        with self._condition:
+            idle = len(self._idle)
+            return {
+                'database': self.database,
+                'read_only': self.read_only,
+                'max_connections': self.max_connections,
+                'open_connections': self._open,
+                'idle_connections': idle,
+                'in_use_connections': self._open - idle,
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'total_wait_seconds': round(self._wait_time, 4),
+                'connections_created': self._created,
+                'connections_closed': self._closed,
+                'connections_reclaimed': self._reclaimed
+            }
+
+_pool = None
+_read_pool = None
+_writer_pool = None
+_pool_lock = threading.RLock()
+_writer_state = threading.local()
+
+def configure_storage(database=DATABASE_PATH, max_connections=10, timeout=30.0, storage=None):
+    """Replace the global pools: read/write, read-only and the single writer"""
+    global _pool, _read_pool, _writer_pool
+    
+    settings = dict(STORAGE_DEFAULTS)
+    settings.update(storage or {})
+    pragmas = dict(CONNECTION_PRAGMAS)
+    pragmas.update(settings)
+    
+    with _pool_lock:
+        old_pools = [_pool, _read_pool, _writer_pool]
+        _writer_pool = ConnectionPool(database, 1, timeout, pragmas)
+        _pool = ConnectionPool(database, max_connections, timeout, pragmas)
+        _read_pool = ConnectionPool(database, max_connections, timeout, pragmas,
+                                    read_only=True)
+    
+    for old_pool in old_pools:
+        if old_pool is not None:
+            old_pool.close_all()
+    
+    # Journal mode is stored in the database file, so set it once up front
+    # and bring the schema up to date before any request runs
+    if os.path.exists(database):
+        conn = _writer_pool.acquire()
+        try:
+            for name in PERSISTENT_PRAGMAS:
+                conn.execute(f'PRAGMA {name} = {settings[name]}')
+            migrate(conn)
+        finally:
+            _writer_pool.release(conn)
+    
+    return _pool
+
+def get_pool():
+    """Get the global read/write connection pool, creating it on first use"""
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                configure_storage()
+    return _pool
+
+def get_read_pool():
+    """Get the global read-only connection pool"""
+    get_pool()
+    return _read_pool
+
+def get_writer_pool():
+    """Get the single-connection writer pool"""
+    get_pool()
+    return _writer_pool
+
+def get_pool_stats():
+    """Get statistics for all connection pools"""
+    return {
+        'read_write': get_pool().stats(),
+        'read_only': get_read_pool().stats(),
+        'writer': get_writer_pool().stats()
+    }
+
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('instance/database.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get database connection
+    
+    Inside a Flask app context the same pooled connection is reused for the
+    whole request and released on teardown; elsewhere the caller owns the
+    connection until it calls close().
+    """
+    if has_app_context():
+        if 'db' not in g:
+            conn = get_pool().acquire()
+            conn.request_scoped = True
+            g.db = conn
+        return g.db
+    
+    return get_pool().acquire()
+
+def get_read_connection():
+    """Get a read-only database connection for reporting queries
+    
+    Uses a mode=ro URI so analytics, exports and prediction insights can
+    never take a write lock; with WAL they also never wait on writers.
+    """
+    if has_app_context():
+        if 'read_db' not in g:
+            conn = get_read_pool().acquire()
+            conn.request_scoped = True
+            g.read_db = conn
+        return g.read_db
+    
+    return get_read_pool().acquire()
+
+@contextmanager
+def write_transaction():
+    """Run a write on the single serialized writer connection
+    
+    Commits on success and rolls back on error. Nested calls on the same
+    thread join the outer transaction.
+    """
+    conn = getattr(_writer_state, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    
+    pool = get_writer_pool()
+    conn = pool.acquire()
+    _writer_state.conn = conn
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _writer_state.conn = None
+        pool.release(conn)
+
+def get_data_version():
+    """Get the counter bumped by every ticket, comment and user write
+    
+    It lives in the database rather than in memory so that caches in every
+    worker process see writes made by the others.
+    """
+    conn = get_read_connection()
+    row = conn.execute("SELECT version FROM data_versions WHERE name = 'data'").fetchone()
+    conn.close()
+    return row['version'] if row else 0
+
+def get_request_db_stats():
+    """Connections checked out and statements run by the current request"""
+    return {
+        'connections': g.get('db_checkouts', 0),
+        'statements': g.get('db_statements', 0)
+    }
+
+def add_request_db_stats(response):
+    """Report the request's database usage in X-DB-* response headers"""
+    stats = get_request_db_stats()
+    response.headers['X-DB-Connections'] = str(stats['connections'])
+    response.headers['X-DB-Statements'] = str(stats['statements'])
+    return response
+
+def close_db(exception=None):
+    """Release the request-scoped connections back to their pools"""
+    for key in ('db', 'read_db'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            conn.pool.release(conn)
+
+def init_app(app):
+    """Configure the connection pools from app config and register teardown"""
+    storage = {}
+    for name in STORAGE_DEFAULTS:
+        key = f'SQLITE_{name.upper()}'
+        if key in app.config:
+            storage[name] = app.config[key]
+    
+    configure_storage(
+        database=app.config.get('DATABASE', DATABASE_PATH),
+        max_connections=app.config.get('DB_POOL_SIZE', 10),
+        timeout=app.config.get('DB_POOL_TIMEOUT', 30.0),
+        storage=storage
+    )
+    app.teardown_appcontext(close_db)
+    if app.config.get('DB_REQUEST_STATS'):
+        app.after_request(add_request_db_stats)
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from database import get_read_connection, write_transaction
+from export_utils import exporter, EXPORT_FORMATS
+
+# Jobs in these states are still building their file
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Seconds between progress updates written by a running job
+PROGRESS_INTERVAL = 1.0
+
+def request_key(export_format, filters):
+    """Key identifying identical export requests: the format and its filters"""
+    request = json.dumps({'format': export_format, 'filters': filters or {}}, sort_keys=True)
+    return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+def sqlite_timestamp(seconds_from_now=0):
+    """A UTC time in the format CURRENT_TIMESTAMP uses, so the two compare as text"""
+    moment = datetime.now(timezone.utc) + timedelta(seconds=seconds_from_now)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+class ExportJobQueue:
+    """Builds export files out of band and keeps them for download
+    
+    Jobs are recorded in the export_jobs table and files are written to
+    export_dir, so any worker process can report on a job and serve its
+    file. An identical request (same user, format and filters) made within
+    dedupe_window seconds of a job that is still running, or whose file
+    has not expired, gets that job instead of a new one. Files expire ttl
+    seconds after they are finished and are deleted by sweep().
+    """
+    
+    def __init__(self, exporter, export_dir=os.path.join('instance', 'exports'), workers=2,
+                 ttl=3600, dedupe_window=300, stale_after=3600):
+        self.exporter = exporter
+        self.export_dir = export_dir
+        self.workers = workers
+        self.ttl = ttl
+        self.dedupe_window = dedupe_window
+        self.stale_after = stale_after
+        # Created on first submit, so the worker count can be configured first
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+    
+    def configure(self, export_dir=None, workers=None, ttl=None, dedupe_window=None):
+        """Change where files are written, the worker count, TTL or dedupe window"""
+        if export_dir is not None:
+            self.export_dir = export_dir
+        if workers is not None:
+            self.workers = workers
+        if ttl is not None:
+            self.ttl = ttl
+        if dedupe_window is not None:
+            self.dedupe_window = dedupe_window
+    
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='export-job')
+            return self._executor
+    
+    def submit(self, export_format, filters=None, requested_by=None):
+        """Queue an export unless an identical one can be reused
+        
+        Returns (job_id, created); job_id is the existing job when
+        deduplicated.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f'Unknown export format: {export_format}')
+        
+        filters = filters or {}
+        key = request_key(export_format, filters)
+        
+        with write_transaction() as conn:
+            self._expire_stale(conn)
+            
+            existing = conn.execute(f'''
+                SELECT id FROM export_jobs
+                WHERE request_key = ? AND requested_by IS ?
+                AND created_at >= datetime('now', ?)
+                AND (status IN {ACTIVE_STATUSES}
+                     OR (status = 'succeeded' AND expires_at > CURRENT_TIMESTAMP))
+                ORDER BY id DESC LIMIT 1
+            ''', (key, requested_by, f'-{int(self.dedupe_window)} seconds')).fetchone()
+            if existing:
+                return existing['id'], False
+            
+            cursor = conn.execute(
+                'INSERT INTO export_jobs (export_format, filters, request_key, requested_by) '
+                'VALUES (?, ?, ?, ?)',
+                (export_format, json.dumps(filters), key, requested_by)
+            )
+            job_id = cursor.lastrowid
+        
+        self._get_executor().submit(self._run, job_id, export_format, filters)
+        return job_id, True
+    
+    def _expire_stale(self, conn):
+        """Fail active jobs that stopped reporting progress"""
+        conn.execute(f'''
+            UPDATE export_jobs
+            SET status = 'failed', error = 'Job stopped reporting progress',
+                finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE status IN {ACTIVE_STATUSES} AND updated_at < datetime('now', ?)
+        ''', (f'-{int(self.stale_after)} seconds',))
+    
+    def _update(self, job_id, stamp=None, **fields):
+        """Update a job's columns, setting the stamp column to the current time"""
+        assignments = [f'{column} = ?' for column in fields]
+        assignments.append('updated_at = CURRENT_TIMESTAMP')
+        if stamp:
+            assignments.append(f'{stamp} = CURRENT_TIMESTAMP')
+        
+        with write_transaction() as conn:
+            conn.execute(
+                f"UPDATE export_jobs SET {', '.join(assignments)} WHERE id = ?",
+                list(fields.values()) + [job_id]
+            )
+    
+    def file_path(self, job):
+        """Path of a job's export file"""
+        return os.path.join(self.export_dir, job['file_name'])
+    
+    def _run(self, job_id, export_format, filters):
+        """Write one job's export file, recording progress and the outcome"""
+        started = time.perf_counter()
+        self._update(job_id, stamp='started_at', status='running', progress=0.0)
+        
+        extension = EXPORT_FORMATS[export_format][0]
+        file_name = f'export-{job_id}{extension}'
+        path = os.path.join(self.export_dir, file_name)
+        # Written under a temporary name and renamed, so a download never
+        # sees a partly written file
+        temporary = path + '.tmp'
+        
+        try:
+            total = self.exporter.count_tickets(**self.exporter.filter_args(filters))
+            timings = {}
+            last_update = time.monotonic()
+            
+            def progress(rows):
+                nonlocal last_update
+                if total and time.monotonic() - last_update >= PROGRESS_INTERVAL:
+                    last_update = time.monotonic()
+                    self._update(job_id, progress=round(min(rows / total, 0.99), 4), rows=rows)
+            
+            os.makedirs(self.export_dir, exist_ok=True)
+            with open(temporary, 'wb') as output:
+                self.exporter.write_export(export_format, output, filters, progress=progress,
+                                           timings=timings)
+            os.replace(temporary, path)
+            
+            self._update(job_id, stamp='finished_at', status='succeeded', progress=1.0,
+                         rows=total, file_name=file_name, size_bytes=os.path.getsize(path),
+                         expires_at=sqlite_timestamp(self.ttl),
+                         timings=json.dumps(timings) if timings else None,
+                         duration_seconds=round(time.perf_counter() - started, 3))
+        except Exception as e:
+            print(f"Export job {job_id} failed: {e}")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            self._update(job_id, stamp='finished_at', status='failed', error=str(e),
+                         duration_seconds=round(time.perf_counter() - started, 3))
+    
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job['filters'] = json.loads(job['filters'])
+        job['timings'] = json.loads(job['timings']) if job['timings'] else None
+        return job
+    
+    def get(self, job_id):
+        """Get a job by id"""
+        conn = get_read_connection()
+        row = conn.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._to_dict(row) if row else None
+    
+    def sweep(self):
+        """Expire finished jobs past their TTL and delete their files
+        
+        Leftover temporary files older than stale_after, from a process that
+        died mid-export, are deleted too. Returns the number of jobs expired.
+        """
+        with write_transaction() as conn:
+            self._expire_stale(conn)
+            expired = conn.execute(
+                "SELECT id, file_name FROM export_jobs "
+                "WHERE status = 'succeeded' AND expires_at <= CURRENT_TIMESTAMP"
+            ).fetchall()
+            conn.executemany(
+                "UPDATE export_jobs SET status = 'expired', updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = ?",
+                [(job['id'],) for job in expired]
+            )
+        
+        for job in expired:
+            try:
+                os.remove(self.file_path(job))
+            except FileNotFoundError:
+                pass
+        
+        if os.path.isdir(self.export_dir):
+            cutoff = time.time() - self.stale_after
+            for name in os.listdir(self.export_dir):
+                path = os.path.join(self.export_dir, name)
+                if name.endswith('.tmp') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        
+        return len(expired)
+    
+    def start_cleanup(self, interval_seconds=300):
+        """Run sweep() every interval_seconds in a background thread"""
+        if self._sweeper is not None:
+            return
+        
+        def cleanup():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Error cleaning up export files: {e}")
+        
+        self._sweeper = threading.Thread(target=cleanup, name='export-cleanup', daemon=True)
+        self._sweeper.start()
+    
+    def stop(self):
+        """Stop the cleanup sweep and wait for running jobs to finish"""
+        self._stop.set()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+
+# Global job queue for the global exporter
+export_jobs = ExportJobQueue(exporter)
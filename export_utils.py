@@ -1,71 +1,339 @@
 import pandas as pd
-import sqlite3
 from datetime import datetime, timedelta
 import os
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from functools import cache
+from importlib.util import find_spec
 from io import BytesIO
+from itertools import chain, islice
+from tempfile import SpooledTemporaryFile
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.chart import BarChart, PieChart, LineChart, Reference
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from database import DATABASE_PATH, get_read_connection
+
+# Streamed exports are kept in memory up to this size, then spill to disk
+EXPORT_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Rows a streamed sheet's column widths are computed from
+COLUMN_WIDTH_SAMPLE = 1000
+
+# Tickets fetched and formatted at a time by iter_tickets_data
+EXPORT_CHUNK_SIZE = 5000
+
+# Parquet and Arrow exports need the optional pyarrow package
+PYARROW_AVAILABLE = find_spec('pyarrow') is not None
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Every export ExcelExporter.write_export can produce: (extension, mimetype)
+EXPORT_FORMATS = {
+    'excel_simple': ('.xlsx', XLSX_MIMETYPE),
+    'excel_comprehensive': ('.xlsx', XLSX_MIMETYPE),
+    'csv': ('.csv', 'text/csv'),
+    'csv_gzip': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file')
+}
+
+def frame_rows(df):
+    """A DataFrame's rows as tuples, with missing values as None"""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+def chunk_rows(chunks):
+    """(header, rows) for a sequence of DataFrame chunks, read one chunk at a time"""
+    chunks = iter(chunks)
+    first = next(chunks)
+    rows = chain.from_iterable(frame_rows(chunk) for chunk in chain([first], chunks))
+    return list(first.columns), rows
+
+class PhaseTimer:
+    """Wall-clock seconds spent in each named phase of generating an export
+    
+    Phases may nest; time spent in an inner phase is charged to it alone,
+    not to the phase it interrupted.
+    """
+    
+    def __init__(self):
+        self._seconds = {}
+        self._active = []
+        self._mark = None
+    
+    def _charge(self, now):
+        name = self._active[-1]
+        self._seconds[name] = self._seconds.get(name, 0.0) + now - self._mark
+        self._mark = now
+    
+    @contextmanager
+    def phase(self, name):
+        """Charge the time spent inside the block to name"""
+        if self._active:
+            self._charge(time.perf_counter())
+        self._active.append(name)
+        self._mark = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._charge(time.perf_counter())
+            self._active.pop()
+    
+    def iterate(self, name, iterable):
+        """Yield from iterable, charging the time spent producing each item to name"""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+    
+    def timings(self):
+        """Seconds per phase, in the order the phases were first entered"""
+        return {name: round(seconds, 4) for name, seconds in self._seconds.items()}
+
+# Summary columns of the category and priority breakdowns, after the grouping column
+BREAKDOWN_COLUMNS = ['ticket_count', 'resolved_count', 'avg_resolution_time']
+
+# Priorities in breakdown order; others sort first, as NULL does in SQLite
+PRIORITY_ORDER = {'high': 1, 'medium': 2, 'low': 3}
+
+# Tickets, resolved tickets and average resolution hours per category
+CATEGORY_BREAKDOWN_QUERY = """
+SELECT 
+    c.name as category,
+    COUNT(*) as ticket_count,
+    COUNT(CASE WHEN t.status = 'resolved' THEN 1 END) as resolved_count,
+    AVG((julianday(t.resolved_at) - julianday(t.created_at)) * 24) as avg_resolution_time
+FROM tickets t
+LEFT JOIN categories c ON t.category_id = c.id
+GROUP BY c.name
+ORDER BY ticket_count DESC
+"""
+
+# Tickets created and resolved per day over the last 30 days, counted from the
+# tickets matching {conditions} (see ExcelExporter.ticket_conditions)
+FILTERED_TREND_QUERY = """
+WITH matching AS (
+    SELECT t.created_at, t.resolved_at
+    FROM tickets t
+    LEFT JOIN categories c ON t.category_id = c.id
+    WHERE (t.created_at >= DATE('now', '-30 days') OR t.resolved_at >= DATE('now', '-30 days'))
+    {conditions}
+)
+SELECT date, SUM(created) as tickets_created, SUM(resolved) as tickets_resolved
+FROM (
+    SELECT DATE(created_at) as date, 1 as created, 0 as resolved FROM matching
+    UNION ALL
+    SELECT DATE(resolved_at), 0, 1 FROM matching WHERE resolved_at IS NOT NULL
+)
+WHERE date >= DATE('now', '-30 days')
+GROUP BY date
+ORDER BY date
+"""
+
+class TicketSummary:
+    """The analytics summary of a set of tickets, gathered in one pass over their rows
+    
+    add() takes the ticket chunks an export is already reading (as yielded
+    by ExcelExporter.iter_tickets_data), so the summary needs no queries of
+    its own. tables() returns the same frames as the overall, category and
+    priority parts of ExcelExporter.get_analytics_summary, for these
+    tickets only.
+    """
+    
+    def __init__(self):
+        self.total = 0
+        self.statuses = Counter()
+        self.resolution_hours = 0.0
+        self.resolved_with_time = 0
+        # value -> [tickets, resolved, resolution hours, tickets with a resolution time]
+        self.groups = {'category': {}, 'priority': {}}
+    
+    def add(self, chunk):
+        """Add a frame of ticket rows to the summary"""
+        hours = pd.to_numeric(chunk['resolution_time_hours'])
+        self.total += len(chunk)
+        self.statuses.update(chunk['status'].value_counts().to_dict())
+        self.resolution_hours += float(hours.sum())
+        self.resolved_with_time += int(hours.count())
+        
+        counts = pd.DataFrame({
+            'tickets': 1,
+            'resolved': chunk['status'] == 'resolved',
+            'hours': hours.fillna(0.0),
+            'timed': hours.notna()
+        }, index=chunk.index)
+        for dimension, groups in self.groups.items():
+            grouped = counts.groupby(chunk[dimension], dropna=False, sort=False).sum()
+            for value, row in zip(grouped.index, grouped.itertuples(index=False)):
+                group = groups.setdefault(None if pd.isna(value) else value, [0, 0, 0.0, 0])
+                group[0] += int(row.tickets)
+                group[1] += int(row.resolved)
+                group[2] += float(row.hours)
+                group[3] += int(row.timed)
+    
+    def breakdown(self, dimension):
+        """One dimension's breakdown frame: value, ticket_count, resolved_count, avg_resolution_time"""
+        rows = [
+            (value, tickets, resolved, hours / timed if timed else float('nan'))
+            for value, (tickets, resolved, hours, timed) in self.groups[dimension].items()
+        ]
+        if dimension == 'priority':
+            rows.sort(key=lambda row: PRIORITY_ORDER.get(row[0], 0))
+        else:
+            rows.sort(key=lambda row: -row[1])
+        return pd.DataFrame(rows, columns=[dimension] + BREAKDOWN_COLUMNS)
+    
+    def tables(self):
+        """overall_stats, category_breakdown and priority_breakdown frames"""
+        overall_stats = pd.DataFrame([{
+            'total_tickets': self.total,
+            'open_tickets': self.statuses['open'],
+            'in_progress_tickets': self.statuses['in_progress'],
+            'resolved_tickets': self.statuses['resolved'],
+            'closed_tickets': self.statuses['closed'],
+            'avg_resolution_time_hours': (self.resolution_hours / self.resolved_with_time
+                                          if self.resolved_with_time else None)
+        }])
+        return {
+            'overall_stats': overall_stats,
+            'category_breakdown': self.breakdown('category'),
+            'priority_breakdown': self.breakdown('priority')
+        }
 
 class ExcelExporter:
     def __init__(self):
-        self.db_path = 'instance/database.db'
+        self.db_path = DATABASE_PATH
     
     def get_db_connection(self):
         """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        return get_read_connection()
     
-    def get_tickets_data(self, start_date=None, end_date=None, status=None, category=None):
-        """Get tickets data with optional filters"""
-        conn = self.get_db_connection()
+    @staticmethod
+    def filter_args(filters):
+        """Ticket filter keyword arguments from an export's filters dict"""
+        filters = filters or {}
+        return {key: filters.get(key) for key in ('start_date', 'end_date', 'status', 'category')}
+    
+    @staticmethod
+    def ticket_conditions(start_date=None, end_date=None, status=None, category=None):
+        """SQL conditions (each starting with AND) and parameters for the export filters
+        
+        The conditions refer to tickets as t and categories as c.
+        """
+        conditions = ""
+        params = []
         
+        if start_date:
+            conditions += " AND DATE(t.created_at) >= ?"
+            params.append(start_date)
+        
+        if end_date:
+            conditions += " AND DATE(t.created_at) <= ?"
+            params.append(end_date)
+        
+        if status:
+            conditions += " AND t.status = ?"
+            params.append(status)
+        
+        if category:
+            conditions += " AND c.name = ?"
+            params.append(category)
+        
+        return conditions, params
+    
+    def tickets_query(self, start_date=None, end_date=None, status=None, category=None):
+        """SQL and parameters selecting the tickets to export"""
         query = """
         SELECT 
             t.id,
             t.title,
             t.description,
-            t.category,
+            c.name as category,
             t.priority,
             t.status,
             t.created_at,
             t.updated_at,
             u.username as assigned_agent,
             CASE 
-                WHEN t.status = 'Resolved' THEN 
-                    ROUND((julianday(t.updated_at) - julianday(t.created_at)) * 24, 2)
+                WHEN t.resolved_at IS NOT NULL THEN 
+                    ROUND((julianday(t.resolved_at) - julianday(t.created_at)) * 24, 2)
                 ELSE NULL 
             END as resolution_time_hours
         FROM tickets t
+        LEFT JOIN categories c ON t.category_id = c.id
         LEFT JOIN users u ON t.assigned_to = u.id
         WHERE 1=1
         """
         
-        params = []
-        
-        if start_date:
-            query += " AND DATE(t.created_at) >= ?"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(t.created_at) <= ?"
-            params.append(end_date)
+        conditions, params = self.ticket_conditions(start_date, end_date, status, category)
+        query += conditions
+        query += " ORDER BY t.created_at DESC"
         
-        if status:
-            query += " AND t.status = ?"
-            params.append(status)
+        return query, params
+    
+    def get_tickets_data(self, start_date=None, end_date=None, status=None, category=None):
+        """Get tickets data with optional filters"""
+        query, params = self.tickets_query(start_date, end_date, status, category)
         
-        if category:
-            query += " AND t.category = ?"
-            params.append(category)
+        conn = self.get_db_connection()
+        df = pd.read_sql_query(query, conn, params=params)
+        conn.close()
         
-        query += " ORDER BY t.created_at DESC"
+        return df
+    
+    def count_tickets(self, start_date=None, end_date=None, status=None, category=None):
+        """Number of tickets get_tickets_data would return"""
+        query, params = self.tickets_query(start_date, end_date, status, category)
         
-        df = pd.read_sql_query(query, conn, params=params)
+        conn = self.get_db_connection()
+        count = conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
         conn.close()
         
+        return count
+    
+    def format_dates(self, df):
+        """Format a tickets frame's timestamps for export, in place"""
+        df['created_at'] = pd.to_datetime(df['created_at'], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M')
+        df['updated_at'] = pd.to_datetime(df['updated_at'], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M')
         return df
     
+    def iter_tickets_data(self, start_date=None, end_date=None, status=None, category=None,
+                          chunk_size=EXPORT_CHUNK_SIZE, format_dates=True, progress=None):
+        """Yield the tickets get_tickets_data selects as frames of chunk_size rows
+        
+        Rows are fetched from the cursor as the chunks are consumed and each
+        chunk's dates are formatted for export (unless format_dates is
+        False), so memory is bounded by the chunk size however many tickets
+        match. At least one chunk, possibly empty, is always yielded.
+        progress, if given, is called with the number of tickets read so far
+        as each chunk is fetched.
+        """
+        query, params = self.tickets_query(start_date, end_date, status, category)
+        
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            read = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                read += len(rows)
+                if progress:
+                    progress(read)
+                chunk = pd.DataFrame.from_records(rows, columns=columns)
+                yield self.format_dates(chunk) if format_dates else chunk
+                if len(rows) < chunk_size:
+                    break
+        finally:
+            conn.close()
+    
     def get_analytics_summary(self):
         """Get analytics summary data"""
         conn = self.get_db_connection()
@@ -74,77 +342,159 @@ class ExcelExporter:
         stats_query = """
         SELECT 
             COUNT(*) as total_tickets,
-            COUNT(CASE WHEN status = 'Open' THEN 1 END) as open_tickets,
-            COUNT(CASE WHEN status = 'In Progress' THEN 1 END) as in_progress_tickets,
-            COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved_tickets,
-            COUNT(CASE WHEN status = 'Closed' THEN 1 END) as closed_tickets,
-            AVG(CASE WHEN status = 'Resolved' THEN 
-                (julianday(updated_at) - julianday(created_at)) * 24 
-            END) as avg_resolution_time_hours
+            COUNT(CASE WHEN status = 'open' THEN 1 END) as open_tickets,
+            COUNT(CASE WHEN status = 'in_progress' THEN 1 END) as in_progress_tickets,
+            COUNT(CASE WHEN status = 'resolved' THEN 1 END) as resolved_tickets,
+            COUNT(CASE WHEN status = 'closed' THEN 1 END) as closed_tickets,
+            AVG((julianday(resolved_at) - julianday(created_at)) * 24) as avg_resolution_time_hours
         FROM tickets
         """
         
         stats_df = pd.read_sql_query(stats_query, conn)
         
         # Category breakdown
-        category_query = """
-        SELECT 
-            category,
-            COUNT(*) as ticket_count,
-            COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved_count,
-            AVG(CASE WHEN status = 'Resolved' THEN 
-                (julianday(updated_at) - julianday(created_at)) * 24 
-            END) as avg_resolution_time
-        FROM tickets
-        GROUP BY category
-        ORDER BY ticket_count DESC
-        """
-        
-        category_df = pd.read_sql_query(category_query, conn)
+        category_df = pd.read_sql_query(CATEGORY_BREAKDOWN_QUERY, conn)
         
         # Priority breakdown
         priority_query = """
         SELECT 
             priority,
             COUNT(*) as ticket_count,
-            COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved_count,
-            AVG(CASE WHEN status = 'Resolved' THEN 
-                (julianday(updated_at) - julianday(created_at)) * 24 
-            END) as avg_resolution_time
+            COUNT(CASE WHEN status = 'resolved' THEN 1 END) as resolved_count,
+            AVG((julianday(resolved_at) - julianday(created_at)) * 24) as avg_resolution_time
         FROM tickets
         GROUP BY priority
         ORDER BY 
             CASE priority 
-                WHEN 'Critical' THEN 1 
-                WHEN 'High' THEN 2 
-                WHEN 'Medium' THEN 3 
-                WHEN 'Low' THEN 4 
+                WHEN 'high' THEN 1 
+                WHEN 'medium' THEN 2 
+                WHEN 'low' THEN 3 
             END
         """
         
         priority_df = pd.read_sql_query(priority_query, conn)
         
-        # Daily ticket creation trend (last 30 days)
+        conn.close()
+        
+        return {
+            'overall_stats': stats_df,
+            'category_breakdown': category_df,
+            'priority_breakdown': priority_df,
+            'daily_trend': self.get_daily_trend()
+        }
+    
+    def get_daily_trend(self, filters=None):
+        """Daily ticket creation trend (last 30 days)
+        
+        Without filters it comes from the daily rollups. With filters it is
+        counted from the matching tickets, so it agrees with the rest of a
+        filtered report.
+        """
+        filter_args = self.filter_args(filters)
+        if any(filter_args.values()):
+            conditions, params = self.ticket_conditions(**filter_args)
+            conn = self.get_db_connection()
+            trend_df = pd.read_sql_query(FILTERED_TREND_QUERY.format(conditions=conditions),
+                                         conn, params=params)
+            conn.close()
+            return trend_df
+        
         trend_query = """
         SELECT 
-            DATE(created_at) as date,
-            COUNT(*) as tickets_created,
-            COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as tickets_resolved
-        FROM tickets
-        WHERE DATE(created_at) >= DATE('now', '-30 days')
-        GROUP BY DATE(created_at)
-        ORDER BY date
+            day as date,
+            created_count as tickets_created,
+            resolved_count as tickets_resolved
+        FROM daily_ticket_rollups
+        WHERE dimension = 'total' AND value = ''
+        AND day >= DATE('now', '-30 days')
+        AND (created_count > 0 OR resolved_count > 0)
+        ORDER BY day
         """
         
+        conn = self.get_db_connection()
         trend_df = pd.read_sql_query(trend_query, conn)
-        
         conn.close()
         
+        return trend_df
+    
+    def summarize_chunks(self, ticket_chunks, summary, timer):
+        """Pass ticket chunks through, adding each to a TicketSummary
+        
+        Reading the chunks is timed as the read_tickets phase and adding
+        them as summarize.
+        """
+        for chunk in timer.iterate('read_tickets', ticket_chunks):
+            with timer.phase('summarize'):
+                summary.add(chunk)
+            yield chunk
+    
+    def summarize_tickets(self, filters=None, sample_size=0, timings=None):
+        """Analytics summary of the filtered tickets from one streamed pass over them
+        
+        Returns the summary, laid out as get_analytics_summary's, and a frame
+        of the first sample_size tickets, dates unformatted. timings, if a dict, receives the
+        seconds spent in each phase.
+        """
+        timer = PhaseTimer()
+        summary = TicketSummary()
+        # The summary does not use the dates, so they are left as stored
+        chunks = self.iter_tickets_data(**self.filter_args(filters), format_dates=False)
+        
+        sample = None
+        for chunk in self.summarize_chunks(chunks, summary, timer):
+            if sample is None:
+                sample = chunk.head(sample_size)
+        
+        with timer.phase('daily_trend'):
+            analytics_data = dict(summary.tables(), daily_trend=self.get_daily_trend(filters))
+        
+        if timings is not None:
+            timings.update(timer.timings())
+        return analytics_data, sample
+    
+    def get_analytics_overview(self, filters=None, timings=None):
+        """Ticket, category, priority and trend day counts for an analytics export
+        
+        Without filters these come from the ticket counters and daily
+        rollups, with no pass over the tickets; with filters, from
+        summarize_tickets.
+        """
+        if filters:
+            analytics_data, _ = self.summarize_tickets(filters, timings=timings)
+            return {
+                'total_tickets': int(analytics_data['overall_stats']['total_tickets'].iloc[0]),
+                'categories': len(analytics_data['category_breakdown']),
+                'priorities': len(analytics_data['priority_breakdown']),
+                'trend_days': len(analytics_data['daily_trend'])
+            }
+        
+        timer = PhaseTimer()
+        with timer.phase('rollups'):
+            conn = self.get_db_connection()
+            total = conn.execute(
+                "SELECT count FROM ticket_counters WHERE dimension = 'total'"
+            ).fetchone()
+            priorities = conn.execute(
+                "SELECT COUNT(*) FROM ticket_counters WHERE dimension = 'priority' AND count > 0"
+            ).fetchone()[0]
+            categories = conn.execute('''
+                SELECT COUNT(*) FROM (
+                    SELECT value FROM daily_ticket_rollups WHERE dimension = 'category'
+                    GROUP BY value HAVING SUM(created_count) > 0
+                )
+            ''').fetchone()[0]
+            conn.close()
+        
+        with timer.phase('daily_trend'):
+            trend_days = len(self.get_daily_trend())
+        
+        if timings is not None:
+            timings.update(timer.timings())
         return {
-            'overall_stats': stats_df,
-            'category_breakdown': category_df,
-            'priority_breakdown': priority_df,
-            'daily_trend': trend_df
+            'total_tickets': total['count'] if total else 0,
+            'categories': categories,
+            'priorities': priorities,
+            'trend_days': trend_days
         }
     
     def style_worksheet(self, ws, title):
@@ -179,7 +529,7 @@ class ExcelExporter:
         ws.insert_rows(1)
         ws['A1'] = title
         ws['A1'].font = Font(bold=True, size=16)
-        ws.merge_cells('A1:' + ws.max_column.__str__() + '1')
+        ws.merge_cells(f'A1:{get_column_letter(ws.max_column)}1')
         
         # Add borders
         thin_border = Border(
@@ -193,134 +543,316 @@ class ExcelExporter:
             for cell in row:
                 cell.border = thin_border
     
-    def create_comprehensive_report(self, filters=None):
-        """Create comprehensive Excel report with multiple sheets"""
+    def create_comprehensive_report(self, filters=None, streaming=True, output=None, progress=None,
+                                    timings=None):
+        """Create comprehensive Excel report with multiple sheets
+        
+        The report is streamed row by row into write-only worksheets, reading
+        tickets a chunk at a time, unless streaming is False, which reads
+        every ticket and builds the whole workbook in memory. A streamed
+        report is written to output when given (see write_streaming_workbook).
+        
+        The summary sheets describe the exported tickets and are gathered by
+        a TicketSummary while the tickets are written, so the tickets are
+        read once and not queried again for the summary. timings, if a dict,
+        receives the seconds spent in each phase of generating the report.
+        """
+        timer = PhaseTimer()
+        
         # Get data
-        tickets_df = self.get_tickets_data(
-            start_date=filters.get('start_date') if filters else None,
-            end_date=filters.get('end_date') if filters else None,
-            status=filters.get('status') if filters else None,
-            category=filters.get('category') if filters else None
-        )
+        if streaming:
+            ticket_chunks = self.iter_tickets_data(**self.filter_args(filters), progress=progress)
+        else:
+            with timer.phase('read_tickets'):
+                ticket_chunks = [self.format_dates(self.get_tickets_data(**self.filter_args(filters)))]
         
-        analytics_data = self.get_analytics_summary()
+        summary = TicketSummary()
+        ticket_chunks = self.summarize_chunks(ticket_chunks, summary, timer)
         
-        # Create Excel workbook
-        wb = openpyxl.Workbook()
+        def analytics_data():
+            with timer.phase('daily_trend'):
+                return dict(summary.tables(), daily_trend=self.get_daily_trend(filters))
         
-        # Remove default sheet
-        wb.remove(wb.active)
+        sheets = self.report_sheets(ticket_chunks, analytics_data)
         
-        # 1. Summary Sheet
-        summary_ws = wb.create_sheet("Executive Summary")
-        
-        # Add summary data
-        summary_data = [
-            ["Metric", "Value"],
-            ["Total Tickets", analytics_data['overall_stats']['total_tickets'].iloc[0]],
-            ["Open Tickets", analytics_data['overall_stats']['open_tickets'].iloc[0]],
-            ["In Progress", analytics_data['overall_stats']['in_progress_tickets'].iloc[0]],
-            ["Resolved Tickets", analytics_data['overall_stats']['resolved_tickets'].iloc[0]],
-            ["Closed Tickets", analytics_data['overall_stats']['closed_tickets'].iloc[0]],
-            ["Avg Resolution Time (Hours)", 
-             round(analytics_data['overall_stats']['avg_resolution_time_hours'].iloc[0] or 0, 2)]
-        ]
+        if streaming:
+            report = self.write_streaming_workbook(sheets, output, timer)
+        else:
+            report = self.write_workbook(sheets, timer)
         
-        for row in summary_data:
-            summary_ws.append(row)
+        if timings is not None:
+            timings.update(timer.timings())
+        return report
+    
+    def report_sheets(self, ticket_chunks, analytics_data):
+        """(sheet name, title, header, rows) for each sheet of the comprehensive report
+        
+        ticket_chunks are tickets frames with formatted dates, as yielded by
+        iter_tickets_data. analytics_data is called once, after every ticket
+        has been read, for the summary frames (laid out as
+        get_analytics_summary's); the sheets made from them have callable
+        rows, which the workbook writers fill in last.
+        """
+        analytics_data = cache(analytics_data)
         
-        self.style_worksheet(summary_ws, "Tech Support Dashboard - Executive Summary")
+        # 1. Summary Sheet
+        def summary_rows():
+            overall_stats = analytics_data()['overall_stats']
+            return [
+                ["Total Tickets", overall_stats['total_tickets'].iloc[0]],
+                ["Open Tickets", overall_stats['open_tickets'].iloc[0]],
+                ["In Progress", overall_stats['in_progress_tickets'].iloc[0]],
+                ["Resolved Tickets", overall_stats['resolved_tickets'].iloc[0]],
+                ["Closed Tickets", overall_stats['closed_tickets'].iloc[0]],
+                ["Avg Resolution Time (Hours)", 
+                 round(overall_stats['avg_resolution_time_hours'].iloc[0] or 0, 2)]
+            ]
         
         # 2. All Tickets Sheet
-        tickets_ws = wb.create_sheet("All Tickets")
-        
-        # Prepare tickets data for export
-        export_tickets = tickets_df.copy()
-        export_tickets['created_at'] = pd.to_datetime(export_tickets['created_at']).dt.strftime('%Y-%m-%d %H:%M')
-        export_tickets['updated_at'] = pd.to_datetime(export_tickets['updated_at']).dt.strftime('%Y-%m-%d %H:%M')
-        
-        # Add data to worksheet
-        for r in dataframe_to_rows(export_tickets, index=False, header=True):
-            tickets_ws.append(r)
-        
-        self.style_worksheet(tickets_ws, "All Tickets Details")
-        
-        # 3. Category Analysis Sheet
-        category_ws = wb.create_sheet("Category Analysis")
-        
-        category_data = analytics_data['category_breakdown'].copy()
-        category_data['avg_resolution_time'] = category_data['avg_resolution_time'].round(2)
+        ticket_header, ticket_rows = chunk_rows(ticket_chunks)
         
-        for r in dataframe_to_rows(category_data, index=False, header=True):
-            category_ws.append(r)
+        # 3. Category Analysis and 4. Priority Analysis Sheets
+        def breakdown_rows(key):
+            data = analytics_data()[key].copy()
+            data['avg_resolution_time'] = data['avg_resolution_time'].round(2)
+            return frame_rows(data)
         
-        self.style_worksheet(category_ws, "Tickets by Category Analysis")
-        
-        # 4. Priority Analysis Sheet
-        priority_ws = wb.create_sheet("Priority Analysis")
+        # 5. Trend Analysis Sheet
+        def trend_rows():
+            return frame_rows(analytics_data()['daily_trend'])
+        
+        return [
+            ("Executive Summary", "Tech Support Dashboard - Executive Summary",
+             ["Metric", "Value"], summary_rows),
+            ("All Tickets", "All Tickets Details", ticket_header, ticket_rows),
+            ("Category Analysis", "Tickets by Category Analysis",
+             ['category'] + BREAKDOWN_COLUMNS, lambda: breakdown_rows('category_breakdown')),
+            ("Priority Analysis", "Tickets by Priority Analysis",
+             ['priority'] + BREAKDOWN_COLUMNS, lambda: breakdown_rows('priority_breakdown')),
+            ("Trend Analysis", "Daily Ticket Trends (Last 30 Days)",
+             ['date', 'tickets_created', 'tickets_resolved'], trend_rows)
+        ]
+    
+    @staticmethod
+    def ordered_sheets(wb, sheets):
+        """Create every sheet in order, then yield (worksheet, title, header, rows) to fill in
         
-        priority_data = analytics_data['priority_breakdown'].copy()
-        priority_data['avg_resolution_time'] = priority_data['avg_resolution_time'].round(2)
+        Sheets whose rows are a callable come last, with the callable's
+        result, since their rows may depend on what the other sheets read.
+        """
+        created = [(wb.create_sheet(name), title, header, rows) for name, title, header, rows in sheets]
+        
+        for ws, title, header, rows in created:
+            if not callable(rows):
+                yield ws, title, header, rows
+        for ws, title, header, rows in created:
+            if callable(rows):
+                yield ws, title, header, rows()
+    
+    def write_workbook(self, sheets, timer=None):
+        """Build the report as an in-memory workbook and save it to a BytesIO"""
+        timer = timer or PhaseTimer()
+        wb = openpyxl.Workbook()
         
-        for r in dataframe_to_rows(priority_data, index=False, header=True):
-            priority_ws.append(r)
+        # Remove default sheet
+        wb.remove(wb.active)
         
-        self.style_worksheet(priority_ws, "Tickets by Priority Analysis")
+        with timer.phase('write_sheets'):
+            for ws, title, header, rows in self.ordered_sheets(wb, sheets):
+                ws.append(header)
+                for row in rows:
+                    ws.append(list(row))
+                self.style_worksheet(ws, title)
         
-        # 5. Trend Analysis Sheet
-        trend_ws = wb.create_sheet("Trend Analysis")
+        # Save to BytesIO for download
+        output = BytesIO()
+        with timer.phase('save'):
+            wb.save(output)
+        output.seek(0)
         
-        trend_data = analytics_data['daily_trend'].copy()
+        return output
+    
+    def add_export_styles(self, wb):
+        """Register the named styles streamed sheets are written with"""
+        thin_border = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
         
-        for r in dataframe_to_rows(trend_data, index=False, header=True):
-            trend_ws.append(r)
+        wb.add_named_style(NamedStyle(
+            name='export_title', font=Font(bold=True, size=16), border=thin_border
+        ))
+        wb.add_named_style(NamedStyle(
+            name='export_header',
+            font=Font(bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+            border=thin_border
+        ))
+        wb.add_named_style(NamedStyle(name='export_cell', border=thin_border))
+    
+    def write_streaming_sheet(self, ws, title, header, rows):
+        """Write a styled sheet of a write-only workbook one row at a time
         
-        self.style_worksheet(trend_ws, "Daily Ticket Trends (Last 30 Days)")
+        With a title the sheet looks the same as one styled by
+        style_worksheet; without one only the header row is styled. Column
+        widths come from the first COLUMN_WIDTH_SAMPLE rows and no row is
+        kept once written.
+        """
+        rows = iter(rows)
+        sample = list(islice(rows, COLUMN_WIDTH_SAMPLE))
+        
+        # Column widths have to be set before the first row is written
+        for index, column in enumerate(zip(header, *sample), 1):
+            width = max(len(str(value)) for value in column if value is not None)
+            ws.column_dimensions[get_column_letter(index)].width = min(width + 2, 50)
+        
+        def styled_cells(style, values):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = style
+                cells.append(cell)
+            return cells
+        
+        if title is None:
+            ws.append(styled_cells('export_header', header))
+            for row in chain(sample, rows):
+                ws.append(row)
+            return
+        
+        if len(header) > 1:
+            ws.merged_cells.add(f'A1:{get_column_letter(len(header))}1')
+        title_row = styled_cells('export_cell', [None] * len(header))
+        title_row[0] = styled_cells('export_title', [title])[0]
+        ws.append(title_row)
+        ws.append(styled_cells('export_header', header))
+        
+        # Each row is written as soon as it is appended, so one set of styled
+        # cells is reused for every row
+        cells = styled_cells('export_cell', [None] * len(header))
+        for row in chain(sample, rows):
+            for cell, value in zip(cells, row):
+                cell.value = value
+            ws.append(cells)
+    
+    def write_streaming_workbook(self, sheets, output=None, timer=None):
+        """Stream (name, title, header, rows) sheets into a workbook
         
-        # Save to BytesIO for download
-        output = BytesIO()
-        wb.save(output)
+        The workbook is saved to output, an open binary file, or else to a
+        spooled temporary file; either is returned rewound. Rows may be a
+        callable, as for ordered_sheets.
+        """
+        timer = timer or PhaseTimer()
+        wb = openpyxl.Workbook(write_only=True)
+        self.add_export_styles(wb)
+        
+        with timer.phase('write_sheets'):
+            for ws, title, header, rows in self.ordered_sheets(wb, sheets):
+                self.write_streaming_sheet(ws, title, header, rows)
+        
+        if output is None:
+            output = SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+        with timer.phase('save'):
+            wb.save(output)
         output.seek(0)
         
         return output
     
-    def create_simple_export(self, data_type="tickets", filters=None):
+    def create_simple_export(self, data_type="tickets", filters=None, output=None, progress=None):
         """Create simple Excel export for specific data type"""
         if data_type == "tickets":
-            df = self.get_tickets_data(
-                start_date=filters.get('start_date') if filters else None,
-                end_date=filters.get('end_date') if filters else None,
-                status=filters.get('status') if filters else None,
-                category=filters.get('category') if filters else None
-            )
-            
-            # Format dates
-            df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime('%Y-%m-%d %H:%M')
-            df['updated_at'] = pd.to_datetime(df['updated_at']).dt.strftime('%Y-%m-%d %H:%M')
+            chunks = self.iter_tickets_data(**self.filter_args(filters), progress=progress)
             
         elif data_type == "analytics":
-            analytics_data = self.get_analytics_summary()
-            df = analytics_data['category_breakdown']
+            conn = self.get_db_connection()
+            chunks = [pd.read_sql_query(CATEGORY_BREAKDOWN_QUERY, conn)]
+            conn.close()
         
-        # Create Excel file
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Data')
-            
-            # Style the worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Data']
-            
-            # Header styling
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            
-            for cell in worksheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
+        header, rows = chunk_rows(chunks)
+        return self.write_streaming_workbook([('Data', None, header, rows)], output)
+
+    def iter_csv(self, filters=None, compress=False, progress=None):
+        """Yield the filtered tickets as CSV bytes, one chunk of tickets at a time
+        
+        With compress the pieces together form a single gzip stream.
+        """
+        # wbits=31 writes a gzip header and trailer around the deflate data
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        
+        header = True
+        for chunk in self.iter_tickets_data(**self.filter_args(filters), progress=progress):
+            data = chunk.to_csv(index=False, header=header).encode('utf-8')
+            header = False
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        
+        if compressor:
+            yield compressor.flush()
+    
+    def write_columnar(self, filters=None, file_format='parquet', output=None, progress=None):
+        """Write the filtered tickets as Parquet or an Arrow IPC file
+        
+        Each chunk of tickets becomes a row group (Parquet) or record batch
+        (Arrow), with timestamps kept as timestamps. Needs pyarrow. Writes to
+        output, an open binary file, or else a spooled temporary file, and
+        returns it rewound.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = pa.schema([
+            ('id', pa.int64()),
+            ('title', pa.string()),
+            ('description', pa.string()),
+            ('category', pa.string()),
+            ('priority', pa.string()),
+            ('status', pa.string()),
+            ('created_at', pa.timestamp('us')),
+            ('updated_at', pa.timestamp('us')),
+            ('assigned_agent', pa.string()),
+            ('resolution_time_hours', pa.float64())
+        ])
+        
+        if output is None:
+            output = SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+        if file_format == 'parquet':
+            writer = pq.ParquetWriter(output, schema)
+        else:
+            writer = pa.ipc.new_file(output, schema)
+        
+        with writer:
+            for chunk in self.iter_tickets_data(**self.filter_args(filters), format_dates=False,
+                                                progress=progress):
+                chunk['created_at'] = pd.to_datetime(chunk['created_at'], format='ISO8601')
+                chunk['updated_at'] = pd.to_datetime(chunk['updated_at'], format='ISO8601')
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
         
         output.seek(0)
         return output
+    
+    def write_export(self, export_format, output, filters=None, progress=None, timings=None):
+        """Write an export in one of EXPORT_FORMATS to output, an open binary file
+        
+        progress is passed on to iter_tickets_data, and timings to
+        create_comprehensive_report.
+        """
+        if export_format == 'excel_simple':
+            self.create_simple_export("tickets", filters, output=output, progress=progress)
+        elif export_format == 'excel_comprehensive':
+            self.create_comprehensive_report(filters, output=output, progress=progress,
+                                             timings=timings)
+        elif export_format in ('csv', 'csv_gzip'):
+            for data in self.iter_csv(filters, compress=export_format == 'csv_gzip', progress=progress):
+                output.write(data)
+        elif export_format in COLUMNAR_FORMATS:
+            self.write_columnar(filters, export_format, output=output, progress=progress)
+        else:
+            raise ValueError(f'Unknown export format: {export_format}')
 
 # Global exporter instance
 exporter = ExcelExporter()
@@ -1,30 +1,68 @@
-from flask import Blueprint, request, jsonify, send_file, flash, redirect, url_for
+from flask import (Blueprint, Response, request, jsonify, send_file, flash, redirect, url_for,
+                   stream_with_context)
 from flask_login import login_required, current_user
-from export_utils import exporter
+from export_utils import exporter, frame_rows, COLUMNAR_FORMATS, EXPORT_FORMATS, PYARROW_AVAILABLE
+from export_jobs import export_jobs
 from datetime import datetime
 import io
+import os
 
 exports_bp = Blueprint('exports', __name__, url_prefix='/exports')
 
+FILTER_KEYS = ('start_date', 'end_date', 'status', 'category')
+
+# Ticket export formats other than Excel: (extension, mimetype)
+TICKET_FILE_FORMATS = {
+    export_format: EXPORT_FORMATS[export_format]
+    for export_format in ('csv', 'csv_gzip', 'parquet', 'arrow')
+}
+
+def get_filters(args):
+    """Export filters present in request arguments or form data"""
+    return {key: args.get(key) for key in FILTER_KEYS if args.get(key)}
+
+def add_server_timing(response, timings):
+    """Report seconds per phase of generating an export in a Server-Timing header"""
+    response.headers['Server-Timing'] = ', '.join(
+        f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in timings.items()
+    )
+    return response
+
+def tickets_file_response(export_format, filters):
+    """Download response for tickets in one of TICKET_FILE_FORMATS
+    
+    CSV is streamed to the client while it is generated; Parquet and Arrow
+    are written to a temporary file first.
+    """
+    extension, mimetype = TICKET_FILE_FORMATS[export_format]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"tickets_export_{timestamp}{extension}"
+    
+    if export_format in COLUMNAR_FORMATS:
+        if not PYARROW_AVAILABLE:
+            return jsonify({'error': f'{export_format.title()} export requires pyarrow'}), 501
+        
+        return send_file(
+            exporter.write_columnar(filters, export_format),
+            as_attachment=True,
+            download_name=filename,
+            mimetype=mimetype
+        )
+    
+    csv_data = exporter.iter_csv(filters, compress=export_format == 'csv_gzip')
+    return Response(
+        stream_with_context(csv_data),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @exports_bp.route('/tickets')
 @login_required
 def export_tickets():
     """Export tickets to Excel"""
     try:
         # Get filters from query parameters
-        filters = {}
-        
-        if request.args.get('start_date'):
-            filters['start_date'] = request.args.get('start_date')
-        
-        if request.args.get('end_date'):
-            filters['end_date'] = request.args.get('end_date')
-        
-        if request.args.get('status'):
-            filters['status'] = request.args.get('status')
-        
-        if request.args.get('category'):
-            filters['category'] = request.args.get('category')
+        filters = get_filters(request.args)
         
         # Generate Excel file
         excel_file = exporter.create_simple_export("tickets", filters)
@@ -44,39 +82,45 @@ def export_tickets():
         flash(f'Error exporting tickets: {str(e)}', 'error')
         return redirect(request.referrer or url_for('analytics.dashboard'))
 
+@exports_bp.route('/tickets/<export_format>')
+@login_required
+def export_tickets_file(export_format):
+    """Export tickets as CSV (gzipped with ?gzip=1), Parquet or Arrow"""
+    if export_format == 'csv' and request.args.get('gzip') in ('1', 'true'):
+        export_format = 'csv_gzip'
+    
+    if export_format not in TICKET_FILE_FORMATS:
+        return jsonify({'error': f'Unknown export format: {export_format}'}), 404
+    
+    try:
+        return tickets_file_response(export_format, get_filters(request.args))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @exports_bp.route('/comprehensive-report')
 @login_required
 def export_comprehensive_report():
     """Export comprehensive analytics report to Excel"""
     try:
         # Get filters from query parameters
-        filters = {}
-        
-        if request.args.get('start_date'):
-            filters['start_date'] = request.args.get('start_date')
-        
-        if request.args.get('end_date'):
-            filters['end_date'] = request.args.get('end_date')
-        
-        if request.args.get('status'):
-            filters['status'] = request.args.get('status')
-        
-        if request.args.get('category'):
-            filters['category'] = request.args.get('category')
+        filters = get_filters(request.args)
         
         # Generate comprehensive Excel report
-        excel_file = exporter.create_comprehensive_report(filters)
+        timings = {}
+        excel_file = exporter.create_comprehensive_report(filters, timings=timings)
         
         # Generate filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"tech_support_report_{timestamp}.xlsx"
         
-        return send_file(
+        response = send_file(
             excel_file,
             as_attachment=True,
             download_name=filename,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
+        return add_server_timing(response, timings)
         
     except Exception as e:
         flash(f'Error exporting report: {str(e)}', 'error')
@@ -90,53 +134,116 @@ def preview_export():
         export_type = request.args.get('type', 'tickets')
         
         # Get filters
-        filters = {}
-        if request.args.get('start_date'):
-            filters['start_date'] = request.args.get('start_date')
-        if request.args.get('end_date'):
-            filters['end_date'] = request.args.get('end_date')
-        if request.args.get('status'):
-            filters['status'] = request.args.get('status')
-        if request.args.get('category'):
-            filters['category'] = request.args.get('category')
+        filters = get_filters(request.args)
+        timings = {}
         
         if export_type == 'tickets':
-            # Get tickets data for preview
-            df = exporter.get_tickets_data(
-                start_date=filters.get('start_date'),
-                end_date=filters.get('end_date'),
-                status=filters.get('status'),
-                category=filters.get('category')
-            )
+            # Summarize the tickets in one pass, keeping the first few as a sample
+            analytics_data, sample = exporter.summarize_tickets(filters, sample_size=5,
+                                                                timings=timings)
+            overall_stats = analytics_data['overall_stats'].iloc[0]
             
-            # Convert to dict for JSON response
             preview_data = {
-                'total_records': len(df),
-                'columns': df.columns.tolist(),
-                'sample_data': df.head(5).to_dict('records') if len(df) > 0 else [],
+                'total_records': int(overall_stats['total_tickets']),
+                'columns': sample.columns.tolist(),
+                'sample_data': [dict(zip(sample.columns, row)) for row in frame_rows(sample)],
+                'status_counts': {
+                    status: int(overall_stats[f'{status}_tickets'])
+                    for status in ('open', 'in_progress', 'resolved', 'closed')
+                },
                 'filters_applied': filters
             }
             
         elif export_type == 'analytics':
-            # Get analytics summary for preview
-            analytics_data = exporter.get_analytics_summary()
-            
-            preview_data = {
-                'total_tickets': int(analytics_data['overall_stats']['total_tickets'].iloc[0]),
-                'categories': len(analytics_data['category_breakdown']),
-                'priorities': len(analytics_data['priority_breakdown']),
-                'trend_days': len(analytics_data['daily_trend']),
-                'filters_applied': filters
-            }
+            # Counts from the rollups, or one pass over the filtered tickets
+            preview_data = dict(exporter.get_analytics_overview(filters, timings=timings),
+                                filters_applied=filters)
         
         return jsonify({
             'success': True,
-            'preview': preview_data
+            'preview': preview_data,
+            'timings': timings
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def job_response(job):
+    """Status of an export job, with its download URL once the file is ready"""
+    job = dict(job)
+    job['download_url'] = (url_for('exports.download_export_job', job_id=job['id'])
+                           if job['status'] == 'succeeded' else None)
+    return jsonify(job)
+
+@exports_bp.route('/api/jobs', methods=['POST'])
+@login_required
+def create_export_job():
+    """Queue an export to be built in the background and downloaded later"""
+    data = request.get_json(silent=True) or request.form
+    export_format = data.get('format', 'excel_simple')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if export_format in COLUMNAR_FORMATS and not PYARROW_AVAILABLE:
+        return jsonify({'error': f'{export_format.title()} export requires pyarrow'}), 501
+    
+    try:
+        job_id, created = export_jobs.submit(export_format, get_filters(data),
+                                             requested_by=current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('exports.export_job_status', job_id=job_id),
+            'message': 'Export started' if created else 'An identical export is already available'
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def get_own_job(job_id):
+    """An export job, or None unless the current user requested it or is an admin"""
+    job = export_jobs.get(job_id)
+    if job and (job['requested_by'] == current_user.id or current_user.is_admin()):
+        return job
+    return None
+
+@exports_bp.route('/api/jobs/<int:job_id>')
+@login_required
+def export_job_status(job_id):
+    """Status, progress and file size of an export job"""
+    job = get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return job_response(job)
+
+@exports_bp.route('/api/jobs/<int:job_id>/download')
+@login_required
+def download_export_job(job_id):
+    """Download the file a finished export job built"""
+    job = get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job['status'] == 'expired':
+        return jsonify({'error': 'Export has expired'}), 410
+    if job['status'] != 'succeeded':
+        return jsonify({'error': f"Export is {job['status']}"}), 409
+    
+    path = export_jobs.file_path(job)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Export has expired'}), 410
+    
+    extension, mimetype = EXPORT_FORMATS[job['export_format']]
+    created = datetime.strptime(job['created_at'], '%Y-%m-%d %H:%M:%S').strftime("%Y%m%d_%H%M%S")
+    return send_file(
+        os.path.abspath(path),
+        as_attachment=True,
+        download_name=f"{job['export_format']}_export_{created}{extension}",
+        mimetype=mimetype
+    )
+
 @exports_bp.route('/api/formats')
 @login_required
 def available_formats():
@@ -154,6 +261,32 @@ def available_formats():
                 'name': 'Excel (Comprehensive Report)',
                 'description': 'Multi-sheet Excel report with analytics and charts',
                 'extension': '.xlsx'
+            },
+            {
+                'id': 'csv',
+                'name': 'CSV',
+                'description': 'Filtered ticket data, streamed as it is generated',
+                'extension': '.csv'
+            },
+            {
+                'id': 'csv_gzip',
+                'name': 'CSV (gzip)',
+                'description': 'Filtered ticket data as gzip-compressed CSV',
+                'extension': '.csv.gz'
+            },
+            {
+                'id': 'parquet',
+                'name': 'Parquet',
+                'description': 'Columnar ticket data for BI and data tools',
+                'extension': '.parquet',
+                'available': PYARROW_AVAILABLE
+            },
+            {
+                'id': 'arrow',
+                'name': 'Arrow',
+                'description': 'Ticket data as an Arrow IPC file',
+                'extension': '.arrow',
+                'available': PYARROW_AVAILABLE
             }
         ]
     })
@@ -169,10 +302,10 @@ def custom_export():
         export_format = data.get('format', 'excel_simple')
         include_fields = data.getlist('fields') if hasattr(data, 'getlist') else data.get('fields', [])
         
-        filters = {}
-        for key in ['start_date', 'end_date', 'status', 'category']:
-            if data.get(key):
-                filters[key] = data.get(key)
+        filters = get_filters(data)
+        
+        if export_format in TICKET_FILE_FORMATS:
+            return tickets_file_response(export_format, filters)
         
         if export_format == 'excel_comprehensive':
             excel_file = exporter.create_comprehensive_report(filters)
@@ -1,30 +1,95 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, mean_absolute_error
-import joblib
+import copy
+import hashlib
 import os
-import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import get_read_connection
+from cache import LRUCache, MISSING
+from model_registry import ModelBundle, ModelRegistry
 from datetime import datetime, timedelta
 import re
 
+# TF-IDF rows by (features_version, hash of cleaned text)
+feature_cache = LRUCache('features', maxsize=4096, ttl=24 * 3600)
+
+# Larger inputs to extract_features are vectorized without the cache
+FEATURE_CACHE_BATCH_LIMIT = 256
+
+# preprocess_texts cleans a batch as one string, the texts joined by this
+TEXT_SEPARATOR = '\x00'
+# Characters preprocess_text deletes, keeping the separator: a translate
+# table for ASCII-only batches and a regex for the rest
+ASCII_NON_LETTERS = {code: None for code in range(1, 128)
+                     if not (chr(code).isalpha() or chr(code).isspace())}
+NON_LETTERS = re.compile(r'[^a-zA-Z\s\x00]')
+
+# Every resolved ticket with its category and resolution time, for a full retrain
+TRAINING_QUERY = """
+    SELECT t.title, t.description, c.name AS category, t.priority,
+           (JULIANDAY(t.resolved_at) - JULIANDAY(t.created_at)) * 24 AS resolution_time_hours
+    FROM tickets t
+    JOIN categories c ON c.id = t.category_id
+    WHERE t.resolved_at IS NOT NULL
+"""
+
+# Resolved tickets after a (resolved_at, id) checkpoint, in checkpoint order
+INCREMENTAL_QUERY = """
+    SELECT t.id, t.title, t.description, c.name AS category, t.resolved_at,
+           (JULIANDAY(t.resolved_at) - JULIANDAY(t.created_at)) * 24 AS resolution_time_hours
+    FROM tickets t
+    JOIN categories c ON c.id = t.category_id
+    WHERE t.resolved_at IS NOT NULL {after}
+    ORDER BY t.resolved_at, t.id
+"""
+
+def _fit_model(model, X, y):
+    """Fit one model head, returning it with its fit time in seconds"""
+    started = time.perf_counter()
+    model.fit(X, y)
+    return model, time.perf_counter() - started
+
 class TicketPredictor:
-    def __init__(self):
-        self.category_model = None
-        self.resolution_time_model = None
-        self.tfidf_vectorizer = None
-        self.label_encoder = None
-        self.models_trained = False
-        self.model_dir = 'ml_models'
+    def __init__(self, model_dir='ml_models', n_jobs=1, sync_interval=30):
+        # The active ModelBundle; replaced as a whole, never modified
+        self.bundle = None
+        self.model_dir = model_dir
+        self.registry = ModelRegistry(model_dir)
+        # Cores used by train_models; -1 for all of them
+        self.n_jobs = n_jobs
+        # Seconds the last save_models took; kept out of the saved metadata
+        self.save_seconds = None
+        # Seconds between checks for a version activated by another process (0 = never)
+        self.sync_interval = sync_interval
+        self._synced_at = time.monotonic()
+        self._sync_lock = threading.Lock()
         
         # Create models directory if it doesn't exist
         if not os.path.exists(self.model_dir):
             os.makedirs(self.model_dir)
     
+    @property
+    def models_trained(self):
+        return self.bundle is not None
+    
+    @property
+    def category_model(self):
+        return self.bundle.category_model if self.bundle else None
+    
+    @property
+    def resolution_time_model(self):
+        return self.bundle.resolution_time_model if self.bundle else None
+    
+    @property
+    def tfidf_vectorizer(self):
+        return self.bundle.tfidf_vectorizer if self.bundle else None
+    
+    @property
+    def label_encoder(self):
+        return self.bundle.label_encoder if self.bundle else None
+    
     def preprocess_text(self, text):
         """Clean and preprocess text data"""
         if pd.isna(text) or text is None:
@@ -41,6 +106,33 @@ class TicketPredictor:
         
         return text
     
+    def preprocess_texts(self, texts, chunk_size=10000):
+        """Clean many texts, giving the same result as preprocess_text on each
+        
+        Each chunk is joined into one string so lowercasing and stripping run
+        once per chunk rather than once per text.
+        """
+        # Missing values and non-strings take the per-text path
+        texts = [text if isinstance(text, str) else self.preprocess_text(text) for text in texts]
+        
+        cleaned = []
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            joined = TEXT_SEPARATOR.join(chunk)
+            if joined.count(TEXT_SEPARATOR) != len(chunk) - 1:
+                # A text contains the separator itself
+                cleaned.extend(self.preprocess_text(text) for text in chunk)
+                continue
+            
+            joined = joined.lower()
+            if joined.isascii():
+                joined = joined.translate(ASCII_NON_LETTERS)
+            else:
+                joined = NON_LETTERS.sub('', joined)
+            cleaned.extend(' '.join(text.split()) for text in joined.split(TEXT_SEPARATOR))
+        
+        return cleaned
+    
     def generate_sample_data(self):
         """Generate sample training data for demonstration"""
         categories = ['Technical Issue', 'Account Support', 'Billing', 'Feature Request', 'Bug Report', 'General Inquiry']
@@ -112,37 +204,62 @@ class TicketPredictor:
     def load_data_from_db(self):
         """Load ticket data from database"""
         try:
-            conn = sqlite3.connect('instance/database.db')
-            query = """
-            SELECT title, description, category, priority, status, created_at, updated_at
-            FROM tickets
-            WHERE status = 'Resolved'
-            """
-            df = pd.read_sql_query(query, conn)
-            conn.close()
+            conn = get_read_connection()
+            try:
+                df = pd.read_sql_query(TRAINING_QUERY, conn)
+            finally:
+                conn.close()
             
             if len(df) < 10:  # If not enough real data, use sample data
                 print("Not enough real data, using sample data for training...")
                 return self.generate_sample_data()
             
-            # Calculate resolution time
-            df['created_at'] = pd.to_datetime(df['created_at'])
-            df['updated_at'] = pd.to_datetime(df['updated_at'])
-            df['resolution_time_hours'] = (df['updated_at'] - df['created_at']).dt.total_seconds() / 3600
-            
             # Combine title and description
             df['description'] = df['title'].fillna('') + ' ' + df['description'].fillna('')
             
             return df[['description', 'category', 'priority', 'resolution_time_hours']]
-            
+        
         except Exception as e:
             print(f"Error loading data from database: {e}")
             return self.generate_sample_data()
     
-    def train_models(self):
-        """Train both category prediction and resolution time models"""
+    def train_models(self, progress=None):
+        """Train both category prediction and resolution time models
+        
+        progress, if given, is called with (stage, fraction done) as
+        training moves through its stages. Seconds spent in each stage up to
+        saving are recorded in the bundle metadata under 'timings'; the save
+        itself is in save_seconds.
+        
+        With n_jobs other than 1 the two models are fitted at the same time
+        on two threads, the random forest building its trees on the cores the
+        decision tree leaves free. scikit-learn releases the GIL while growing
+        trees, and threads avoid a spawned process re-importing app.py.
+        """
+        def report(stage, fraction):
+            if progress is not None:
+                progress(stage, fraction)
+        
+        timings = {}
+        stage_started = time.perf_counter()
+        def timed(stage):
+            nonlocal stage_started
+            now = time.perf_counter()
+            timings[stage] = round(now - stage_started, 3)
+            stage_started = now
+        
+        # scikit-learn is only imported when training, keeping it off app startup
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.tree import DecisionTreeClassifier
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import LabelEncoder
+        from sklearn.metrics import accuracy_score, mean_absolute_error
+        
+        report('loading data', 0.0)
         print("Loading training data...")
         df = self.load_data_from_db()
+        timed('load')
         
         if len(df) == 0:
             print("No data available for training")
@@ -151,10 +268,12 @@ class TicketPredictor:
         print(f"Training with {len(df)} samples...")
         
         # Preprocess descriptions
-        df['description_clean'] = df['description'].apply(self.preprocess_text)
+        report('preprocessing', 0.1)
+        df['description_clean'] = self.preprocess_texts(df['description'].tolist())
         
         # Remove empty descriptions
         df = df[df['description_clean'].str.len() > 0]
+        timed('preprocess')
         
         if len(df) == 0:
             print("No valid descriptions for training")
@@ -164,93 +283,348 @@ class TicketPredictor:
         X_text = df['description_clean'].values
         
         # TF-IDF Vectorization
-        self.tfidf_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        X_tfidf = self.tfidf_vectorizer.fit_transform(X_text)
+        report('vectorizing', 0.2)
+        tfidf_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        X_tfidf = tfidf_vectorizer.fit_transform(X_text)
+        timed('vectorize')
         
-        # Train Category Prediction Model
-        print("Training category prediction model...")
-        self.label_encoder = LabelEncoder()
-        y_category = self.label_encoder.fit_transform(df['category'])
+        label_encoder = LabelEncoder()
+        y_category = label_encoder.fit_transform(df['category'])
+        y_resolution = df['resolution_time_hours'].values
         
         X_train_cat, X_test_cat, y_train_cat, y_test_cat = train_test_split(
             X_tfidf, y_category, test_size=0.2, random_state=42
         )
+        X_train_res, X_test_res, y_train_res, y_test_res = train_test_split(
+            X_tfidf, y_resolution, test_size=0.2, random_state=42
+        )
+        
+        cores = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+        category_model = DecisionTreeClassifier(random_state=42, max_depth=10)
+        resolution_time_model = RandomForestRegressor(
+            n_estimators=100, random_state=42, n_jobs=max(1, cores - 1)
+        )
         
-        self.category_model = DecisionTreeClassifier(random_state=42, max_depth=10)
-        self.category_model.fit(X_train_cat, y_train_cat)
+        if cores > 1:
+            report('training models', 0.3)
+            print(f"Training both prediction models in parallel on {cores} cores...")
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                category_fit = pool.submit(_fit_model, category_model, X_train_cat, y_train_cat)
+                resolution_fit = pool.submit(_fit_model, resolution_time_model, X_train_res, y_train_res)
+                category_model, category_seconds = category_fit.result()
+                resolution_time_model, resolution_seconds = resolution_fit.result()
+        else:
+            report('training category model', 0.3)
+            print("Training category prediction model...")
+            category_model, category_seconds = _fit_model(category_model, X_train_cat, y_train_cat)
+            
+            report('training resolution time model', 0.5)
+            print("Training resolution time prediction model...")
+            resolution_time_model, resolution_seconds = _fit_model(
+                resolution_time_model, X_train_res, y_train_res
+            )
+        # fit is wall time for both models
+        timed('fit')
+        timings['fit_category'] = round(category_seconds, 3)
+        timings['fit_resolution_time'] = round(resolution_seconds, 3)
         
-        # Evaluate category model
-        y_pred_cat = self.category_model.predict(X_test_cat)
+        # Evaluate both models on the held-out tickets
+        report('evaluating', 0.8)
+        y_pred_cat = category_model.predict(X_test_cat)
         cat_accuracy = accuracy_score(y_test_cat, y_pred_cat)
         print(f"Category prediction accuracy: {cat_accuracy:.2f}")
         
-        # Train Resolution Time Prediction Model
-        print("Training resolution time prediction model...")
-        y_resolution = df['resolution_time_hours'].values
+        y_pred_res = resolution_time_model.predict(X_test_res)
+        res_mae = mean_absolute_error(y_test_res, y_pred_res)
+        print(f"Resolution time prediction MAE: {res_mae:.2f} hours")
+        timed('evaluate')
         
-        X_train_res, X_test_res, y_train_res, y_test_res = train_test_split(
-            X_tfidf, y_resolution, test_size=0.2, random_state=42
+        # Serving predicts small batches, where worker threads cost more than they save
+        resolution_time_model.set_params(n_jobs=None)
+        
+        bundle = ModelBundle(
+            self.registry.new_version(),
+            category_model=category_model,
+            resolution_time_model=resolution_time_model,
+            tfidf_vectorizer=tfidf_vectorizer,
+            label_encoder=label_encoder,
+            metadata={
+                'mode': 'full',
+                'trained_at': datetime.now().isoformat(),
+                'samples': len(df),
+                'category_accuracy': round(float(cat_accuracy), 4),
+                'resolution_mae_hours': round(float(res_mae), 2),
+                'n_jobs': cores,
+                'timings': timings
+            }
         )
         
-        self.resolution_time_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.resolution_time_model.fit(X_train_res, y_train_res)
+        # Save the bundle, then switch predictions over to it in one step
+        report('saving', 0.9)
+        self.save_models(bundle)
+        self.bundle = bundle
         
-        # Evaluate resolution time model
-        y_pred_res = self.resolution_time_model.predict(X_test_res)
-        res_mae = mean_absolute_error(y_test_res, y_pred_res)
-        print(f"Resolution time prediction MAE: {res_mae:.2f} hours")
+        return True
+    
+    def train_incremental(self, chunk_size=10000, reset=False, progress=None):
+        """Update the models with tickets resolved since the last checkpoint
+        
+        Tickets are streamed from SQLite chunk_size at a time through a
+        stateless HashingVectorizer into partial_fit estimators, so memory
+        stays bounded by the chunk size however long the history is. The
+        checkpoint, the (resolved_at, id) of the last ticket consumed, is kept
+        in the bundle metadata. Starts from scratch when reset is set or the
+        active models came from a full retrain (train_models).
+        
+        Accuracy and MAE are progressive: each chunk is scored before the
+        models learn from it.
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier, SGDRegressor
+        from sklearn.preprocessing import LabelEncoder
+        
+        def report(stage, fraction):
+            if progress is not None:
+                progress(stage, fraction)
+        
+        report('loading data', 0.0)
+        conn = get_read_connection()
+        try:
+            base = self.bundle
+            if not reset and base is not None and base.metadata.get('mode') == 'incremental':
+                vectorizer = base.tfidf_vectorizer
+                label_encoder = base.label_encoder
+                # Bundles are never modified, so learn on copies of the models
+                category_model = copy.deepcopy(base.category_model)
+                resolution_time_model = copy.deepcopy(base.resolution_time_model)
+                checkpoint = base.metadata['checkpoint']
+                samples = base.metadata['samples']
+            else:
+                vectorizer = HashingVectorizer(n_features=2 ** 18, alternate_sign=False,
+                                               stop_words='english')
+                label_encoder = LabelEncoder().fit(
+                    [row['name'] for row in conn.execute('SELECT name FROM categories')])
+                category_model = SGDClassifier(loss='log_loss', random_state=42)
+                resolution_time_model = SGDRegressor(random_state=42)
+                checkpoint = None
+                samples = 0
+            
+            params = []
+            after = ''
+            if checkpoint:
+                after = 'AND (t.resolved_at > ? OR (t.resolved_at = ? AND t.id > ?))'
+                params = [checkpoint['resolved_at'], checkpoint['resolved_at'], checkpoint['id']]
+            
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM ({INCREMENTAL_QUERY.format(after=after)})", params
+            ).fetchone()[0]
+            if total == 0:
+                if base is None or samples == 0:
+                    print("No data available for training")
+                    return False
+                print("No tickets resolved since the last checkpoint")
+                return True
+            
+            print(f"Training incrementally with {total} new samples...")
+            classes = np.arange(len(label_encoder.classes_))
+            known = set(label_encoder.classes_)
+            consumed = new_samples = scored = correct = 0
+            absolute_error = 0.0
+            
+            cursor = conn.execute(INCREMENTAL_QUERY.format(after=after), params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                consumed += len(rows)
+                checkpoint = {'resolved_at': rows[-1]['resolved_at'], 'id': rows[-1]['id']}
+                
+                cleaned = self.preprocess_texts(
+                    [f"{row['title'] or ''} {row['description'] or ''}" for row in rows])
+                texts, categories, hours = [], [], []
+                for row, text in zip(rows, cleaned):
+                    if text and row['category'] in known:
+                        texts.append(text)
+                        categories.append(row['category'])
+                        hours.append(row['resolution_time_hours'])
+                
+                if texts:
+                    X = vectorizer.transform(texts)
+                    y_category = label_encoder.transform(categories)
+                    y_hours = np.array(hours)
+                    
+                    if samples + new_samples > 0:
+                        correct += int((category_model.predict(X) == y_category).sum())
+                        absolute_error += float(np.abs(resolution_time_model.predict(X) - y_hours).sum())
+                        scored += len(texts)
+                    
+                    category_model.partial_fit(X, y_category, classes=classes)
+                    resolution_time_model.partial_fit(X, y_hours)
+                    new_samples += len(texts)
+                
+                report('training', 0.05 + 0.85 * consumed / total)
+        finally:
+            conn.close()
+        
+        if new_samples == 0 and samples == 0:
+            print("No valid descriptions for training")
+            return False
+        
+        metadata = {
+            'mode': 'incremental',
+            'trained_at': datetime.now().isoformat(),
+            'samples': samples + new_samples,
+            'new_samples': new_samples,
+            'checkpoint': checkpoint
+        }
+        if scored:
+            metadata['category_accuracy'] = round(correct / scored, 4)
+            metadata['resolution_mae_hours'] = round(absolute_error / scored, 2)
+            print(f"Progressive category accuracy: {metadata['category_accuracy']:.2f}, "
+                  f"resolution time MAE: {metadata['resolution_mae_hours']:.2f} hours")
+        
+        bundle = ModelBundle(
+            self.registry.new_version(),
+            category_model=category_model,
+            resolution_time_model=resolution_time_model,
+            tfidf_vectorizer=vectorizer,
+            label_encoder=label_encoder,
+            metadata=metadata
+        )
         
-        # Save models
-        self.save_models()
-        self.models_trained = True
+        report('saving', 0.9)
+        self.save_models(bundle)
+        self.bundle = bundle
         
         return True
     
-    def save_models(self):
-        """Save trained models to disk"""
+    def save_models(self, bundle=None):
+        """Save a model bundle (default the active one) as a new version"""
         try:
-            joblib.dump(self.category_model, os.path.join(self.model_dir, 'category_model.pkl'))
-            joblib.dump(self.resolution_time_model, os.path.join(self.model_dir, 'resolution_time_model.pkl'))
-            joblib.dump(self.tfidf_vectorizer, os.path.join(self.model_dir, 'tfidf_vectorizer.pkl'))
-            joblib.dump(self.label_encoder, os.path.join(self.model_dir, 'label_encoder.pkl'))
-            print("Models saved successfully")
+            bundle = bundle or self.bundle
+            started = time.perf_counter()
+            self.registry.save(bundle)
+            self.save_seconds = round(time.perf_counter() - started, 3)
+            print(f"Models saved successfully as version {bundle.version} "
+                  f"in {self.save_seconds:.2f} s")
         except Exception as e:
             print(f"Error saving models: {e}")
     
-    def load_models(self):
-        """Load trained models from disk"""
+    def load_models(self, version=None):
+        """Load a saved model version (default the active one) from disk"""
         try:
-            model_files = [
-                'category_model.pkl',
-                'resolution_time_model.pkl',
-                'tfidf_vectorizer.pkl',
-                'label_encoder.pkl'
-            ]
-            
-            # Check if all model files exist
-            for file in model_files:
-                if not os.path.exists(os.path.join(self.model_dir, file)):
-                    return False
-            
-            self.category_model = joblib.load(os.path.join(self.model_dir, 'category_model.pkl'))
-            self.resolution_time_model = joblib.load(os.path.join(self.model_dir, 'resolution_time_model.pkl'))
-            self.tfidf_vectorizer = joblib.load(os.path.join(self.model_dir, 'tfidf_vectorizer.pkl'))
-            self.label_encoder = joblib.load(os.path.join(self.model_dir, 'label_encoder.pkl'))
+            bundle = self.registry.load(version)
+            if bundle is None:
+                return False
             
-            self.models_trained = True
+            self.bundle = bundle
             print("Models loaded successfully")
             return True
-            
+        
         except Exception as e:
             print(f"Error loading models: {e}")
             return False
     
+    def rollback_models(self):
+        """Switch back to the version saved before the active one
+        
+        Returns the version now in use, or None if there is nothing older.
+        """
+        version = self.registry.previous_version(self.bundle.version if self.bundle else None)
+        if version is None:
+            return None
+        
+        bundle = self.registry.load(version)
+        self.registry.activate(version)
+        self.bundle = bundle
+        return version
+    
+    def ensure_models(self):
+        """Load the saved models, training new ones if there are none"""
+        if self.models_trained:
+            self.sync_models()
+            return True
+        return self.load_models() or self.train_models()
+    
+    def sync_models(self):
+        """Switch to the registry's active version if another process changed it
+        
+        Training and rollbacks swap the bundle only in the process that ran
+        them, so the others read the CURRENT file, at most once every
+        sync_interval seconds, and load the version it names. One thread
+        loads while the rest keep predicting with the current bundle.
+        """
+        if not self.sync_interval or time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = time.monotonic()
+            version = self.registry.current_version()
+            if version and self.bundle and version != self.bundle.version:
+                print(f"Switching to model version {version} activated by another process")
+                self.load_models(version)
+        finally:
+            self._sync_lock.release()
+    
+    def extract_features(self, clean_texts, bundle=None):
+        """TF-IDF feature rows for preprocessed texts, shared by every model head
+        
+        Rows are cached by a hash of the cleaned text, so repeated
+        descriptions skip vectorization; the remaining texts are vectorized
+        together in one transform call. Batches above
+        FEATURE_CACHE_BATCH_LIMIT bypass the cache.
+        """
+        from scipy import sparse
+        
+        bundle = bundle or self.bundle
+        if len(clean_texts) > FEATURE_CACHE_BATCH_LIMIT:
+            # Large batches would only churn the cache; dedupe them instead
+            positions = {}
+            index = [positions.setdefault(text, len(positions)) for text in clean_texts]
+            return bundle.tfidf_vectorizer.transform(list(positions))[index]
+        
+        rows = [None] * len(clean_texts)
+        missing = {}
+        for i, text in enumerate(clean_texts):
+            key = (bundle.features_version, hashlib.sha1(text.encode('utf-8')).hexdigest())
+            row = feature_cache.get(key)
+            if row is MISSING:
+                missing.setdefault(text, (key, []))[1].append(i)
+            else:
+                rows[i] = row
+        
+        if missing:
+            X_new = bundle.tfidf_vectorizer.transform(list(missing))
+            for n, (key, indices) in enumerate(missing.values()):
+                row = X_new[n]
+                feature_cache.set(key, row)
+                for i in indices:
+                    rows[i] = row
+        
+        return sparse.vstack(rows, format='csr')
+    
+    def predict_features(self, X_tfidf, bundle=None):
+        """Run every model head on a feature matrix
+        
+        Returns arrays of categories, category confidences and resolution
+        times in hours (between 1 hour and 1 week). The category is taken
+        from predict_proba, which is what predict() does internally.
+        """
+        bundle = bundle or self.bundle
+        probabilities = bundle.category_model.predict_proba(X_tfidf)
+        best = probabilities.argmax(axis=1)
+        categories = bundle.label_encoder.inverse_transform(bundle.category_model.classes_[best])
+        confidences = probabilities[np.arange(len(best)), best]
+        
+        resolution_times = np.clip(bundle.resolution_time_model.predict(X_tfidf), 1.0, 168.0)
+        
+        return categories, confidences, resolution_times
+    
     def predict_category(self, description):
         """Predict ticket category based on description"""
-        if not self.models_trained:
-            if not self.load_models():
-                if not self.train_models():
-                    return "General Inquiry", 0.0
+        if not self.ensure_models():
+            return "General Inquiry", 0.0
         
         try:
             # Preprocess description
@@ -258,29 +632,19 @@ class TicketPredictor:
             if not clean_desc:
                 return "General Inquiry", 0.0
             
-            # Transform to TF-IDF
-            X_tfidf = self.tfidf_vectorizer.transform([clean_desc])
-            
-            # Predict category
-            prediction = self.category_model.predict(X_tfidf)[0]
-            probabilities = self.category_model.predict_proba(X_tfidf)[0]
-            
-            # Get category name and confidence
-            category = self.label_encoder.inverse_transform([prediction])[0]
-            confidence = max(probabilities)
-            
-            return category, confidence
-            
+            bundle = self.bundle
+            categories, confidences, _ = self.predict_features(
+                self.extract_features([clean_desc], bundle), bundle)
+            return categories[0], confidences[0]
+        
         except Exception as e:
             print(f"Error predicting category: {e}")
             return "General Inquiry", 0.0
     
     def predict_resolution_time(self, description):
         """Predict expected resolution time based on description"""
-        if not self.models_trained:
-            if not self.load_models():
-                if not self.train_models():
-                    return 24.0  # Default 24 hours
+        if not self.ensure_models():
+            return 24.0  # Default 24 hours
         
         try:
             # Preprocess description
@@ -288,26 +652,62 @@ class TicketPredictor:
             if not clean_desc:
                 return 24.0
             
-            # Transform to TF-IDF
-            X_tfidf = self.tfidf_vectorizer.transform([clean_desc])
-            
-            # Predict resolution time
-            prediction = self.resolution_time_model.predict(X_tfidf)[0]
+            bundle = self.bundle
+            X_tfidf = self.extract_features([clean_desc], bundle)
+            prediction = bundle.resolution_time_model.predict(X_tfidf)[0]
             
             # Ensure reasonable bounds
             prediction = max(1.0, min(168.0, prediction))  # Between 1 hour and 1 week
             
             return round(prediction, 1)
-            
+        
         except Exception as e:
             print(f"Error predicting resolution time: {e}")
             return 24.0
     
+    def predict_batch(self, descriptions, chunk_size=1000):
+        """Get prediction insights for many descriptions at once
+        
+        Each chunk of descriptions goes through extract_features once and
+        every model head as a single matrix call. Results match
+        get_prediction_insights for each item.
+        """
+        if not self.ensure_models():
+            return [self.format_insights("General Inquiry", 0.0, 24.0) for _ in descriptions]
+        
+        # Every chunk uses the same bundle even if a new one is swapped in
+        bundle = self.bundle
+        results = []
+        for start in range(0, len(descriptions), chunk_size):
+            chunk = self.preprocess_texts(descriptions[start:start + chunk_size])
+            
+            # Empty descriptions get the same defaults as the single-item path
+            rows = [i for i, text in enumerate(chunk) if text]
+            chunk_results = [self.format_insights("General Inquiry", 0.0, 24.0) for _ in chunk]
+            
+            if rows:
+                X_tfidf = self.extract_features([chunk[i] for i in rows], bundle)
+                categories, confidences, resolution_times = self.predict_features(X_tfidf, bundle)
+                
+                for i, category, confidence, resolution_time in zip(
+                        rows, categories, confidences, resolution_times):
+                    chunk_results[i] = self.format_insights(
+                        category, confidence, round(float(resolution_time), 1))
+            
+            results.extend(chunk_results)
+        
+        return results
+    
     def get_prediction_insights(self, description):
         """Get comprehensive prediction insights"""
-        category, category_confidence = self.predict_category(description)
-        resolution_time = self.predict_resolution_time(description)
-        
+        try:
+            return self.predict_batch([description])[0]
+        except Exception as e:
+            print(f"Error predicting ticket: {e}")
+            return self.format_insights("General Inquiry", 0.0, 24.0)
+    
+    def format_insights(self, category, category_confidence, resolution_time):
+        """Build the insights dict returned by the prediction APIs"""
         # Convert hours to human-readable format
         if resolution_time < 24:
             time_str = f"{resolution_time:.1f} hours"
@@ -323,19 +723,98 @@ class TicketPredictor:
             'confidence_level': 'High' if category_confidence > 0.7 else 'Medium' if category_confidence > 0.5 else 'Low'
         }
 
+class ModelLifecycle:
+    """Loads or trains a predictor's models away from the request path
+    
+    The state moves from idle to loading, then to ready, or to failed if
+    neither the saved models could be loaded nor new ones trained.
+    """
+    
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.source = None
+        self.error = None
+        self.load_seconds = None
+        
+        self._loading = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+    
+    @property
+    def state(self):
+        """Current state: idle, loading, ready or failed"""
+        if self.predictor.models_trained:
+            return 'ready'
+        if self._loading:
+            return 'loading'
+        if self.error:
+            return 'failed'
+        return 'idle'
+    
+    def start(self):
+        """Start loading in a background thread unless loading or ready
+        
+        Calling this after a failure retries the load.
+        """
+        with self._lock:
+            if self._loading or self.predictor.models_trained:
+                return
+            self._loading = True
+            self._done.clear()
+        
+        thread = threading.Thread(target=self._run, name='ml-model-loader', daemon=True)
+        thread.start()
+    
+    def _run(self):
+        """Load the saved models, training new ones if there are none"""
+        started = time.perf_counter()
+        try:
+            if self.predictor.load_models():
+                self.source = 'saved'
+            else:
+                print("Training new ML models...")
+                if not self.predictor.train_models():
+                    raise RuntimeError('No data available for training')
+                self.source = 'trained'
+            self.error = None
+        except Exception as e:
+            print(f"Error initializing ML models: {e}")
+            self.error = str(e)
+        finally:
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            with self._lock:
+                self._loading = False
+            self._done.set()
+    
+    def wait_until_ready(self, timeout=None):
+        """Wait up to timeout seconds for the models, starting a first load
+        
+        Returns True once the models are ready. A failed load is not retried
+        here; use start() or retrain the models.
+        """
+        if self.predictor.models_trained:
+            return True
+        if self.error is None:
+            self.start()
+        self._done.wait(timeout)
+        return self.predictor.models_trained
+    
+    def status(self):
+        """State and timing of the last load"""
+        return {
+            'state': self.state,
+            'source': self.source,
+            'load_seconds': self.load_seconds,
+            'error': self.error
+        }
+
 # Global predictor instance
 predictor = TicketPredictor()
+model_lifecycle = ModelLifecycle(predictor)
 
 def initialize_ml_models():
-    """Initialize ML models on startup"""
-    try:
-        if not predictor.load_models():
-            print("Training new ML models...")
-            predictor.train_models()
-        return True
-    except Exception as e:
-        print(f"Error initializing ML models: {e}")
-        return False
+    """Initialize ML models, blocking until they are loaded or trained"""
+    return model_lifecycle.wait_until_ready()
 
 if __name__ == "__main__":
     # Test the predictor
@@ -0,0 +1,177 @@
+import itertools
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import joblib
+
+# Artifacts that make up one model bundle
+MODEL_FILES = {
+    'category_model': 'category_model.pkl',
+    'resolution_time_model': 'resolution_time_model.pkl',
+    'tfidf_vectorizer': 'tfidf_vectorizer.pkl',
+    'label_encoder': 'label_encoder.pkl'
+}
+
+# Models saved directly in the model directory before versioning
+LEGACY_VERSION = 'legacy'
+
+# How a version's artifacts are written and read back:
+#   pickle: plain joblib files, read into each process's own memory
+#   mmap: uncompressed, numpy arrays memory-mapped read-only, so worker
+#       processes loading the same version share those pages
+#   compressed: zlib compressed, smallest on disk for shipping bundles
+ARTIFACT_FORMATS = ('pickle', 'mmap', 'compressed')
+
+# Every bundle created in this process gets a distinct features_version, so
+# cached feature rows from one vectorizer are never reused with another
+_features_versions = itertools.count(1)
+
+class ModelBundle:
+    """One trained set of models, never modified once created
+    
+    Serving code reads the bundle through a single reference, so a swap to
+    a new bundle can never mix the vectorizer of one training run with the
+    models of another.
+    """
+    
+    def __init__(self, version, category_model, resolution_time_model, tfidf_vectorizer,
+                 label_encoder, metadata=None):
+        self.version = version
+        self.category_model = category_model
+        self.resolution_time_model = resolution_time_model
+        self.tfidf_vectorizer = tfidf_vectorizer
+        self.label_encoder = label_encoder
+        self.metadata = dict(metadata or {})
+        self.features_version = next(_features_versions)
+    
+    def info(self):
+        """Version and training metadata for status reporting"""
+        return dict(self.metadata, version=self.version)
+
+class ModelRegistry:
+    """Versioned model bundles stored as ml_models/<version>/
+    
+    A bundle is written to a temporary directory and renamed into place, and
+    the CURRENT file naming the active version is replaced atomically, so a
+    reader never sees a partly written bundle.
+    """
+    
+    def __init__(self, model_dir='ml_models', keep_versions=5, artifact_format='mmap'):
+        self.model_dir = model_dir
+        self.keep_versions = keep_versions
+        self.artifact_format = artifact_format
+        self._lock = threading.Lock()
+    
+    @property
+    def artifact_format(self):
+        """Format new versions are saved in; each version records its own"""
+        return self._artifact_format
+    
+    @artifact_format.setter
+    def artifact_format(self, artifact_format):
+        if artifact_format not in ARTIFACT_FORMATS:
+            raise ValueError(f'Unknown model artifact format: {artifact_format}')
+        self._artifact_format = artifact_format
+    
+    @staticmethod
+    def new_version():
+        """Version name for a bundle trained now; names sort by training time"""
+        return datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    
+    def _path(self, *parts):
+        return os.path.join(self.model_dir, *parts)
+    
+    def list_versions(self):
+        """Saved versions, oldest first"""
+        if not os.path.isdir(self.model_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.model_dir)
+            if not name.startswith('.') and os.path.isfile(self._path(name, 'metadata.json'))
+        )
+    
+    def current_version(self):
+        """The active version, falling back to the legacy flat files"""
+        try:
+            with open(self._path('CURRENT')) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+        
+        if all(os.path.exists(self._path(name)) for name in MODEL_FILES.values()):
+            return LEGACY_VERSION
+        return None
+    
+    def previous_version(self, version=None):
+        """The saved version before version (default the active one)"""
+        version = version or self.current_version()
+        if version == LEGACY_VERSION:
+            return None
+        older = [name for name in self.list_versions() if version is None or name < version]
+        return older[-1] if older else None
+    
+    def save(self, bundle, artifact_format=None):
+        """Write a bundle to ml_models/<version>/ and make it the active version"""
+        artifact_format = artifact_format or self.artifact_format
+        if artifact_format not in ARTIFACT_FORMATS:
+            raise ValueError(f'Unknown model artifact format: {artifact_format}')
+        compress = ('zlib', 3) if artifact_format == 'compressed' else 0
+        
+        with self._lock:
+            os.makedirs(self.model_dir, exist_ok=True)
+            staging = self._path(f'.tmp-{bundle.version}')
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            
+            for attribute, filename in MODEL_FILES.items():
+                joblib.dump(getattr(bundle, attribute), os.path.join(staging, filename),
+                            compress=compress)
+            with open(os.path.join(staging, 'metadata.json'), 'w') as f:
+                json.dump(dict(bundle.info(), artifact_format=artifact_format), f, indent=2)
+            
+            os.rename(staging, self._path(bundle.version))
+            self._activate(bundle.version)
+            self._prune()
+    
+    def load(self, version=None):
+        """Load a bundle (default the active one), or None if there is none"""
+        version = version or self.current_version()
+        if version is None:
+            return None
+        
+        directory = self.model_dir if version == LEGACY_VERSION else self._path(version)
+        metadata = {}
+        if version != LEGACY_VERSION:
+            with open(os.path.join(directory, 'metadata.json')) as f:
+                metadata = json.load(f)
+        metadata.pop('version', None)
+        
+        mmap_mode = 'r' if metadata.get('artifact_format') == 'mmap' else None
+        models = {attribute: joblib.load(os.path.join(directory, filename), mmap_mode=mmap_mode)
+                  for attribute, filename in MODEL_FILES.items()}
+        
+        return ModelBundle(version, metadata=metadata, **models)
+    
+    def activate(self, version):
+        """Make a saved version the active one"""
+        with self._lock:
+            self._activate(version)
+    
+    def _activate(self, version):
+        temporary = self._path('.CURRENT.tmp')
+        with open(temporary, 'w') as f:
+            f.write(version)
+        os.replace(temporary, self._path('CURRENT'))
+    
+    def _prune(self):
+        """Delete the oldest versions beyond keep_versions, never the active one"""
+        current = self.current_version()
+        versions = self.list_versions()
+        for version in versions[:max(0, len(versions) - self.keep_versions)]:
+            if version != current:
+                shutil.rmtree(self._path(version), ignore_errors=True)
@@ -1,5 +1,11 @@
+import time
+from flask import session
 from flask_login import UserMixin
-from database import get_db_connection
+from database import get_db_connection, write_transaction
+from cache import LRUCache, MISSING
+
+# Users by id; cleared on every user write
+user_cache = LRUCache('users', maxsize=1024, ttl=60)
 
 class User(UserMixin):
     """User model for authentication"""
@@ -13,6 +19,10 @@ class User(UserMixin):
     @staticmethod
     def get(user_id):
         """Get user by ID"""
+        user = user_cache.get(('id', user_id))
+        if user is not MISSING:
+            return user
+        
         conn = get_db_connection()
         user_data = conn.execute(
             'SELECT * FROM users WHERE id = ?', (user_id,)
@@ -20,17 +30,23 @@ class User(UserMixin):
         conn.close()
         
         if user_data:
-            return User(
+            user = User(
                 id=user_data['id'],
                 username=user_data['username'],
                 email=user_data['email'],
                 role=user_data['role']
             )
+            user_cache.set(('id', user_id), user)
+            return user
         return None
     
     @staticmethod
     def get_by_username(username):
-        """Get user by username"""
+        """Get user by username, with their password hash
+        
+        Always read from the database, since the hash is checked against it at
+        login; the user is then cached for the requests that follow.
+        """
         conn = get_db_connection()
         user_data = conn.execute(
             'SELECT * FROM users WHERE username = ?', (username,)
@@ -38,30 +54,46 @@ class User(UserMixin):
         conn.close()
         
         if user_data:
-            return User(
+            user = User(
                 id=user_data['id'],
                 username=user_data['username'],
                 email=user_data['email'],
                 role=user_data['role']
-            ), user_data['password_hash']
+            )
+            user_cache.set(('id', user.id), user)
+            return user, user_data['password_hash']
         return None, None
     
     @staticmethod
     def create_user(username, email, password_hash, role='agent'):
         """Create a new user"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             cursor = conn.execute(
                 'INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)',
                 (username, email, password_hash, role)
             )
             user_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return user_id
-        except Exception as e:
-            conn.close()
-            raise e
+        user_cache.clear()
+        return user_id
+    
+    def to_snapshot(self):
+        """Compact form of the user for storing in the (signed) session"""
+        return [self.id, self.username, self.email, self.role, int(time.time())]
+    
+    @staticmethod
+    def from_snapshot(snapshot, user_id, max_age):
+        """Rebuild a user from a session snapshot
+        
+        Returns None if the snapshot is missing, belongs to another user or
+        is older than max_age seconds, so the caller reloads from the database.
+        """
+        if not snapshot or len(snapshot) != 5:
+            return None
+        
+        id, username, email, role, taken_at = snapshot
+        if str(id) != str(user_id) or time.time() - taken_at > max_age:
+            return None
+        return User(id=id, username=username, email=email, role=role)
     
     def is_admin(self):
         """Check if user is admin"""
@@ -73,3 +105,19 @@ class User(UserMixin):
     
     def __repr__(self):
         return f'<User {self.username}>'
+
+def load_session_user(user_id, use_snapshot=False, max_age=60):
+    """Flask-Login user loader
+    
+    With use_snapshot the user is rebuilt from a snapshot in the signed
+    session cookie and only reloaded once the snapshot is max_age old.
+    """
+    if not use_snapshot:
+        return User.get(int(user_id))
+    
+    user = User.from_snapshot(session.get('_user_snapshot'), user_id, max_age)
+    if user is None:
+        user = User.get(int(user_id))
+        if user:
+            session['_user_snapshot'] = user.to_snapshot()
+    return user
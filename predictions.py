@@ -1,15 +1,23 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
-from ml_predictions import predictor, initialize_ml_models
-import sqlite3
+from ml_predictions import predictor, model_lifecycle
+from training_jobs import training_jobs, TRAINING_MODES
+from database import get_read_connection
 from datetime import datetime
 
 predictions_bp = Blueprint('predictions', __name__, url_prefix='/predictions')
 
-def get_db_connection():
-    conn = sqlite3.connect('instance/database.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+def models_unavailable():
+    """Wait briefly for the models, returning a 503 response if they are not ready"""
+    if model_lifecycle.wait_until_ready(current_app.config.get('ML_MODEL_WAIT', 5)):
+        return None
+    
+    status = model_lifecycle.status()
+    return jsonify({
+        'error': 'Prediction models are not ready',
+        'state': status['state'],
+        'details': status['error']
+    }), 503
 
 @predictions_bp.route('/')
 @login_required
@@ -28,6 +36,10 @@ def predict_ticket():
         if not description.strip():
             return jsonify({'error': 'Description is required'}), 400
         
+        unavailable = models_unavailable()
+        if unavailable:
+            return unavailable
+        
         # Get predictions
         insights = predictor.get_prediction_insights(description)
         
@@ -42,22 +54,69 @@ def predict_ticket():
 @predictions_bp.route('/api/retrain', methods=['POST'])
 @login_required
 def retrain_models():
-    """API endpoint to retrain ML models"""
+    """API endpoint to queue a background retraining of the ML models"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', current_app.config.get('ML_TRAINING_MODE', 'full'))
+    if mode not in TRAINING_MODES:
+        return jsonify({'error': f"Mode must be one of: {', '.join(TRAINING_MODES)}"}), 400
+    
+    try:
+        job_id, created = training_jobs.submit(mode=mode, requested_by=current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': 'Model retraining started' if created else 'Model retraining is already in progress'
+        }), 202
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@predictions_bp.route('/api/retrain/<int:job_id>')
+@login_required
+def retrain_status(job_id):
+    """Status, progress and metrics of a retraining job"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    job = training_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job)
+
+@predictions_bp.route('/api/retrain/jobs')
+@login_required
+def retrain_jobs():
+    """Most recent retraining jobs"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    return jsonify(training_jobs.get_recent())
+
+@predictions_bp.route('/api/rollback', methods=['POST'])
+@login_required
+def rollback_models():
+    """API endpoint to switch back to the previously trained models"""
     if current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
     try:
-        success = predictor.train_models()
+        version = predictor.rollback_models()
         
-        if success:
+        if version:
             return jsonify({
                 'success': True,
-                'message': 'Models retrained successfully'
+                'message': f'Rolled back to model version {version}',
+                'version': version
             })
         else:
             return jsonify({
                 'success': False,
-                'message': 'Failed to retrain models'
+                'message': 'No earlier model version to roll back to'
             })
             
     except Exception as e:
@@ -68,11 +127,14 @@ def retrain_models():
 def model_status():
     """Get ML model status information"""
     try:
-        # Check if models are loaded
+        # Check if models are loaded, starting a first load if none has run
+        if model_lifecycle.state == 'idle':
+            model_lifecycle.start()
+        lifecycle = model_lifecycle.status()
         models_loaded = predictor.models_trained
         
         # Get some basic stats
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor()
         
         # Count total tickets for training data
@@ -87,6 +149,12 @@ def model_status():
         
         return jsonify({
             'models_loaded': models_loaded,
+            'model_state': lifecycle['state'],
+            'model_source': lifecycle['source'],
+            'model_load_seconds': lifecycle['load_seconds'],
+            'model_error': lifecycle['error'],
+            'model_version': predictor.bundle.info() if predictor.bundle else None,
+            'available_versions': predictor.registry.list_versions(),
             'total_tickets': total_tickets,
             'training_data_size': resolved_tickets,
             'recommendation': 'Good' if resolved_tickets >= 50 else 'Limited' if resolved_tickets >= 10 else 'Insufficient'
@@ -106,14 +174,18 @@ def batch_predict():
         if not descriptions:
             return jsonify({'error': 'No descriptions provided'}), 400
         
-        results = []
-        for desc in descriptions:
-            if desc.strip():
-                insights = predictor.get_prediction_insights(desc)
-                results.append({
-                    'description': desc,
-                    'predictions': insights
-                })
+        unavailable = models_unavailable()
+        if unavailable:
+            return unavailable
+        
+        descriptions = [desc for desc in descriptions if desc.strip()]
+        chunk_size = current_app.config.get('ML_BATCH_CHUNK_SIZE', 1000)
+        predictions = predictor.predict_batch(descriptions, chunk_size=chunk_size)
+        
+        results = [{
+            'description': desc,
+            'predictions': insights
+        } for desc, insights in zip(descriptions, predictions)]
         
         return jsonify({
             'success': True,
@@ -134,7 +206,7 @@ def test_predictions():
 def insights():
     """Prediction insights and analytics"""
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor()
         
         # Get category distribution
@@ -183,9 +255,3 @@ def insights():
     except Exception as e:
         flash(f'Error loading insights: {str(e)}', 'error')
         return redirect(url_for('predictions.dashboard'))
-
-# Initialize ML models when blueprint is imported
-try:
-    initialize_ml_models()
-except Exception as e:
-    print(f"Warning: Could not initialize ML models: {e}")
@@ -27,16 +27,22 @@ class AnalyticsDashboard {
     }
 
     async loadAllData() {
-        const promises = [
-            this.loadTicketsByCategory(),
-            this.loadResolutionTime(),
-            this.loadTimeSeriesData(),
-            this.loadPriorityDistribution(),
-            this.loadStatusDistribution(),
-            this.loadAgentPerformance()
-        ];
+        // One request for every widget instead of one request each
+        const response = await fetch(`/analytics/api/bundle?days=${this.currentTimeRange}`);
+        if (!response.ok) {
+            throw new Error(`Bundle request failed with status ${response.status}`);
+        }
+        const data = await response.json();
 
-        await Promise.all(promises);
+        this.renderCategoryChart(data.tickets_by_category);
+        this.updateResolutionTimeMetrics(data.resolution_time.overall);
+        this.renderResolutionTimeChart(data.resolution_time.by_category);
+        this.renderTimeSeriesChart(data.time_series);
+        this.updateTimeSeriesMetrics(data.time_series);
+        this.renderPriorityChart(data.priority_distribution);
+        this.renderStatusChart(data.status_distribution);
+        this.updateStatusMetrics(data.status_distribution);
+        this.renderAgentPerformanceTable(data.agent_performance);
     }
 
     async loadTicketsByCategory() {
@@ -0,0 +1,30 @@
+"""LRUCache and the @cached decorator"""
+from cache import LRUCache, cached
+
+def test_cached_results_are_copies():
+    calls = []
+    
+    @cached(LRUCache('test-copies'))
+    def breakdown():
+        calls.append(1)
+        return [{'name': 'Billing', 'count': 3}]
+    
+    breakdown()[0]['count'] = 99
+    result = breakdown()
+    result.append({'name': 'Bug Report', 'count': 1})
+    
+    assert breakdown() == [{'name': 'Billing', 'count': 3}]
+    assert len(calls) == 1
+
+def test_version_bump_skips_old_entries():
+    version = [0]
+    calls = []
+    
+    @cached(LRUCache('test-version'), version=lambda: version[0])
+    def total():
+        calls.append(1)
+        return len(calls)
+    
+    assert total() == total() == 1
+    version[0] += 1
+    assert total() == 2
@@ -0,0 +1,80 @@
+"""Trigger-maintained ticket_counters and daily_ticket_rollups"""
+import random
+
+import pytest
+
+from analytics import Analytics
+from benchmarks import seed_agents, seed_tickets
+from database import init_db, configure_storage, get_pool, get_read_pool, get_db_connection
+from ticket_models import Ticket
+
+@pytest.fixture
+def database(tmp_path):
+    database = str(tmp_path / 'counters.db')
+    init_db(database)
+    seed_agents(database, 5)
+    seed_tickets(database, 300)
+    configure_storage(database)
+    yield database
+    for pool in (get_pool(), get_read_pool()):
+        pool.close_all()
+
+def write_tickets(seed=7):
+    """Create, update and delete tickets through the model, as the app does"""
+    rng = random.Random(seed)
+    for _ in range(40):
+        Ticket.create('Printer offline', 'The office printer stops responding',
+                      rng.choice(['low', 'medium', 'high']), rng.randint(1, 6), 1,
+                      rng.choice([None, 2, 3]))
+    
+    for ticket_id in rng.sample(range(1, 341), 150):
+        action = rng.choice(['resolve', 'status', 'reprioritize', 'reassign', 'delete'])
+        if action == 'resolve':
+            Ticket.update(ticket_id, status='resolved')
+        elif action == 'status':
+            Ticket.update(ticket_id, status=rng.choice(['open', 'in_progress', 'closed']))
+        elif action == 'reprioritize':
+            Ticket.update(ticket_id, priority=rng.choice(['low', 'medium', 'high']))
+        elif action == 'reassign':
+            Ticket.update(ticket_id, assigned_to=rng.randint(1, 7), category_id=rng.randint(1, 6))
+        else:
+            Ticket.delete(ticket_id)
+
+def rollups():
+    """{(dimension, value, day): (created, resolved, hours)} for rows with tickets"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT dimension, value, day, created_count, resolved_count, resolution_hours
+        FROM daily_ticket_rollups
+        WHERE created_count != 0 OR resolved_count != 0
+    ''').fetchall()
+    conn.close()
+    return {tuple(row[:3]): tuple(row[3:]) for row in rows}
+
+def test_stats_counters_match_a_recount(database):
+    write_tickets()
+    
+    assert Ticket.get_stats(from_counters=True) == Ticket.get_stats(from_counters=False)
+    assert Ticket.check_stats_counters() == []
+
+def test_check_stats_counters_repairs_drift(database):
+    conn = get_db_connection()
+    conn.execute("UPDATE ticket_counters SET count = count + 5 WHERE dimension = 'status' AND value = 'open'")
+    conn.commit()
+    conn.close()
+    
+    mismatches = Ticket.check_stats_counters(repair=True)
+    assert [(dimension, value) for dimension, value, _, _ in mismatches] == [('status', 'open')]
+    assert Ticket.check_stats_counters() == []
+    assert Ticket.get_stats(from_counters=True) == Ticket.get_stats(from_counters=False)
+
+def test_daily_rollups_match_a_rebuild(database):
+    write_tickets()
+    incremental = rollups()
+    
+    assert Analytics.rebuild_daily_rollups() > 0
+    rebuilt = rollups()
+    assert incremental.keys() == rebuilt.keys()
+    for key, (created, resolved, hours) in rebuilt.items():
+        assert incremental[key][:2] == (created, resolved), key
+        assert incremental[key][2] == pytest.approx(hours, abs=1e-6), key
@@ -0,0 +1,81 @@
+"""Background export jobs: deduplication, failures and file expiry"""
+import os
+import time
+
+import pytest
+
+from benchmarks import seed_agents, seed_tickets
+from database import init_db, configure_storage, get_pool, get_read_pool, write_transaction
+from export_jobs import ExportJobQueue
+from export_utils import ExcelExporter
+
+class FailingExporter(ExcelExporter):
+    def write_export(self, export_format, output, filters, **kwargs):
+        output.write(b'partial')
+        raise RuntimeError('disk full')
+
+@pytest.fixture
+def database(tmp_path):
+    database = str(tmp_path / 'exports.db')
+    init_db(database)
+    seed_agents(database, 2)
+    seed_tickets(database, 200)
+    configure_storage(database)
+    yield database
+    for pool in (get_pool(), get_read_pool()):
+        pool.close_all()
+
+@pytest.fixture
+def export_dir(database, tmp_path):
+    return str(tmp_path / 'exports')
+
+def wait_for(queue, job_id):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('succeeded', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} still {job["status"]}')
+
+def test_identical_request_reuses_the_job(export_dir):
+    queue = ExportJobQueue(ExcelExporter(), export_dir=export_dir)
+    job_id, created = queue.submit('csv', {'status': 'open'}, requested_by=1)
+    assert created
+    assert queue.submit('csv', {'status': 'open'}, requested_by=1) == (job_id, False)
+    
+    job = wait_for(queue, job_id)
+    assert job['status'] == 'succeeded'
+    assert os.path.getsize(queue.file_path(job)) == job['size_bytes']
+    
+    # Still reused once finished, but not across users or filters
+    assert queue.submit('csv', {'status': 'open'}, requested_by=1) == (job_id, False)
+    assert queue.submit('csv', {'status': 'open'}, requested_by=2)[1]
+    assert queue.submit('csv', {'status': 'closed'}, requested_by=1)[1]
+
+def test_failed_job_leaves_no_file(export_dir):
+    queue = ExportJobQueue(FailingExporter(), export_dir=export_dir)
+    job_id, _ = queue.submit('csv', requested_by=1)
+    
+    job = wait_for(queue, job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'disk full'
+    assert os.listdir(export_dir) == []
+    
+    # A failed job is not reused
+    assert queue.submit('csv', requested_by=1)[1]
+
+def test_sweep_deletes_expired_files(export_dir):
+    queue = ExportJobQueue(ExcelExporter(), export_dir=export_dir)
+    expired_id, _ = queue.submit('csv', {'status': 'open'}, requested_by=1)
+    kept_id, _ = queue.submit('csv', {'status': 'closed'}, requested_by=1)
+    expired, kept = wait_for(queue, expired_id), wait_for(queue, kept_id)
+    
+    with write_transaction() as conn:
+        conn.execute("UPDATE export_jobs SET expires_at = datetime('now', '-1 minute') "
+                     "WHERE id = ?", (expired_id,))
+    
+    assert queue.sweep() == 1
+    assert queue.get(expired_id)['status'] == 'expired'
+    assert not os.path.exists(queue.file_path(expired))
+    assert os.path.exists(queue.file_path(kept))
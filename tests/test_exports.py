@@ -0,0 +1,64 @@
+"""Analytics in filtered exports"""
+import sqlite3
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+from openpyxl import load_workbook
+
+from benchmarks import seed_agents, seed_tickets
+from database import init_db, configure_storage, get_read_pool
+from export_utils import ExcelExporter
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    database = str(tmp_path_factory.mktemp('exports') / 'exports.db')
+    init_db(database)
+    seed_agents(database, 5)
+    seed_tickets(database, 2000)
+    configure_storage(database)
+    yield database
+    get_read_pool().close_all()
+
+def expected_trend(database, status):
+    """Tickets created and resolved per day in the last 30 days, counted in Python"""
+    conn = sqlite3.connect(database)
+    rows = conn.execute('SELECT created_at, resolved_at FROM tickets WHERE status = ?',
+                        (status,)).fetchall()
+    start = conn.execute("SELECT DATE('now', '-30 days')").fetchone()[0]
+    conn.close()
+    
+    created = Counter(row[0][:10] for row in rows if row[0][:10] >= start)
+    resolved = Counter(row[1][:10] for row in rows if row[1] and row[1][:10] >= start)
+    return [(day, created[day], resolved[day]) for day in sorted(set(created) | set(resolved))]
+
+def trend_rows(trend):
+    return [(row.date, row.tickets_created, row.tickets_resolved)
+            for row in trend.itertuples(index=False)]
+
+def test_unfiltered_trend_matches_rollups(database):
+    exporter = ExcelExporter()
+    # A filter every ticket passes takes the filtered path
+    everything = {'start_date': (date.today() - timedelta(days=3650)).isoformat()}
+    
+    assert trend_rows(exporter.get_daily_trend(everything)) == trend_rows(exporter.get_daily_trend())
+
+def test_filtered_trend_counts_matching_tickets(database):
+    trend = ExcelExporter().get_daily_trend({'status': 'resolved'})
+    
+    assert trend_rows(trend) == expected_trend(database, 'resolved')
+    assert trend['tickets_created'].sum() > 0
+
+def test_filtered_report_trend_sheet(database):
+    output = ExcelExporter().create_comprehensive_report({'status': 'resolved'})
+    
+    sheet = load_workbook(output, read_only=True)['Trend Analysis']
+    rows = [tuple(row) for row in sheet.iter_rows(min_row=3, values_only=True) if row[0]]
+    assert rows == expected_trend(database, 'resolved')
+
+def test_simple_analytics_export_is_category_breakdown(database):
+    output = ExcelExporter().create_simple_export('analytics')
+    
+    rows = list(load_workbook(output, read_only=True)['Data'].iter_rows(values_only=True))
+    assert rows[0] == ('category', 'ticket_count', 'resolved_count', 'avg_resolution_time')
+    assert sum(row[1] for row in rows[1:]) == 2000
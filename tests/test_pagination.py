@@ -0,0 +1,29 @@
+"""Keyset pagination cursors"""
+import base64
+import json
+
+import pytest
+
+from ticket_models import Ticket
+
+def make_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+@pytest.mark.parametrize('value', ['2024-01-01 10:00:00', 3, 2.5, None])
+def test_cursor_round_trip(value):
+    cursor = Ticket.encode_cursor({'created_at': value, 'id': 7}, 'created_at')
+    assert Ticket.decode_cursor(cursor) == (value, 7)
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    make_cursor('just a string'),
+    make_cursor([1, 2, 3]),
+    make_cursor([['a', 'list'], 7]),
+    make_cursor([{'an': 'object'}, 7]),
+    make_cursor(['open', '7']),
+    make_cursor(['open', 7.5]),
+    make_cursor(['open', True]),
+    make_cursor(['open', None])
+])
+def test_tampered_cursor_is_invalid(cursor):
+    assert Ticket.decode_cursor(cursor) is None
@@ -0,0 +1,36 @@
+"""Batch text cleaning must match preprocess_text exactly"""
+import pytest
+
+from ml_predictions import TicketPredictor
+
+# Inputs where a batch cleaner could drift from preprocess_text: every kind
+# of whitespace, case mappings that change length or land in ASCII, the
+# batch separator itself, and values that are not strings
+PREPROCESS_EDGE_CASES = [
+    None, float('nan'), 42, 3.5, '', ' ', '\x00', 'a\x00b', ' \x00 ',
+    'Kelvin \u212a', '\u0130stanbul', 'STRASSE stra\u00dfe', '\u03a3\u03a3 final',
+    'tabs\tand\nnew\r\nlines', '\x1c\x1d\x1e\x1f\x85\xa0\u2028\u3000 spaces',
+    "can't won't 2fa-code #123", '  leading and trailing  ', 'caf\u00e9 na\u00efve'
+] + [chr(code) * 2 + ' x' for code in range(0x3000)]
+
+# A chunk holding the separator is cleaned text by text, so the batch path
+# is also checked on a run of cases without it
+WITHOUT_SEPARATOR = [text for text in PREPROCESS_EDGE_CASES
+                     if not (isinstance(text, str) and '\x00' in text)]
+
+@pytest.fixture
+def predictor(tmp_path):
+    return TicketPredictor(str(tmp_path))
+
+# chunk_size=1 runs ASCII cases through the translate path on their own
+@pytest.mark.parametrize('chunk_size', [1, 7, 10000])
+@pytest.mark.parametrize('texts', [PREPROCESS_EDGE_CASES, WITHOUT_SEPARATOR],
+                         ids=['all', 'without separator'])
+def test_preprocess_texts_matches_preprocess_text(predictor, texts, chunk_size):
+    cleaned = predictor.preprocess_texts(texts, chunk_size)
+    
+    assert len(cleaned) == len(texts)
+    differences = [(text, expected, actual)
+                   for text, actual in zip(texts, cleaned)
+                   if actual != (expected := predictor.preprocess_text(text))]
+    assert not differences, differences[:10]
@@ -0,0 +1,116 @@
+"""EXPLAIN QUERY PLAN checks: every hot read path must stay on its index"""
+import re
+import sqlite3
+
+import pytest
+
+from analytics import Analytics, analytics_cache
+from benchmarks import seed_agents, seed_tickets
+from database import init_db, configure_storage, get_pool, get_read_pool, get_read_connection
+from ml_predictions import INCREMENTAL_QUERY
+from ticket_models import Ticket, Comment
+
+def stream_resolved_tickets(after=''):
+    """Read the first chunk of incremental training's ticket stream"""
+    conn = get_read_connection()
+    try:
+        params = ['2024-01-01 00:00:00'] * 2 + [1] if after else []
+        conn.execute(INCREMENTAL_QUERY.format(after=after), params).fetchmany(10)
+    finally:
+        conn.close()
+
+# Hot read paths and the index each one must use
+HOT_QUERIES = [
+    ('ticket list', lambda: Ticket.get_all(user_role='admin'), 'idx_tickets_created_at'),
+    ('ticket list by status', lambda: Ticket.get_all(
+        user_role='admin', filters={'status': 'open'}), 'idx_tickets_status'),
+    ('ticket list by priority', lambda: Ticket.get_all(
+        user_role='admin', filters={'priority': 'high'}), 'idx_tickets_priority'),
+    ('ticket list by updated_at', lambda: Ticket.get_all(
+        user_role='admin', filters={'sort_by': 'updated_at'}), 'idx_tickets_updated_at'),
+    ('ticket list unassigned', lambda: Ticket.get_all(
+        user_role='admin', filters={'assigned_to': 'unassigned'}), 'idx_tickets_assigned_created'),
+    ('agent ticket list', lambda: Ticket.get_all(user_role='agent', user_id=2),
+     'idx_tickets_created_by'),
+    ('ticket page by title', lambda: Ticket.get_page(
+        user_role='admin', filters={'sort_by': 'title'}), 'idx_tickets_title'),
+    ('ticket page by status', lambda: Ticket.get_page(
+        user_role='admin', filters={'sort_by': 'status'}), 'idx_tickets_status_id'),
+    ('ticket page by priority', lambda: Ticket.get_page(
+        user_role='admin', filters={'sort_by': 'priority'}), 'idx_tickets_priority_id'),
+    ('ticket page after cursor', lambda: Ticket.get_page(
+        user_role='admin', after=Ticket.get_page(user_role='admin')['next_cursor']),
+     'idx_tickets_created_at'),
+    ('recent tickets', lambda: Ticket.get_recent(user_role='admin'), 'idx_tickets_created_at'),
+    ('agent stats', lambda: Ticket.get_agent_stats(2), 'idx_tickets_created_by_status'),
+    ('agent recent tickets', lambda: Ticket.get_recent(user_role='agent', user_id=2),
+     'idx_tickets_assigned_created'),
+    ('search', lambda: Ticket.get_page(user_role='admin', filters={'search': 'login'}),
+     'tickets_fts VIRTUAL TABLE'),
+    ('ticket comments', lambda: Comment.get_by_ticket(1), 'idx_comments_ticket'),
+    ('tickets by category', Analytics.get_tickets_by_category, 'idx_tickets_category'),
+    ('average resolution time', Analytics.get_average_resolution_time, 'idx_tickets_resolved_at'),
+    ('resolution time by category', Analytics.get_resolution_time_by_category,
+     'idx_tickets_category'),
+    ('time series', Analytics.get_time_series_data, 'daily_ticket_rollups USING PRIMARY KEY'),
+    ('agent performance', Analytics.get_agent_performance, 'idx_tickets_assigned_to'),
+    ('incremental training', stream_resolved_tickets, 'idx_tickets_resolved_at'),
+    ('incremental training after checkpoint', lambda: stream_resolved_tickets(
+        'AND (t.resolved_at > ? OR (t.resolved_at = ? AND t.id > ?))'), 'idx_tickets_resolved_at')
+]
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    database = str(tmp_path_factory.mktemp('plans') / 'plans.db')
+    init_db(database)
+    seed_agents(database, 5)
+    seed_tickets(database, 500)
+    configure_storage(database)
+    yield database
+    for pool in (get_pool(), get_read_pool()):
+        pool.close_all()
+
+def query_plans(database, query):
+    """EXPLAIN QUERY PLAN steps of every SELECT the query runs"""
+    statements = []
+    def capture(statement):
+        # FTS5 reads its own shadow tables (tickets_fts_data etc.) internally
+        if statement.lstrip().upper().startswith('SELECT') and '_fts_' not in statement:
+            statements.append(statement)
+    
+    analytics_cache.clear()
+    pools = [get_pool(), get_read_pool()]
+    callbacks = [pool.trace_callback for pool in pools]
+    for pool in pools:
+        pool.trace_callback = capture
+        pool.close_all()
+    try:
+        query()
+    finally:
+        for pool, callback in zip(pools, callbacks):
+            pool.close_all()
+            pool.trace_callback = callback
+    
+    explain = sqlite3.connect(database)
+    try:
+        return [[row[3] for row in explain.execute('EXPLAIN QUERY PLAN ' + statement)]
+                for statement in statements]
+    finally:
+        explain.close()
+
+@pytest.mark.parametrize('name, query, index', HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_index(database, name, query, index):
+    plans = query_plans(database, query)
+    assert plans, f'{name} ran no SELECT'
+    
+    steps = [step for plan in plans for step in plan]
+    # Whole names only, idx_tickets_status must not match idx_tickets_status_id
+    assert any(re.search(rf'\b{re.escape(index)}\b', step) for step in steps), '\n'.join(steps)
+    
+    # Scans of subquery results are fine, the subqueries are checked, and
+    # categories and users are small lookup tables
+    full_scans = [step for step in steps
+                  if step.startswith('SCAN ') and ' USING ' not in step
+                  and 'subquery' not in step and 'VIRTUAL TABLE' not in step
+                  and step.split()[1] not in ('c', 'u')]
+    assert not full_scans, '\n'.join(steps)
@@ -0,0 +1,31 @@
+"""Training data loaded from the tickets table"""
+import pytest
+
+from benchmarks import seed_agents, seed_tickets
+from database import init_db, configure_storage, get_read_pool
+from ml_predictions import TicketPredictor
+
+@pytest.fixture
+def predictor(tmp_path):
+    database = str(tmp_path / 'training.db')
+    init_db(database)
+    seed_agents(database, 5)
+    seed_tickets(database, 200)
+    configure_storage(database, max_connections=2, timeout=1.0)
+    yield TicketPredictor(str(tmp_path / 'ml_models'))
+    get_read_pool().close_all()
+
+def test_full_retrain_loads_resolved_tickets(predictor):
+    df = predictor.load_data_from_db()
+    
+    # The generated sample data has 36 rows in these six categories
+    assert len(df) > 36
+    assert list(df.columns) == ['description', 'category', 'priority', 'resolution_time_hours']
+    assert df['resolution_time_hours'].min() > 0
+    assert set(df['category']) <= {'Technical Issue', 'Account Support', 'Billing',
+                                   'Feature Request', 'Bug Report', 'General Inquiry'}
+
+def test_loading_returns_read_connections(predictor):
+    for _ in range(5):
+        predictor.load_data_from_db()
+    assert get_read_pool().stats()['in_use_connections'] == 0
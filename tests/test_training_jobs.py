@@ -0,0 +1,117 @@
+"""Background training jobs and picking up versions trained elsewhere"""
+import threading
+import time
+
+import pytest
+
+from database import init_db, configure_storage, get_pool, get_read_pool, write_transaction
+from ml_predictions import TicketPredictor
+from model_registry import ModelBundle
+from training_jobs import TrainingJobQueue
+
+class StubPredictor:
+    """Stands in for TicketPredictor: training waits for release and can fail"""
+    
+    def __init__(self):
+        self.release = threading.Event()
+        self.error = None
+        self.bundle = None
+        self.save_seconds = None
+    
+    def train_models(self, progress=None):
+        progress('training models', 0.3)
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        self.bundle = ModelBundle('v1', None, None, None, None, {'mode': 'full'})
+        self.save_seconds = 0.5
+        return True
+
+@pytest.fixture
+def database(tmp_path):
+    database = str(tmp_path / 'jobs.db')
+    init_db(database)
+    configure_storage(database)
+    yield database
+    for pool in (get_pool(), get_read_pool()):
+        pool.close_all()
+
+@pytest.fixture
+def predictor(database):
+    predictor = StubPredictor()
+    yield predictor
+    predictor.release.set()
+
+def wait_for(queue, job_id, statuses=('succeeded', 'failed')):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} still {job["status"]}')
+
+def test_submit_dedupes_while_a_job_is_active(predictor):
+    queue = TrainingJobQueue(predictor)
+    job_id, created = queue.submit()
+    assert created
+    assert queue.submit() == (job_id, False)
+    
+    predictor.release.set()
+    job = wait_for(queue, job_id)
+    assert job['status'] == 'succeeded'
+    assert job['model_version'] == 'v1'
+    assert job['metrics'] == {'mode': 'full', 'save_seconds': 0.5}
+    
+    # Once finished, a new job can be queued
+    assert queue.submit()[1]
+
+def test_failed_job_records_the_error(predictor):
+    predictor.error = RuntimeError('fit exploded')
+    predictor.release.set()
+    queue = TrainingJobQueue(predictor)
+    job_id, _ = queue.submit()
+    
+    job = wait_for(queue, job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'fit exploded'
+
+def test_heartbeat_keeps_a_long_fit_alive(predictor):
+    queue = TrainingJobQueue(predictor, heartbeat_seconds=0.05)
+    job_id, _ = queue.submit()
+    wait_for(queue, job_id, statuses=('running',))
+    
+    with write_transaction() as conn:
+        conn.execute("UPDATE training_jobs SET updated_at = '2000-01-01 00:00:00' WHERE id = ?",
+                     (job_id,))
+    time.sleep(0.3)
+    assert queue.get(job_id)['updated_at'] > '2000-01-01 00:00:00'
+
+def test_stale_job_expires(predictor):
+    queue = TrainingJobQueue(predictor, stale_after=600)
+    with write_transaction() as conn:
+        stale_id = conn.execute('''
+            INSERT INTO training_jobs (status, updated_at)
+            VALUES ('running', datetime('now', '-11 minutes'))
+        ''').lastrowid
+    
+    job_id, created = queue.submit()
+    assert created and job_id != stale_id
+    stale = queue.get(stale_id)
+    assert stale['status'] == 'failed'
+    assert stale['error'] == 'Job stopped sending heartbeats'
+
+def test_predictor_picks_up_a_version_activated_elsewhere(tmp_path):
+    model_dir = str(tmp_path / 'ml_models')
+    trainer = TicketPredictor(model_dir)
+    server = TicketPredictor(model_dir, sync_interval=0.01)
+    
+    trainer.save_models(ModelBundle('20240101-000000-000000', 'category', 'resolution',
+                                    'vectorizer', 'encoder'))
+    assert server.load_models()
+    trainer.save_models(ModelBundle('20240102-000000-000000', 'category', 'resolution',
+                                    'vectorizer', 'encoder'))
+    
+    time.sleep(0.02)
+    assert server.ensure_models()
+    assert server.bundle.version == '20240102-000000-000000'
@@ -1,5 +1,58 @@
-from database import get_db_connection
+from database import (get_db_connection, write_transaction, REBUILD_TICKET_COUNTERS,
+                      REBUILD_TICKET_SEARCH)
 from datetime import datetime
+import base64
+import binascii
+import json
+import re
+
+# Ticket columns plus the joined names shown in lists and detail views
+TICKET_COLUMNS = '''
+    t.*, c.name as category_name, c.color as category_color,
+    creator.username as created_by_username,
+    assignee.username as assigned_to_username
+'''
+
+TICKET_JOINS = '''
+    LEFT JOIN categories c ON t.category_id = c.id
+    LEFT JOIN users creator ON t.created_by = creator.id
+    LEFT JOIN users assignee ON t.assigned_to = assignee.id
+'''
+
+TICKET_SELECT = f'SELECT {TICKET_COLUMNS} FROM tickets t {TICKET_JOINS}'
+
+# bm25 with title, description and comments weighted 10:5:1 (lower is better)
+RELEVANCE = 'bm25(tickets_fts, 10.0, 5.0, 1.0)'
+
+# Ranked search results, used with a "tickets_fts MATCH ?" condition
+SEARCH_SELECT = f'''
+    SELECT {TICKET_COLUMNS}, {RELEVANCE} as relevance
+    FROM tickets_fts
+    JOIN tickets t ON t.id = tickets_fts.rowid
+    {TICKET_JOINS}
+'''
+
+SORT_FIELDS = ['created_at', 'updated_at', 'title', 'status', 'priority']
+
+SEARCH_TERM = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+
+def build_search_query(text):
+    """Turn a search box string into an FTS5 MATCH expression
+    
+    Every term must match. "quoted text" is a phrase and a trailing *
+    makes a prefix search, e.g. ``pass* "reset link"``. Terms are quoted
+    so FTS5 operators and punctuation in user input are never parsed.
+    Returns None when the text has nothing searchable.
+    """
+    terms = []
+    for phrase, phrase_prefix, word in SEARCH_TERM.findall(text or ''):
+        if word:
+            prefix = word.endswith('*')
+            phrase, phrase_prefix = word.rstrip('*'), '*' if prefix else ''
+        if not re.search(r'\w', phrase):
+            continue
+        terms.append('"' + phrase.replace('"', '""') + '"' + phrase_prefix)
+    return ' '.join(terms) or None
 
 class Ticket:
     """Ticket model for support tickets"""
@@ -21,36 +74,20 @@ class Ticket:
     @staticmethod
     def create(title, description, priority, category_id, created_by, assigned_to=None):
         """Create a new ticket"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             cursor = conn.execute('''
                 INSERT INTO tickets (title, description, priority, category_id, created_by, assigned_to)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (title, description, priority, category_id, created_by, assigned_to))
-            ticket_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return ticket_id
-        except Exception as e:
-            conn.close()
-            raise e
+            return cursor.lastrowid
     
     @staticmethod
-    def get_all(user_role=None, user_id=None, filters=None):
-        """Get all tickets based on user role and filters"""
-        conn = get_db_connection()
-        
-        # Base query
-        base_query = '''
-            SELECT t.*, c.name as category_name, c.color as category_color,
-                   creator.username as created_by_username,
-                   assignee.username as assigned_to_username
-            FROM tickets t
-            LEFT JOIN categories c ON t.category_id = c.id
-            LEFT JOIN users creator ON t.created_by = creator.id
-            LEFT JOIN users assignee ON t.assigned_to = assignee.id
-        '''
+    def _build_filters(user_role=None, user_id=None, filters=None, ranked=False):
+        """Build WHERE conditions and parameters for the ticket list
         
+        With ranked=True the search condition is written for SEARCH_SELECT,
+        which joins tickets_fts so results can be ordered by relevance.
+        """
         where_conditions = []
         params = []
         
@@ -61,11 +98,14 @@ class Ticket:
         
         # Apply filters if provided
         if filters:
-            # Search filter
-            if filters.get('search'):
-                search_term = f"%{filters['search']}%"
-                where_conditions.append('(LOWER(t.title) LIKE LOWER(?) OR LOWER(t.description) LIKE LOWER(?))')
-                params.extend([search_term, search_term])
+            # Full-text search over title, description and comments
+            match = build_search_query(filters.get('search'))
+            if match:
+                if ranked:
+                    where_conditions.append('tickets_fts MATCH ?')
+                else:
+                    where_conditions.append('t.id IN (SELECT rowid FROM tickets_fts WHERE tickets_fts MATCH ?)')
+                params.append(match)
             
             # Status filter
             if filters.get('status'):
@@ -113,44 +153,159 @@ class Ticket:
                 where_conditions.append('DATE(t.updated_at) <= ?')
                 params.append(filters['updated_to'])
         
-        # Construct final query
-        if where_conditions:
-            query = base_query + ' WHERE ' + ' AND '.join(where_conditions)
-        else:
-            query = base_query
-        
-        # Add sorting
+        return where_conditions, params
+    
+    @staticmethod
+    def _get_sort(filters=None, allow_relevance=False):
+        """Get validated sort field and order from filters"""
         sort_by = filters.get('sort_by', 'created_at') if filters else 'created_at'
         sort_order = filters.get('sort_order', 'DESC') if filters else 'DESC'
         
+        # Relevance needs a search to rank by, and best matches always come first
+        if sort_by == 'relevance' and allow_relevance and build_search_query(filters.get('search')):
+            return 'relevance', 'ASC'
+        
         # Validate sort parameters
-        valid_sort_fields = ['created_at', 'updated_at', 'title', 'status', 'priority']
-        if sort_by not in valid_sort_fields:
+        if sort_by not in SORT_FIELDS:
             sort_by = 'created_at'
         
         if sort_order not in ['ASC', 'DESC']:
             sort_order = 'DESC'
         
+        return sort_by, sort_order
+    
+    @staticmethod
+    def get_all(user_role=None, user_id=None, filters=None):
+        """Get all tickets based on user role and filters"""
+        conn = get_db_connection()
+        
+        where_conditions, params = Ticket._build_filters(user_role, user_id, filters)
+        
+        # Construct final query
+        if where_conditions:
+            query = TICKET_SELECT + ' WHERE ' + ' AND '.join(where_conditions)
+        else:
+            query = TICKET_SELECT
+        
+        # Add sorting
+        sort_by, sort_order = Ticket._get_sort(filters)
         query += f' ORDER BY t.{sort_by} {sort_order}'
         
         tickets = conn.execute(query, params).fetchall()
         conn.close()
         return tickets
     
+    @staticmethod
+    def encode_cursor(ticket, sort_by):
+        """Encode a ticket's position in the sort order as an opaque cursor"""
+        payload = json.dumps([ticket[sort_by], ticket['id']])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor into (sort value, id), or None if it is invalid"""
+        try:
+            value, ticket_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError, binascii.Error):
+            return None
+        
+        # Both are bound as SQL parameters, so anything sqlite3 cannot bind
+        # (a list or object from a tampered cursor) is rejected here
+        if value is not None and not isinstance(value, (str, int, float)):
+            return None
+        if not isinstance(ticket_id, int) or isinstance(ticket_id, bool):
+            return None
+        return value, ticket_id
+    
+    @staticmethod
+    def get_page(user_role=None, user_id=None, filters=None, after=None, before=None, per_page=25):
+        """Get one page of tickets using keyset pagination on (sort field, id)
+        
+        Pass the next_cursor of a page as ``after`` to get the following page
+        or its prev_cursor as ``before`` to go back. With a search filter,
+        sort_by='relevance' orders by bm25 rank instead of a column.
+        """
+        conn = get_db_connection()
+        
+        sort_by, sort_order = Ticket._get_sort(filters, allow_relevance=True)
+        ranked = sort_by == 'relevance'
+        where_conditions, params = Ticket._build_filters(user_role, user_id, filters, ranked=ranked)
+        select = SEARCH_SELECT if ranked else TICKET_SELECT
+        sort_expression = RELEVANCE if ranked else f't.{sort_by}'
+        
+        cursor = Ticket.decode_cursor(before or after) if (before or after) else None
+        backwards = cursor is not None and bool(before)
+        
+        # Walking backwards flips both the comparison and the order
+        descending = (sort_order == 'DESC') != backwards
+        direction = 'DESC' if descending else 'ASC'
+        comparison = '<' if descending else '>'
+        
+        def fetch(extra_conditions, extra_params, limit):
+            conditions = where_conditions + extra_conditions
+            query = select
+            if conditions:
+                query += ' WHERE ' + ' AND '.join(conditions)
+            query += f' ORDER BY {sort_expression} {direction}, t.id {direction} LIMIT ?'
+            return conn.execute(query, params + extra_params + [limit]).fetchall()
+        
+        limit = per_page + 1
+        if cursor:
+            value, last_id = cursor
+            # Rows tied with the cursor on the sort field, then the rest. Two
+            # simple ranges let SQLite seek straight to the cursor, where a
+            # (field, id) row-value comparison only bounds the first column.
+            tickets = fetch([f'{sort_expression} = ?', f't.id {comparison} ?'], [value, last_id], limit)
+            if len(tickets) < limit:
+                tickets += fetch([f'{sort_expression} {comparison} ?'], [value], limit - len(tickets))
+        else:
+            tickets = fetch([], [], limit)
+        conn.close()
+        
+        has_more = len(tickets) > per_page
+        tickets = tickets[:per_page]
+        
+        if backwards:
+            tickets.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, cursor is not None
+        
+        return {
+            'tickets': tickets,
+            'next_cursor': Ticket.encode_cursor(tickets[-1], sort_by) if has_next and tickets else None,
+            'prev_cursor': Ticket.encode_cursor(tickets[0], sort_by) if has_prev and tickets else None,
+            'per_page': per_page
+        }
+    
+    @staticmethod
+    def get_recent(user_role=None, user_id=None, limit=5):
+        """Get the most recently created tickets"""
+        if user_role == 'admin':
+            return Ticket.get_page(user_role='admin', per_page=limit)['tickets']
+        
+        # Newest few from each side of the role filter, merged; each side is a
+        # short index walk instead of sorting every ticket the user can see
+        conn = get_db_connection()
+        tickets = conn.execute(TICKET_SELECT + '''
+            WHERE t.id IN (
+                SELECT id FROM (SELECT id FROM tickets WHERE assigned_to = ?
+                                ORDER BY created_at DESC, id DESC LIMIT ?)
+                UNION
+                SELECT id FROM (SELECT id FROM tickets WHERE created_by = ?
+                                ORDER BY created_at DESC, id DESC LIMIT ?)
+            )
+            ORDER BY t.created_at DESC, t.id DESC
+            LIMIT ?
+        ''', (user_id, limit, user_id, limit, limit)).fetchall()
+        conn.close()
+        return tickets
+    
     @staticmethod
     def get_by_id(ticket_id):
         """Get ticket by ID"""
         conn = get_db_connection()
-        ticket = conn.execute('''
-            SELECT t.*, c.name as category_name, c.color as category_color,
-                   creator.username as created_by_username,
-                   assignee.username as assigned_to_username
-            FROM tickets t
-            LEFT JOIN categories c ON t.category_id = c.id
-            LEFT JOIN users creator ON t.created_by = creator.id
-            LEFT JOIN users assignee ON t.assigned_to = assignee.id
-            WHERE t.id = ?
-        ''', (ticket_id,)).fetchone()
+        ticket = conn.execute(TICKET_SELECT + ' WHERE t.id = ?', (ticket_id,)).fetchone()
         conn.close()
         return ticket
     
@@ -158,8 +313,6 @@ class Ticket:
     def update(ticket_id, title=None, description=None, status=None, priority=None, 
                category_id=None, assigned_to=None):
         """Update ticket"""
-        conn = get_db_connection()
-        
         # Build dynamic update query
         updates = []
         params = []
@@ -192,59 +345,128 @@ class Ticket:
         
         query = f"UPDATE tickets SET {', '.join(updates)} WHERE id = ?"
         
-        try:
+        with write_transaction() as conn:
             conn.execute(query, params)
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            conn.close()
-            raise e
+        return True
     
     @staticmethod
     def delete(ticket_id):
         """Delete ticket"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             conn.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            conn.close()
-            raise e
+        return True
     
     @staticmethod
-    def get_stats():
-        """Get ticket statistics"""
-        conn = get_db_connection()
-        
-        # Total tickets
-        total = conn.execute('SELECT COUNT(*) FROM tickets').fetchone()[0]
+    def _format_stats(counts):
+        """Shape {(dimension, value): count} into the dashboard stats dict"""
+        return {
+            'total': counts.get(('total', ''), 0),
+            'open': counts.get(('status', 'open'), 0),
+            'in_progress': counts.get(('status', 'in_progress'), 0),
+            'resolved': counts.get(('status', 'resolved'), 0),
+            'closed': counts.get(('status', 'closed'), 0),
+            'high_priority': counts.get(('priority', 'high'), 0),
+            'medium_priority': counts.get(('priority', 'medium'), 0),
+            'low_priority': counts.get(('priority', 'low'), 0)
+        }
+    
+    @staticmethod
+    def _count_live(conn):
+        """Count tickets by status and priority in a single grouped pass"""
+        rows = conn.execute('''
+            SELECT status, priority, COUNT(*) as count
+            FROM tickets
+            GROUP BY status, priority
+        ''').fetchall()
         
-        # Tickets by status
-        open_tickets = conn.execute("SELECT COUNT(*) FROM tickets WHERE status = 'open'").fetchone()[0]
-        in_progress = conn.execute("SELECT COUNT(*) FROM tickets WHERE status = 'in_progress'").fetchone()[0]
-        resolved = conn.execute("SELECT COUNT(*) FROM tickets WHERE status = 'resolved'").fetchone()[0]
-        closed = conn.execute("SELECT COUNT(*) FROM tickets WHERE status = 'closed'").fetchone()[0]
+        counts = {('total', ''): 0}
+        for row in rows:
+            for key in (('total', ''), ('status', row['status']), ('priority', row['priority'])):
+                counts[key] = counts.get(key, 0) + row['count']
+        return counts
+    
+    @staticmethod
+    def _count_from_counters(conn):
+        """Read the trigger-maintained ticket_counters table"""
+        rows = conn.execute('SELECT dimension, value, count FROM ticket_counters').fetchall()
+        return {(row['dimension'], row['value']): row['count'] for row in rows if row['count']}
+    
+    @staticmethod
+    def get_stats(from_counters=True):
+        """Get ticket statistics
         
-        # Tickets by priority
-        high_priority = conn.execute("SELECT COUNT(*) FROM tickets WHERE priority = 'high'").fetchone()[0]
-        medium_priority = conn.execute("SELECT COUNT(*) FROM tickets WHERE priority = 'medium'").fetchone()[0]
-        low_priority = conn.execute("SELECT COUNT(*) FROM tickets WHERE priority = 'low'").fetchone()[0]
+        Served from the ticket_counters table by default; pass
+        from_counters=False to recount the tickets table instead.
+        """
+        conn = get_db_connection()
+        if from_counters:
+            counts = Ticket._count_from_counters(conn)
+        else:
+            counts = Ticket._count_live(conn)
+        conn.close()
         
+        return Ticket._format_stats(counts)
+    
+    @staticmethod
+    def get_agent_stats(user_id):
+        """Get ticket counts by status for tickets assigned to or created by a user"""
+        conn = get_db_connection()
+        # Assigned tickets plus the ones the user created for someone else;
+        # both halves are covered by an index, unlike the OR of the two
+        rows = conn.execute('''
+            SELECT status, SUM(count) as count FROM (
+                SELECT status, COUNT(*) as count
+                FROM tickets
+                WHERE assigned_to = ?
+                GROUP BY status
+                UNION ALL
+                SELECT status, COUNT(*) as count
+                FROM tickets
+                WHERE created_by = ? AND assigned_to IS NOT ?
+                GROUP BY status
+            )
+            GROUP BY status
+        ''', (user_id, user_id, user_id)).fetchall()
         conn.close()
         
+        counts = {row['status']: row['count'] for row in rows}
         return {
-            'total': total,
-            'open': open_tickets,
-            'in_progress': in_progress,
-            'resolved': resolved,
-            'closed': closed,
-            'high_priority': high_priority,
-            'medium_priority': medium_priority,
-            'low_priority': low_priority
+            'total': sum(counts.values()),
+            'open': counts.get('open', 0),
+            'in_progress': counts.get('in_progress', 0),
+            'resolved': counts.get('resolved', 0),
+            'closed': counts.get('closed', 0)
         }
+    
+    @staticmethod
+    def rebuild_search_index():
+        """Repopulate tickets_fts from the tickets and comments tables"""
+        with write_transaction() as conn:
+            for statement in REBUILD_TICKET_SEARCH:
+                conn.execute(statement)
+            return conn.execute('SELECT COUNT(*) FROM tickets_fts').fetchone()[0]
+    
+    @staticmethod
+    def check_stats_counters(repair=False):
+        """Compare ticket_counters with a full recount
+        
+        Returns a list of (dimension, value, counter, actual) mismatches.
+        With repair=True the counters are rebuilt when they disagree.
+        """
+        with write_transaction() as conn:
+            actual = Ticket._count_live(conn)
+            counters = Ticket._count_from_counters(conn)
+            
+            mismatches = []
+            for key in sorted(set(actual) | set(counters)):
+                if actual.get(key, 0) != counters.get(key, 0):
+                    mismatches.append((key[0], key[1], counters.get(key, 0), actual.get(key, 0)))
+            
+            if mismatches and repair:
+                for statement in REBUILD_TICKET_COUNTERS:
+                    conn.execute(statement)
+        
+        return mismatches
 
 class Category:
     """Category model for ticket categories"""
@@ -271,19 +493,12 @@ class Comment:
     @staticmethod
     def create(ticket_id, user_id, comment):
         """Create a new comment"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             cursor = conn.execute('''
                 INSERT INTO comments (ticket_id, user_id, comment)
                 VALUES (?, ?, ?)
             ''', (ticket_id, user_id, comment))
-            comment_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return comment_id
-        except Exception as e:
-            conn.close()
-            raise e
+            return cursor.lastrowid
     
     @staticmethod
     def get_by_ticket(ticket_id):
@@ -302,12 +517,6 @@ class Comment:
     @staticmethod
     def delete(comment_id):
         """Delete comment"""
-        conn = get_db_connection()
-        try:
+        with write_transaction() as conn:
             conn.execute('DELETE FROM comments WHERE id = ?', (comment_id,))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            conn.close()
-            raise e
+        return True
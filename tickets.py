@@ -60,17 +60,32 @@ def ticket_list():
         if updated_to:
             filters['updated_to'] = updated_to
         
-        # Sorting
-        sort_by = request.args.get('sort_by', 'created_at')
+        # Sorting (searches default to best match first)
+        sort_by = request.args.get('sort_by', 'relevance' if search else 'created_at')
         sort_order = request.args.get('sort_order', 'DESC')
         filters['sort_by'] = sort_by
         filters['sort_order'] = sort_order
         
-        # Get tickets with filters
+        # Get one page of tickets with filters
+        per_page = min(max(request.args.get('per_page', 25, type=int), 1), 100)
+        after = request.args.get('after') or None
+        before = request.args.get('before') or None
+        
         if current_user.is_admin():
-            tickets = Ticket.get_all(user_role='admin', filters=filters)
+            page = Ticket.get_page(user_role='admin', filters=filters,
+                                   after=after, before=before, per_page=per_page)
         else:
-            tickets = Ticket.get_all(user_role='agent', user_id=current_user.id, filters=filters)
+            page = Ticket.get_page(user_role='agent', user_id=current_user.id, filters=filters,
+                                   after=after, before=before, per_page=per_page)
+        tickets = page['tickets']
+        
+        # Page links keep the current filters and replace the cursor
+        page_args = {key: value for key, value in request.args.items()
+                     if key not in ('after', 'before')}
+        next_url = url_for('tickets.ticket_list', after=page['next_cursor'], **page_args) \
+            if page['next_cursor'] else None
+        prev_url = url_for('tickets.ticket_list', before=page['prev_cursor'], **page_args) \
+            if page['prev_cursor'] else None
         
         # Get additional data for filters
         categories = Category.get_all()
@@ -86,7 +101,9 @@ def ticket_list():
                              tickets=tickets, 
                              categories=categories, 
                              users=users,
-                             current_filters=filters)
+                             current_filters=filters,
+                             next_url=next_url,
+                             prev_url=prev_url)
     except Exception as e:
         flash(f'Error loading tickets: {str(e)}', 'error')
         return redirect(url_for('dashboard'))
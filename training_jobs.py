@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import get_read_connection, write_transaction
+from ml_predictions import predictor
+
+# Jobs in these states block new trainings from being queued
+ACTIVE_STATUSES = ('queued', 'running')
+
+# full: TicketPredictor.train_models; incremental: train_incremental
+TRAINING_MODES = ('full', 'incremental')
+
+class TrainingJobQueue:
+    """Runs model training out of band, one job at a time
+    
+    Jobs are recorded in the training_jobs table so their status survives
+    the request that queued them and is visible to every worker process.
+    A running job sends a heartbeat every heartbeat_seconds, even while a
+    model is being fitted and reports no progress; an active job with no
+    heartbeat for stale_after seconds is assumed to have died with its
+    process and is marked failed.
+    """
+    
+    def __init__(self, predictor, stale_after=600, heartbeat_seconds=60):
+        self.predictor = predictor
+        self.stale_after = stale_after
+        self.heartbeat_seconds = heartbeat_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='training-job')
+        self._scheduler = None
+        self._stop = threading.Event()
+    
+    def submit(self, mode='full', source='manual', requested_by=None, min_interval=None):
+        """Queue a training job unless one is already queued or running
+        
+        With min_interval (seconds), nothing is queued if any job was
+        created within that time. Returns (job_id, created); job_id is the
+        existing job when deduplicated and None when skipped by min_interval.
+        """
+        if mode not in TRAINING_MODES:
+            raise ValueError(f'Unknown training mode: {mode}')
+        
+        with write_transaction() as conn:
+            self._expire_stale(conn)
+            
+            active = conn.execute(
+                f"SELECT id FROM training_jobs WHERE status IN {ACTIVE_STATUSES} ORDER BY id LIMIT 1"
+            ).fetchone()
+            if active:
+                return active['id'], False
+            
+            if min_interval is not None:
+                recent = conn.execute(
+                    "SELECT id FROM training_jobs WHERE created_at >= datetime('now', ?) LIMIT 1",
+                    (f'-{int(min_interval)} seconds',)
+                ).fetchone()
+                if recent:
+                    return None, False
+            
+            cursor = conn.execute(
+                'INSERT INTO training_jobs (mode, source, requested_by) VALUES (?, ?, ?)',
+                (mode, source, requested_by)
+            )
+            job_id = cursor.lastrowid
+        
+        self._executor.submit(self._run, job_id, mode)
+        return job_id, True
+    
+    def _expire_stale(self, conn):
+        """Fail active jobs that stopped sending heartbeats"""
+        conn.execute(f'''
+            UPDATE training_jobs
+            SET status = 'failed', error = 'Job stopped sending heartbeats',
+                finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE status IN {ACTIVE_STATUSES} AND updated_at < datetime('now', ?)
+        ''', (f'-{int(self.stale_after)} seconds',))
+    
+    def _update(self, job_id, stamp=None, **fields):
+        """Update a job's columns, setting the stamp column to the current time"""
+        assignments = [f'{column} = ?' for column in fields]
+        assignments.append('updated_at = CURRENT_TIMESTAMP')
+        if stamp:
+            assignments.append(f'{stamp} = CURRENT_TIMESTAMP')
+        
+        with write_transaction() as conn:
+            conn.execute(
+                f"UPDATE training_jobs SET {', '.join(assignments)} WHERE id = ?",
+                list(fields.values()) + [job_id]
+            )
+    
+    def _run(self, job_id, mode):
+        """Train the models for one job, recording progress and the outcome"""
+        started = time.perf_counter()
+        self._update(job_id, stamp='started_at', status='running', stage='starting', progress=0.0)
+        
+        def progress(stage, fraction):
+            self._update(job_id, stage=stage, progress=fraction)
+        
+        # Keep updated_at fresh through long stages such as fitting
+        finished = threading.Event()
+        def heartbeat():
+            while not finished.wait(self.heartbeat_seconds):
+                try:
+                    self._update(job_id)
+                except Exception as e:
+                    print(f"Training job {job_id} heartbeat failed: {e}")
+        threading.Thread(target=heartbeat, name=f'training-heartbeat-{job_id}', daemon=True).start()
+        
+        try:
+            if mode == 'incremental':
+                trained = self.predictor.train_incremental(progress=progress)
+            else:
+                trained = self.predictor.train_models(progress=progress)
+            if not trained:
+                raise RuntimeError('No data available for training')
+            
+            bundle = self.predictor.bundle
+            metrics = dict(bundle.metadata, save_seconds=self.predictor.save_seconds)
+            self._update(job_id, stamp='finished_at', status='succeeded', stage='done',
+                         progress=1.0, model_version=bundle.version,
+                         metrics=json.dumps(metrics),
+                         duration_seconds=round(time.perf_counter() - started, 3))
+        except Exception as e:
+            print(f"Training job {job_id} failed: {e}")
+            self._update(job_id, stamp='finished_at', status='failed', error=str(e),
+                         duration_seconds=round(time.perf_counter() - started, 3))
+        finally:
+            finished.set()
+    
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job['metrics'] = json.loads(job['metrics']) if job['metrics'] else None
+        return job
+    
+    def get(self, job_id):
+        """Get a job by id"""
+        conn = get_read_connection()
+        row = conn.execute('SELECT * FROM training_jobs WHERE id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._to_dict(row) if row else None
+    
+    def get_recent(self, limit=20):
+        """Get the most recent jobs, newest first"""
+        conn = get_read_connection()
+        rows = conn.execute(
+            'SELECT * FROM training_jobs ORDER BY id DESC LIMIT ?', (limit,)
+        ).fetchall()
+        conn.close()
+        return [self._to_dict(row) for row in rows]
+    
+    def start_schedule(self, interval_hours, mode='full', check_seconds=300):
+        """Queue a scheduled retraining every interval_hours
+        
+        Each process checks every check_seconds; the min_interval check in
+        submit() keeps several processes from training once each.
+        """
+        if self._scheduler is not None:
+            return
+        
+        interval = interval_hours * 3600
+        
+        def schedule():
+            while not self._stop.wait(min(check_seconds, interval)):
+                try:
+                    self.submit(mode=mode, source='scheduled', min_interval=interval)
+                except Exception as e:
+                    print(f"Error scheduling model retraining: {e}")
+        
+        self._scheduler = threading.Thread(target=schedule, name='training-scheduler', daemon=True)
+        self._scheduler.start()
+    
+    def stop(self):
+        """Stop the scheduler and wait for a running job to finish"""
+        self._stop.set()
+        self._executor.shutdown(wait=True)
+
+# Global job queue for the global predictor
+training_jobs = TrainingJobQueue(predictor)